@@ -0,0 +1,57 @@
+"""Compare the cache codec against the old str()/eval() encoding.
+
+Usage: python bench_codec.py [num_questions] [iterations]
+"""
+import sys
+import timeit
+
+import codec
+
+
+def sample_questions(n: int):
+    return [
+        {
+            "question": f"Which statement about JavaScript closures is true? (variant {i})",
+            "options": [
+                "A. Closures capture variables by value at creation time",
+                "B. Closures keep a reference to their lexical environment",
+                "C. Closures can only be created with arrow functions",
+                "D. Closures are garbage collected immediately after return",
+            ],
+            "answer": "B",
+            "explanation": "A closure retains access to the scope it was defined in, "
+                           "even after the outer function has returned.",
+        }
+        for i in range(n)
+    ]
+
+
+def variants():
+    yield "repr/eval (old)", str, eval
+    yield "json", lambda v: codec.dumps(v, fmt=codec.FORMAT_JSON, compression=codec.COMPRESSION_NONE), codec.loads
+    yield "json+zlib", lambda v: codec.dumps(v, fmt=codec.FORMAT_JSON, compression=codec.COMPRESSION_ZLIB, threshold=0), codec.loads
+    if codec.msgpack is not None:
+        yield "msgpack", lambda v: codec.dumps(v, fmt=codec.FORMAT_MSGPACK, compression=codec.COMPRESSION_NONE), codec.loads
+        if codec.zstandard is not None:
+            yield "msgpack+zstd", lambda v: codec.dumps(v, fmt=codec.FORMAT_MSGPACK, compression=codec.COMPRESSION_ZSTD, threshold=0), codec.loads
+    yield "default", codec.dumps, codec.loads
+
+
+def main():
+    num_questions = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    value = sample_questions(num_questions)
+
+    print(f"{num_questions} questions, {iterations} iterations")
+    print(f"{'codec':<18}{'bytes':>8}{'encode us':>12}{'decode us':>12}")
+    for name, encode, decode in variants():
+        encoded = encode(value)
+        assert decode(encoded) == value
+        size = len(encoded.encode("utf-8") if isinstance(encoded, str) else encoded)
+        encode_us = timeit.timeit(lambda: encode(value), number=iterations) / iterations * 1e6
+        decode_us = timeit.timeit(lambda: decode(encoded), number=iterations) / iterations * 1e6
+        print(f"{name:<18}{size:>8}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import codec
+import redis_pool
+
+# Cache configuration
+QUESTION_CACHE_TTL = int(os.getenv("QUESTION_CACHE_TTL", 3600))
+LOCAL_CACHE_MAXSIZE = int(os.getenv("LOCAL_CACHE_MAXSIZE", 1024))
+LOCAL_CACHE_TTL = int(os.getenv("LOCAL_CACHE_TTL", 300))
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+# How long an expired entry may still be served while it is refreshed
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", 86400))
+# XFetch beta: >1 refreshes earlier, <1 later
+CACHE_XFETCH_BETA = float(os.getenv("CACHE_XFETCH_BETA", 1.0))
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    created_at: float
+    ttl: float
+    # Seconds it took to compute the value, used to scale early refresh
+    delta: float = 0.0
+
+    @property
+    def expires_at(self) -> float:
+        return self.created_at + self.ttl
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        return now >= self.expires_at
+
+    def should_refresh(self, now: Optional[float] = None, beta: float = CACHE_XFETCH_BETA, rand=random.random) -> bool:
+        # XFetch (Vattani et al.): refresh early with probability rising towards expiry,
+        # so one caller recomputes a hot key before everyone finds it expired
+        now = time.time() if now is None else now
+        if now >= self.expires_at:
+            return True
+        return now - self.delta * beta * math.log(1.0 - rand()) >= self.expires_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"v": self.value, "t": self.created_at, "ttl": self.ttl, "d": self.delta}
+
+    @classmethod
+    def from_dict(cls, data: Any, default_ttl: float) -> "CacheEntry":
+        if isinstance(data, dict) and "v" in data and "t" in data:
+            return cls(value=data["v"], created_at=data["t"], ttl=data.get("ttl", default_ttl), delta=data.get("d", 0.0))
+        # Bare values predate entry metadata; serve them but treat as expired
+        return cls(value=data, created_at=0.0, ttl=default_ttl)
+
+
+class LRUCache:
+    """Size-bounded, TTL-aware in-process cache.
+
+    Thread-safe, so it can be shared with code running on worker threads.
+    """
+
+    def __init__(self, maxsize: int = LOCAL_CACHE_MAXSIZE, ttl: float = LOCAL_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._data[key] = (value, self._clock() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class QuestionCache:
+    """Two-tier cache: in-process LRU in front of Redis.
+
+    Writes and deletes are broadcast on a Redis pub/sub channel so other
+    workers drop their local copy instead of serving a stale one. Entries
+    outlive their TTL by ``stale_ttl`` in Redis so callers can serve the
+    old value while it is refreshed in the background.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        local: Optional[LRUCache] = None,
+        ttl: int = QUESTION_CACHE_TTL,
+        channel: str = CACHE_INVALIDATION_CHANNEL,
+        stale_ttl: int = CACHE_STALE_TTL,
+    ):
+        self._redis = redis_client
+        self.local = local or LRUCache()
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.channel = channel
+        self.worker_id = uuid.uuid4().hex
+        self._pubsub = None
+        self._listener = None
+        self.redis_hits = 0
+        self.redis_misses = 0
+        self.stale_hits = 0
+        self.refreshes = 0
+        self._refreshing: Dict[str, asyncio.Task] = {}
+
+    async def get_entry(self, key: str) -> Optional[CacheEntry]:
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+
+        data = await self._redis.get(key)
+        if data is None:
+            self.redis_misses += 1
+            return None
+        self.redis_hits += 1
+        entry = CacheEntry.from_dict(codec.loads(data), self.ttl)
+        self.local.set(key, entry)
+        return entry
+
+    async def get_entries(self, keys: List[str]) -> List[Optional[CacheEntry]]:
+        # Local hits first, then one MGET for everything else
+        entries = [self.local.get(key) for key in keys]
+        missing = [i for i, entry in enumerate(entries) if entry is None]
+        if not missing:
+            return entries
+        for i, data in zip(missing, await redis_pool.mget(self._redis, [keys[i] for i in missing])):
+            if data is None:
+                self.redis_misses += 1
+                continue
+            self.redis_hits += 1
+            entries[i] = CacheEntry.from_dict(codec.loads(data), self.ttl)
+            self.local.set(keys[i], entries[i])
+        return entries
+
+    async def get(self, key: str) -> Optional[Any]:
+        # Fresh values only; use get_entry to also see stale ones
+        entry = await self.get_entry(key)
+        if entry is None or entry.is_stale():
+            return None
+        return entry.value
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None, delta: float = 0.0):
+        ttl = ttl or self.ttl
+        entry = CacheEntry(value=value, created_at=time.time(), ttl=ttl, delta=delta)
+        async with redis_pool.pipeline(self._redis) as pipe:
+            pipe.setex(key, ttl + self.stale_ttl, codec.dumps(entry.to_dict()))
+            self._publish(pipe, key)
+        self.local.set(key, entry, ttl + self.stale_ttl)
+
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None, delta: float = 0.0):
+        # One pipelined round trip for the writes and their invalidations
+        ttl = ttl or self.ttl
+        now = time.time()
+        async with redis_pool.pipeline(self._redis) as pipe:
+            for key, value in items.items():
+                entry = CacheEntry(value=value, created_at=now, ttl=ttl, delta=delta)
+                pipe.setex(key, ttl + self.stale_ttl, codec.dumps(entry.to_dict()))
+                self._publish(pipe, key)
+                self.local.set(key, entry, ttl + self.stale_ttl)
+
+    def _serve(self, key: str, entry: Optional[CacheEntry], refresh: Callable[[CacheEntry], Awaitable[Any]]) -> Optional[Any]:
+        # Stale-while-revalidate: return whatever we have and, once the entry
+        # is expired or XFetch says so, recompute it off the request path
+        if entry is None:
+            return None
+        if entry.is_stale():
+            self.stale_hits += 1
+        if entry.should_refresh():
+            self.refresh_in_background(key, lambda: refresh(entry))
+        return entry.value
+
+    async def get_or_refresh(
+        self,
+        key: str,
+        refresh: Callable[[CacheEntry], Awaitable[Any]],
+    ) -> Optional[Any]:
+        return self._serve(key, await self.get_entry(key), refresh)
+
+    async def get_many_or_refresh(
+        self,
+        keys: List[str],
+        refresh: Callable[[str, CacheEntry], Awaitable[Any]],
+    ) -> List[Optional[Any]]:
+        entries = await self.get_entries(keys)
+        return [
+            self._serve(key, entry, lambda stale, key=key: refresh(key, stale))
+            for key, entry in zip(keys, entries)
+        ]
+
+    def refresh_in_background(self, key: str, fn: Callable[[], Awaitable[Any]]):
+        if key in self._refreshing:
+            return
+        self.refreshes += 1
+        task = asyncio.ensure_future(fn())
+        self._refreshing[key] = task
+        task.add_done_callback(lambda t: self._refresh_done(key, t))
+
+    def _refresh_done(self, key: str, task: asyncio.Task):
+        self._refreshing.pop(key, None)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Background cache refresh failed for {key}: {task.exception()}")
+
+    async def delete(self, key: str):
+        async with redis_pool.pipeline(self._redis) as pipe:
+            pipe.delete(key)
+            self._publish(pipe, key)
+        self.local.delete(key)
+
+    def _publish(self, pipe, key: str):
+        pipe.publish(self.channel, f"{self.worker_id}:{key}")
+
+    def _on_invalidate(self, message):
+        data = message.get("data")
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        sender, _, key = data.partition(":")
+        if sender != self.worker_id:
+            self.local.delete(key)
+
+    async def _listen(self):
+        while True:
+            try:
+                if self._pubsub is None:
+                    self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                    await self._pubsub.subscribe(self.channel)
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is not None:
+                    self._on_invalidate(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Resubscribe on a fresh connection; anything missed meanwhile ages out via LOCAL_CACHE_TTL
+                print(f"Cache invalidation listener error: {e}")
+                await self._close_pubsub()
+                await asyncio.sleep(1)
+
+    async def _close_pubsub(self):
+        if self._pubsub is not None:
+            pubsub, self._pubsub = self._pubsub, None
+            try:
+                await pubsub.aclose()
+            except Exception:
+                pass
+
+    async def start(self):
+        if self._listener is not None:
+            return
+        self._listener = asyncio.ensure_future(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        await self._close_pubsub()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "local": self.local.stats(),
+            "redis": {"hits": self.redis_hits, "misses": self.redis_misses},
+            "stale_hits": self.stale_hits,
+            "refreshes": self.refreshes,
+        }
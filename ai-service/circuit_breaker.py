@@ -0,0 +1,148 @@
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+# Circuit breaker configuration
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", 60))
+# Fewer calls than this in the window never trip the breaker
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", 10))
+CIRCUIT_ERROR_RATE = float(os.getenv("CIRCUIT_ERROR_RATE", 0.5))
+# Calls slower than this count towards the slow-call rate
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", 20))
+CIRCUIT_SLOW_CALL_RATE = float(os.getenv("CIRCUIT_SLOW_CALL_RATE", 0.5))
+# How long the breaker stays open before letting a probe call through
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", 30))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Fails upstream calls fast while the upstream is failing or crawling.
+
+    Trips open when, over the last ``window`` seconds, the share of failed
+    calls or of calls slower than ``slow_call_seconds`` reaches its rate.
+    After ``open_seconds`` one probe call is let through: success closes
+    the breaker, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        window: float = CIRCUIT_WINDOW_SECONDS,
+        min_calls: int = CIRCUIT_MIN_CALLS,
+        error_rate: float = CIRCUIT_ERROR_RATE,
+        slow_call_seconds: float = CIRCUIT_SLOW_CALL_SECONDS,
+        slow_call_rate: float = CIRCUIT_SLOW_CALL_RATE,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self._failures = 0
+        self._slow = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_at: Optional[float] = None
+        self.trips = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probe_at = None
+        return self._state
+
+    def allow(self):
+        state = self.state
+        now = self._clock()
+        if state == HALF_OPEN and (self._probe_at is None or now - self._probe_at >= self.open_seconds):
+            # One probe at a time; a probe that never reported back is replaced
+            self._probe_at = now
+            return
+        if state != CLOSED:
+            self.rejected += 1
+            retry_in = max(0.0, self._opened_at + self.open_seconds - now)
+            raise CircuitOpenError(f"LLM upstream unavailable; retry in {retry_in:.0f}s")
+
+    def record(self, ok: bool, latency: float):
+        now = self._clock()
+        slow = latency >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            if ok and not slow:
+                self._close()
+            else:
+                self._trip(now)
+            return
+        if self._state == OPEN:
+            return
+
+        self._calls.append((now, not ok, slow))
+        self._failures += not ok
+        self._slow += slow
+        while self._calls and self._calls[0][0] < now - self.window:
+            _, failed, was_slow = self._calls.popleft()
+            self._failures -= failed
+            self._slow -= was_slow
+        total = len(self._calls)
+        if total >= self.min_calls and (
+            self._failures / total >= self.error_rate or self._slow / total >= self.slow_call_rate
+        ):
+            self._trip(now)
+
+    def _trip(self, now: float):
+        self._state = OPEN
+        self._opened_at = now
+        self._probe_at = None
+        self.trips += 1
+        self._reset_window()
+
+    def _close(self):
+        self._state = CLOSED
+        self._probe_at = None
+        self._reset_window()
+
+    def _reset_window(self):
+        self._calls.clear()
+        self._failures = 0
+        self._slow = 0
+
+    def stats(self) -> Dict[str, Any]:
+        total = len(self._calls)
+        return {
+            "state": self.state,
+            "calls": total,
+            "error_rate": round(self._failures / total, 3) if total else 0.0,
+            "slow_call_rate": round(self._slow / total, 3) if total else 0.0,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for picking a hedging delay."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -0,0 +1,101 @@
+import ast
+import json
+import os
+import zlib
+from typing import Any
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+# Every encoded value starts with a 3-byte header: version, format, compression
+CODEC_VERSION = 1
+
+FORMAT_JSON = 1
+FORMAT_MSGPACK = 2
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+CACHE_COMPRESS_THRESHOLD = int(os.getenv("CACHE_COMPRESS_THRESHOLD", 1024))
+CACHE_COMPRESSION_LEVEL = int(os.getenv("CACHE_COMPRESSION_LEVEL", 3))
+
+DEFAULT_FORMAT = FORMAT_MSGPACK if msgpack is not None else FORMAT_JSON
+DEFAULT_COMPRESSION = COMPRESSION_ZSTD if zstandard is not None else COMPRESSION_ZLIB
+
+
+class CodecError(ValueError):
+    pass
+
+
+def _serialize(value: Any, fmt: int) -> bytes:
+    if fmt == FORMAT_MSGPACK:
+        return msgpack.packb(value, use_bin_type=True)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _deserialize(payload: bytes, fmt: int) -> Any:
+    if fmt == FORMAT_MSGPACK:
+        if msgpack is None:
+            raise CodecError("msgpack-encoded value but msgpack is not installed")
+        return msgpack.unpackb(payload, raw=False)
+    if fmt == FORMAT_JSON:
+        return json.loads(payload)
+    raise CodecError(f"Unknown cache format {fmt}")
+
+
+def _compress(payload: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=CACHE_COMPRESSION_LEVEL).compress(payload)
+    return zlib.compress(payload, CACHE_COMPRESSION_LEVEL)
+
+
+def _decompress(payload: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_NONE:
+        return payload
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(payload)
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise CodecError("zstd-compressed value but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise CodecError(f"Unknown cache compression {compression}")
+
+
+def dumps(
+    value: Any,
+    fmt: int = DEFAULT_FORMAT,
+    compression: int = DEFAULT_COMPRESSION,
+    threshold: int = CACHE_COMPRESS_THRESHOLD,
+) -> bytes:
+    payload = _serialize(value, fmt)
+    # Small values aren't worth the CPU; only compress above the threshold
+    if compression != COMPRESSION_NONE and len(payload) >= threshold:
+        payload = _compress(payload, compression)
+    else:
+        compression = COMPRESSION_NONE
+    return bytes((CODEC_VERSION, fmt, compression)) + payload
+
+
+def loads(data: bytes) -> Any:
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if not data:
+        raise CodecError("Empty cache value")
+    if data[0] != CODEC_VERSION:
+        # Entries written before the codec existed were str(value)
+        try:
+            return ast.literal_eval(data.decode("utf-8"))
+        except (ValueError, SyntaxError, UnicodeDecodeError) as e:
+            raise CodecError(f"Unrecognised cache value: {e}")
+    if len(data) < 3:
+        raise CodecError("Truncated cache value")
+    fmt, compression = data[1], data[2]
+    return _deserialize(_decompress(data[3:], compression), fmt)
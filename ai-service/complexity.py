@@ -0,0 +1,125 @@
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Complexity estimation configuration
+COMPLEXITY_MIN_SIZE = int(os.getenv("COMPLEXITY_MIN_SIZE", 64))
+COMPLEXITY_MAX_SIZE = int(os.getenv("COMPLEXITY_MAX_SIZE", 65536))
+# Most input sizes a caller may ask for in one ladder
+COMPLEXITY_MAX_SIZES = int(os.getenv("COMPLEXITY_MAX_SIZES", 32))
+COMPLEXITY_REPEATS = int(os.getenv("COMPLEXITY_REPEATS", 3))
+COMPLEXITY_MAX_REPEATS = int(os.getenv("COMPLEXITY_MAX_REPEATS", 10))
+# A single call slower than this ends the ladder; larger sizes would only take longer
+COMPLEXITY_MAX_CALL_SECONDS = float(os.getenv("COMPLEXITY_MAX_CALL_SECONDS", 0.5))
+COMPLEXITY_BUDGET_SECONDS = float(os.getenv("COMPLEXITY_BUDGET_SECONDS", 10))
+COMPLEXITY_MIN_POINTS = int(os.getenv("COMPLEXITY_MIN_POINTS", 4))
+# Below this R² no growth model explains the timings better than a constant
+COMPLEXITY_MIN_R2 = float(os.getenv("COMPLEXITY_MIN_R2", 0.8))
+# A more complex class must cut the simpler one's residual error by this fraction to be chosen
+COMPLEXITY_IMPROVEMENT = float(os.getenv("COMPLEXITY_IMPROVEMENT", 0.5))
+
+CONSTANT = "O(1)"
+
+# Growth terms, simplest first; near-ties go to the earlier entry
+COMPLEXITY_CLASSES: List[tuple] = [
+    ("O(log n)", np.log2),
+    ("O(n)", lambda n: n),
+    ("O(n log n)", lambda n: n * np.log2(n)),
+    ("O(n²)", lambda n: n ** 2),
+    ("O(n³)", lambda n: n ** 3),
+]
+
+
+class ComplexityFitError(ValueError):
+    pass
+
+
+class TooFewPointsError(ComplexityFitError):
+    pass
+
+
+def size_ladder(min_size: int = COMPLEXITY_MIN_SIZE, max_size: int = COMPLEXITY_MAX_SIZE) -> List[int]:
+    # Doubling sizes spread the points evenly on a log scale
+    sizes = []
+    n = max(2, min_size)
+    while n <= max_size:
+        sizes.append(n)
+        n *= 2
+    return sizes
+
+
+def _fit(n: np.ndarray, t: np.ndarray, term: Callable) -> Optional[Dict[str, float]]:
+    growth = term(n)
+    # Scaled to [0, 1] so n³ at large n doesn't wreck the conditioning
+    growth = growth / growth.max()
+    design = np.column_stack([np.ones_like(n), growth])
+    # Weighted by 1/t: relative error, so the few largest sizes don't decide
+    # the fit on their own and the small sizes still count
+    (intercept, slope), *_ = np.linalg.lstsq(design / t[:, None], np.ones_like(t), rcond=None)
+    if slope < 0:
+        # Shrinking with n is not growth; this class can't describe the timings
+        return None
+    return _quality(t, design @ np.array([intercept, slope]))
+
+
+def _quality(t: np.ndarray, predicted: np.ndarray) -> Dict[str, float]:
+    # Both measures use relative residuals, matching the weighted fit
+    residuals = (t - predicted) / t
+    sse = float(residuals @ residuals)
+    # Best constant under the same weighting
+    constant = (1 / t).sum() / (1 / t ** 2).sum()
+    baseline = (t - constant) / t
+    sst = float(baseline @ baseline)
+    return {
+        "r_squared": 1 - sse / sst if sst > 0 else 0.0,
+        "nrmse": float(np.sqrt(sse / len(t))),
+    }
+
+
+def fit_complexity(timings: Sequence[Sequence[float]], min_r2: float = COMPLEXITY_MIN_R2) -> Dict[str, Any]:
+    """Pick the complexity class whose growth best fits ``[n, seconds]`` timings.
+
+    Each class is fitted as ``t = a + b * f(n)`` by least squares on relative
+    error and ranked by that error, preferring the simpler class on near-ties. The winner
+    must reach ``min_r2``; otherwise the timings are too flat or too noisy
+    to claim growth and the answer is O(1). Neighbouring classes such as
+    O(n) and O(n log n) are only separable when timings are well above noise.
+    """
+    if len(timings) < COMPLEXITY_MIN_POINTS:
+        raise TooFewPointsError(
+            f"Need timings for at least {COMPLEXITY_MIN_POINTS} input sizes, got {len(timings)}"
+        )
+    data = np.asarray(timings, dtype=float)
+    # Clock resolution floor, so relative errors stay finite
+    n, t = data[:, 0], np.maximum(data[:, 1], 1e-9)
+
+    constant = (1 / t).sum() / (1 / t ** 2).sum()
+    fits = {CONSTANT: _quality(t, np.full_like(t, constant))}
+    try:
+        for name, term in COMPLEXITY_CLASSES:
+            fits[name] = _fit(n, t, term)
+    except np.linalg.LinAlgError as e:
+        raise ComplexityFitError(f"Timings could not be fitted: {e}")
+
+    best = CONSTANT
+    for name, _ in COMPLEXITY_CLASSES:
+        if fits[name] is not None and fits[name]["nrmse"] < fits[best]["nrmse"] * (1 - COMPLEXITY_IMPROVEMENT):
+            best = name
+    if fits[best]["r_squared"] < min_r2:
+        best = CONSTANT
+
+    # Slope on log-log axes: ~1 for linear, ~2 for quadratic; a sanity check on the class
+    positive = t > 0
+    exponent = float(np.polyfit(np.log(n[positive]), np.log(t[positive]), 1)[0]) if positive.sum() >= 2 else 0.0
+
+    return {
+        "complexity": best,
+        "r_squared": fits[best]["r_squared"],
+        "nrmse": fits[best]["nrmse"],
+        "exponent": round(exponent, 3),
+        "fits": {
+            name: {key: round(value, 4) for key, value in fit.items()} if fit is not None else None
+            for name, fit in fits.items()
+        },
+    }
@@ -0,0 +1,111 @@
+from collections import Counter
+
+import pytest
+
+
+class FakeRedis:
+    """In-memory stand-in for the redis.asyncio client, just the commands the service uses.
+
+    Commands are written as plain methods prefixed with ``_``. Awaited on the
+    client, each one is a round trip; queued on a pipeline, they all share
+    one. Scripts are whatever async callables a test puts in ``scripts``,
+    keyed by the script's source.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.sets = {}
+        self.lists = {}
+        self.stream = []
+        self.acked = []
+        self.published = []
+        self.scripts = {}
+        self.calls = Counter()
+        self.round_trips = 0
+
+    def __getattr__(self, name):
+        command = getattr(self, f"_{name}")
+
+        async def call(*args, **kwargs):
+            self.calls[name] += 1
+            self.round_trips += 1
+            return command(*args, **kwargs)
+
+        return call
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        return self.scripts[script]
+
+    def _get(self, key):
+        return self.data.get(key)
+
+    def _mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def _set(self, key, value, nx=False, ex=None, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def _setex(self, key, ttl, value):
+        self.data[key] = value
+        return True
+
+    def _delete(self, key):
+        return 1 if self.data.pop(key, None) is not None else 0
+
+    def _publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+    def _sadd(self, key, member):
+        members = self.sets.setdefault(key, set())
+        if member in members:
+            return 0
+        members.add(member)
+        return 1
+
+    def _rpush(self, key, value):
+        self.lists.setdefault(key, []).append(value)
+        return len(self.lists[key])
+
+    def _lrange(self, key, start, end):
+        values = self.lists.get(key, [])
+        return values[start:] if end == -1 else values[start:end + 1]
+
+    def _xadd(self, stream, fields, maxlen=None, approximate=True):
+        message_id = f"{len(self.stream) + 1}-0"
+        self.stream.append((message_id, fields))
+        return message_id
+
+    def _xack(self, stream, group, message_id):
+        self.acked.append(message_id)
+        return 1
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.redis, f"_{name}")
+
+        def queue(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+
+        return queue
+
+    async def execute(self):
+        commands, self.commands = self.commands, []
+        self.redis.round_trips += 1
+        return [command(*args, **kwargs) for command, args, kwargs in commands]
+
+
+@pytest.fixture
+def redis_client():
+    return FakeRedis()
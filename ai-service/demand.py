@@ -0,0 +1,45 @@
+import json
+import os
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+import redis_pool
+
+# Question demand is counted in hourly buckets and decayed when read,
+# so recent traffic outweighs yesterday's
+DEMAND_KEY_PREFIX = "demand:questions"
+DEMAND_BUCKET_SECONDS = int(os.getenv("DEMAND_BUCKET_SECONDS", 3600))
+DEMAND_WINDOW_BUCKETS = int(os.getenv("DEMAND_WINDOW_BUCKETS", 24))
+DEMAND_DECAY = float(os.getenv("DEMAND_DECAY", 0.8))
+
+
+def _bucket(now: Optional[float] = None) -> int:
+    return int((time.time() if now is None else now) // DEMAND_BUCKET_SECONDS)
+
+
+async def record(redis_client, topic: str, difficulty: str, now: Optional[float] = None):
+    key = f"{DEMAND_KEY_PREFIX}:{_bucket(now)}"
+    async with redis_pool.pipeline(redis_client) as pipe:
+        pipe.zincrby(key, 1, json.dumps([topic, difficulty]))
+        pipe.expire(key, DEMAND_BUCKET_SECONDS * DEMAND_WINDOW_BUCKETS)
+
+
+async def top(redis_client, limit: int, now: Optional[float] = None) -> List[Tuple[str, str, float]]:
+    current = _bucket(now)
+    weights = {
+        f"{DEMAND_KEY_PREFIX}:{current - age}": DEMAND_DECAY ** age
+        for age in range(DEMAND_WINDOW_BUCKETS)
+    }
+    rollup_key = f"{DEMAND_KEY_PREFIX}:rollup:{uuid.uuid4().hex}"
+    pipe = redis_client.pipeline()
+    pipe.zunionstore(rollup_key, weights)
+    pipe.zrevrange(rollup_key, 0, limit - 1, withscores=True)
+    pipe.delete(rollup_key)
+    _, rows, _ = await pipe.execute()
+
+    results = []
+    for member, score in rows:
+        topic, difficulty = json.loads(member)
+        results.append((topic, difficulty, score))
+    return results
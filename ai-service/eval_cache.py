@@ -0,0 +1,71 @@
+import ast
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import codec
+import redis_pool
+from sandbox import SANDBOX_RUNNER_VERSION
+
+EVAL_CACHE_TTL = int(os.getenv("EVAL_CACHE_TTL", 7 * 24 * 3600))
+# Change to invalidate every cached evaluation, e.g. after a prompt change
+EVAL_CACHE_SALT = os.getenv("EVAL_CACHE_SALT", "1")
+
+
+def _sha256(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=repr)
+
+
+def submission_digest(code: str, profile_lines: bool = False) -> str:
+    # Comments, blank lines and formatting don't change the AST dump
+    normalized = ast.dump(ast.parse(code), annotate_fields=False, include_attributes=False)
+    mode = "lines" if profile_lines else "basic"
+    return _sha256(f"runner-{SANDBOX_RUNNER_VERSION}", EVAL_CACHE_SALT, mode, normalized)
+
+
+class EvaluationCache:
+    """Content-addressed cache of test-case outcomes and review feedback."""
+
+    def __init__(self, redis_client, ttl: int = EVAL_CACHE_TTL):
+        self._redis = redis_client
+        self.ttl = ttl
+
+    @staticmethod
+    def case_key(digest: str, test_case: Dict[str, Any]) -> str:
+        return f"eval:case:{_sha256(digest, _canonical(test_case))}"
+
+    @staticmethod
+    def feedback_key(digest: str, test_cases: List[Dict[str, Any]]) -> str:
+        return f"eval:feedback:{_sha256(digest, _canonical(test_cases))}"
+
+    async def get_cases(self, digest: str, test_cases: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        if not test_cases:
+            return []
+        values = await redis_pool.mget(self._redis, [self.case_key(digest, test_case) for test_case in test_cases])
+        return [codec.loads(value) if value is not None else None for value in values]
+
+    async def set_cases(self, digest: str, items: List[tuple]):
+        encoded = {}
+        for test_case, result in items:
+            try:
+                encoded[self.case_key(digest, test_case)] = codec.dumps(result)
+            except (TypeError, ValueError):
+                # Outputs that can't be serialised are simply not cached
+                continue
+        await redis_pool.setex_many(self._redis, encoded, self.ttl)
+
+    async def get_feedback(self, digest: str, test_cases: List[Dict[str, Any]]) -> Optional[str]:
+        value = await self._redis.get(self.feedback_key(digest, test_cases))
+        return codec.loads(value) if value is not None else None
+
+    async def set_feedback(self, digest: str, test_cases: List[Dict[str, Any]], feedback: str):
+        await self._redis.setex(self.feedback_key(digest, test_cases), self.ttl, codec.dumps(feedback))
@@ -0,0 +1,195 @@
+import os
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from json_stream import JSONObjectStream, extract_json
+from llm import get_llm_client
+
+# Rough completion size of one question, used to pack batch prompts
+LLM_TOKENS_PER_QUESTION = int(os.getenv("LLM_TOKENS_PER_QUESTION", 180))
+# Completion tokens one batched call may ask for
+LLM_BATCH_MAX_TOKENS = int(os.getenv("LLM_BATCH_MAX_TOKENS", 3500))
+
+QuestionSpec = Tuple[str, str, int]
+
+# A numbered entry of a batched reply: "3": [
+_BATCH_KEY = re.compile(r"""(["'])(\d+)\1\s*:\s*\[""")
+
+
+def validate_question(question: Any) -> Optional[Dict[str, Any]]:
+    """The question with just the schema's keys, or None if it doesn't fit.
+
+    Needs a non-empty stem, at least two non-empty options (a list, or a
+    letter-keyed object) and an answer; the explanation may be missing.
+    """
+    if not isinstance(question, dict):
+        return None
+    stem = question.get("question")
+    options = question.get("options")
+    answer = question.get("answer")
+    explanation = question.get("explanation", "")
+    values = list(options.values()) if isinstance(options, dict) else options
+    if not isinstance(stem, str) or not stem.strip():
+        return None
+    if not isinstance(values, list) or len(values) < 2:
+        return None
+    if not all(isinstance(option, str) and option.strip() for option in values):
+        return None
+    if not isinstance(answer, (str, int)) or isinstance(answer, bool) or answer == "":
+        return None
+    if not isinstance(explanation, str):
+        return None
+    return {"question": stem, "options": options, "answer": answer, "explanation": explanation}
+
+
+def parse_questions(content: str) -> List[Dict[str, Any]]:
+    # Every valid question in the reply, even if the array around them is
+    # fenced, cut short or has a broken neighbour
+    return JSONObjectStream(validate=validate_question).feed(content)
+
+
+def parse_question_batch(content: str) -> Dict[str, List[Dict[str, Any]]]:
+    answers = extract_json(content)
+    if isinstance(answers, dict):
+        return {
+            str(key): [q for q in map(validate_question, questions) if q is not None]
+            for key, questions in answers.items()
+            if isinstance(questions, list)
+        }
+    # Cut short or beyond repair: salvage each numbered array on its own
+    sections = {}
+    keys = list(_BATCH_KEY.finditer(content))
+    for key, following in zip(keys, keys[1:] + [None]):
+        end = following.start() if following is not None else len(content)
+        sections[key.group(2)] = parse_questions(content[key.end():end])
+    return sections
+
+
+def _question_messages(topic: str, difficulty: str, num_questions: int) -> List[Dict[str, str]]:
+    prompt = f"""
+    Generate {num_questions} multiple choice questions about {topic}.
+    Difficulty level: {difficulty}
+    Each question should have:
+    1. A clear question stem
+    2. 4 options (A, B, C, D)
+    3. The correct answer
+    4. A brief explanation
+    Format as a JSON array of objects with keys: question, options, answer, explanation
+    """
+    return [
+        {"role": "system", "content": "You are an expert educational content creator."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+async def _ask_for_questions(topic: str, difficulty: str, num_questions: int) -> List[Dict[str, Any]]:
+    content = await get_llm_client().chat(
+        messages=_question_messages(topic, difficulty, num_questions),
+        temperature=0.7,
+        completion_tokens=num_questions * LLM_TOKENS_PER_QUESTION,
+    )
+    return parse_questions(content)
+
+
+async def generate_questions_with_llm(topic: str, difficulty: str, num_questions: int) -> List[Dict[str, Any]]:
+    questions = await _ask_for_questions(topic, difficulty, num_questions)
+    if 0 < len(questions) < num_questions:
+        # Keep what parsed and only ask for the rest
+        missing = num_questions - len(questions)
+        print(f"Salvaged {len(questions)}/{num_questions} questions about {topic}; generating {missing} more")
+        questions += await _ask_for_questions(topic, difficulty, missing)
+    if not questions:
+        raise ValueError(f"Model returned no valid questions about {topic}")
+    return questions[:num_questions]
+
+
+async def stream_questions_with_llm(topic: str, difficulty: str, num_questions: int) -> AsyncIterator[Dict[str, Any]]:
+    # Yield each question as soon as the model has finished writing it
+    parser = JSONObjectStream(validate=validate_question)
+    emitted = 0
+    chunks = get_llm_client().chat_stream(
+        messages=_question_messages(topic, difficulty, num_questions),
+        temperature=0.7,
+        completion_tokens=num_questions * LLM_TOKENS_PER_QUESTION,
+    )
+    try:
+        async for chunk in chunks:
+            for question in parser.feed(chunk):
+                yield question
+                emitted += 1
+                if emitted >= num_questions:
+                    return
+    finally:
+        await chunks.aclose()
+
+
+def pack_specs(
+    specs: Sequence[QuestionSpec],
+    max_tokens: int = LLM_BATCH_MAX_TOKENS,
+    tokens_per_question: int = LLM_TOKENS_PER_QUESTION,
+) -> List[List[int]]:
+    """Group spec indices into as few calls as fit in ``max_tokens`` each.
+
+    First-fit decreasing: biggest specs are placed first, each into the first
+    batch with room left. A spec larger than the budget gets a call to itself.
+    """
+    batches: List[List[int]] = []
+    loads: List[int] = []
+    order = sorted(range(len(specs)), key=lambda i: specs[i][2], reverse=True)
+    for i in order:
+        cost = specs[i][2] * tokens_per_question
+        for b, load in enumerate(loads):
+            if load + cost <= max_tokens:
+                batches[b].append(i)
+                loads[b] += cost
+                break
+        else:
+            batches.append([i])
+            loads.append(cost)
+    return [sorted(batch) for batch in batches]
+
+
+def _batch_messages(specs: Sequence[QuestionSpec]) -> List[Dict[str, str]]:
+    requests = "\n".join(
+        f"    [{i}] {num_questions} questions about {topic}, difficulty level: {difficulty}"
+        for i, (topic, difficulty, num_questions) in enumerate(specs)
+    )
+    prompt = f"""
+    Generate multiple choice questions for each of these numbered requests:
+{requests}
+    Each question should have:
+    1. A clear question stem
+    2. 4 options (A, B, C, D)
+    3. The correct answer
+    4. A brief explanation
+    Format as a JSON object mapping each request number (as a string) to a JSON array
+    of objects with keys: question, options, answer, explanation
+    """
+    return [
+        {"role": "system", "content": "You are an expert educational content creator."},
+        {"role": "user", "content": prompt}
+    ]
+
+
+async def generate_question_batch_with_llm(specs: Sequence[QuestionSpec]) -> List[Optional[List[Dict[str, Any]]]]:
+    # One call for several specs. Entries the model left out or cut short
+    # come back as None so the caller can generate them on their own.
+    if len(specs) == 1:
+        topic, difficulty, num_questions = specs[0]
+        return [await generate_questions_with_llm(topic, difficulty, num_questions)]
+
+    content = await get_llm_client().chat(
+        messages=_batch_messages(specs),
+        temperature=0.7,
+        completion_tokens=sum(num_questions for _, _, num_questions in specs) * LLM_TOKENS_PER_QUESTION,
+    )
+    answers = parse_question_batch(content)
+
+    results: List[Optional[List[Dict[str, Any]]]] = []
+    for i, (_, _, num_questions) in enumerate(specs):
+        questions = answers.get(str(i))
+        if isinstance(questions, list) and len(questions) >= num_questions:
+            results.append(questions[:num_questions])
+        else:
+            results.append(None)
+    return results
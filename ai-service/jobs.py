@@ -0,0 +1,143 @@
+import asyncio
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import codec
+
+# Job queue configuration
+JOB_TTL = int(os.getenv("JOB_TTL", 3600))
+# Keep below REDIS_SOCKET_TIMEOUT or the blocking read times out first
+JOB_BLOCK_MS = int(os.getenv("JOB_BLOCK_MS", 5000))
+# Messages a dead consumer read but never acked are reclaimed after this long
+JOB_CLAIM_IDLE_MS = int(os.getenv("JOB_CLAIM_IDLE_MS", 120000))
+JOB_STREAM_MAXLEN = int(os.getenv("JOB_STREAM_MAXLEN", 10000))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+def _text(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class JobQueue:
+    """Background jobs on a Redis stream with a consumer group.
+
+    ``submit`` appends a job and returns its id straight away; consumers
+    in any worker process pick it up, run ``handler`` and store the result
+    under ``job:{stream}:{id}`` for polling or streaming to the client.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        stream: str,
+        handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        group: Optional[str] = None,
+        ttl: int = JOB_TTL,
+    ):
+        self._redis = redis_client
+        self.stream = stream
+        self.group = group or f"{stream}:workers"
+        self._handler = handler
+        self.ttl = ttl
+        self.consumer_prefix = f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+
+    def _state_key(self, job_id: str) -> str:
+        return f"job:{self.stream}:{job_id}"
+
+    def _dedupe_key(self, dedupe_key: str) -> str:
+        return f"job:{self.stream}:key:{dedupe_key}"
+
+    async def _set_state(self, job_id: str, state: Dict[str, Any]):
+        await self._redis.setex(self._state_key(job_id), self.ttl, codec.dumps(state))
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        value = await self._redis.get(self._state_key(job_id))
+        return codec.loads(value) if value is not None else None
+
+    async def submit(self, payload: Dict[str, Any], dedupe_key: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        if dedupe_key is not None:
+            # Identical work already queued or running: hand back that job instead
+            if not await self._redis.set(self._dedupe_key(dedupe_key), job_id, nx=True, ex=self.ttl):
+                existing = await self._redis.get(self._dedupe_key(dedupe_key))
+                if existing is not None:
+                    return _text(existing)
+        await self._set_state(job_id, {"status": PENDING, "dedupe_key": dedupe_key})
+        await self._redis.xadd(
+            self.stream,
+            {"job_id": job_id, "payload": codec.dumps(payload)},
+            maxlen=JOB_STREAM_MAXLEN,
+            approximate=True,
+        )
+        return job_id
+
+    async def _ensure_group(self):
+        try:
+            await self._redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _process(self, message_id, fields):
+        try:
+            if not fields:
+                return
+            fields = {_text(key): value for key, value in fields.items()}
+            job_id = _text(fields["job_id"])
+            state = await self.get(job_id) or {}
+            dedupe_key = state.get("dedupe_key")
+            await self._set_state(job_id, {"status": RUNNING, "dedupe_key": dedupe_key})
+            try:
+                result = await self._handler(codec.loads(fields["payload"]))
+                await self._set_state(job_id, {"status": DONE, **result})
+            except Exception as e:
+                print(f"Job {job_id} on {self.stream} failed: {e}")
+                await self._set_state(job_id, {"status": FAILED, "error": str(e)})
+            if dedupe_key is not None:
+                await self._redis.delete(self._dedupe_key(dedupe_key))
+        finally:
+            await self._redis.xack(self.stream, self.group, message_id)
+
+    async def _consume(self, consumer: str):
+        while True:
+            try:
+                # Pick up work abandoned by crashed consumers before reading new jobs
+                _, messages, *_ = await self._redis.xautoclaim(
+                    self.stream, self.group, consumer,
+                    min_idle_time=JOB_CLAIM_IDLE_MS, start_id="0-0", count=10,
+                )
+                if not messages:
+                    response = await self._redis.xreadgroup(
+                        self.group, consumer, {self.stream: ">"},
+                        count=1, block=JOB_BLOCK_MS,
+                    )
+                    messages = response[0][1] if response else []
+                for message_id, fields in messages:
+                    await self._process(message_id, fields)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job consumer {consumer} error: {e}")
+                await asyncio.sleep(1)
+
+    async def start(self, concurrency: int = 1):
+        if self._tasks:
+            return
+        await self._ensure_group()
+        self._tasks = [
+            asyncio.ensure_future(self._consume(f"{self.consumer_prefix}-{i}"))
+            for i in range(concurrency)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,171 @@
+import json
+import re
+from typing import Any, Callable, List, Optional
+
+_FENCE = re.compile(r"```(?:json)?\s*([\s\S]*?)(?:```|$)")
+# Literals a model writes when it slips into Python
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+def repair_json(text: str) -> str:
+    """Fix the defects models commonly leave in JSON.
+
+    Single-quoted strings become double-quoted, trailing commas before a
+    closing bracket are dropped, and Python's True/False/None become their
+    JSON spellings. Double-quoted strings are copied untouched.
+    """
+    out = []
+    i, n = 0, len(text)
+    while i < n:
+        char = text[i]
+        if char == '"':
+            j = i + 1
+            while j < n and text[j] != '"':
+                j += 2 if text[j] == "\\" else 1
+            out.append(text[i:j + 1])
+            i = j + 1
+        elif char == "'":
+            j = i + 1
+            chars = []
+            while j < n and text[j] != "'":
+                if text[j] == "\\" and j + 1 < n:
+                    chars.append("'" if text[j + 1] == "'" else text[j:j + 2])
+                    j += 2
+                else:
+                    chars.append('\\"' if text[j] == '"' else text[j])
+                    j += 1
+            out.append('"' + "".join(chars) + '"')
+            i = j + 1
+        elif char == ",":
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            if j < n and text[j] in "]}":
+                i = j
+            else:
+                out.append(char)
+                i += 1
+        elif char.isalpha() or char == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_PY_LITERALS.get(word, word))
+            i = j
+        else:
+            out.append(char)
+            i += 1
+    return "".join(out)
+
+
+def loads_tolerant(text: str) -> Any:
+    """json.loads, retried once on the repaired text. Raises ValueError."""
+    try:
+        return json.loads(text, strict=False)
+    except ValueError:
+        return json.loads(repair_json(text), strict=False)
+
+
+def extract_json(text: str) -> Optional[Any]:
+    """The JSON value in a model reply, or None.
+
+    Looks inside a code fence if there is one, then falls back to the span
+    from the first opening bracket to the last closing one, so prose around
+    the value doesn't matter.
+    """
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    candidates = [text.strip()]
+    starts = [i for i in (text.find("["), text.find("{")) if i >= 0]
+    if starts:
+        start = min(starts)
+        end = max(text.rfind("]"), text.rfind("}"))
+        if end > start:
+            candidates.append(text[start:end + 1])
+    for candidate in candidates:
+        try:
+            return loads_tolerant(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+class JSONObjectStream:
+    """Pulls complete top-level JSON objects out of text as it streams in.
+
+    The model is asked for a JSON array of objects; each object is emitted
+    as soon as its closing brace arrives, without waiting for the array.
+    Anything outside an object (prose, code fences, commas) is skipped.
+    Objects are repaired with repair_json when they don't parse as is, and
+    ``validate`` may clean an object up or reject it by returning None. A
+    rejected object that wraps exactly one list of objects, as in
+    ``{"questions": [...]}``, is replaced by that list's valid objects.
+    """
+
+    def __init__(self, validate: Optional[Callable[[Any], Optional[Any]]] = None):
+        self.validate = validate
+        self.rejected = 0
+        self._text = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._quote: Optional[str] = None
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        self._text += chunk
+        text = self._text
+        objects = []
+        i = self._pos
+        while i < len(text):
+            char = text[i]
+            if self._quote:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == self._quote:
+                    self._quote = None
+            elif self._depth > 0 and char in "\"'":
+                self._quote = char
+            elif char == "{":
+                if self._depth == 0:
+                    self._start = i
+                self._depth += 1
+            elif char == "}" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    objects.extend(self._parse(text[self._start:i + 1]))
+                    self._start = None
+            i += 1
+
+        # Drop everything before the object currently being read
+        if self._start is None:
+            self._text, self._pos = "", 0
+        else:
+            self._text, self._pos = text[self._start:], i - self._start
+            self._start = 0
+        return objects
+
+    def _parse(self, candidate: str) -> List[Any]:
+        try:
+            parsed = loads_tolerant(candidate)
+        except ValueError:
+            self.rejected += 1
+            return []
+        if self.validate is None:
+            return [parsed]
+        valid = self.validate(parsed)
+        if valid is not None:
+            return [valid]
+        wrapped = [
+            value for value in parsed.values()
+            if isinstance(value, list) and value and all(isinstance(item, dict) for item in value)
+        ] if isinstance(parsed, dict) else []
+        if len(wrapped) != 1:
+            self.rejected += 1
+            return []
+        objects = [item for item in map(self.validate, wrapped[0]) if item is not None]
+        self.rejected += len(wrapped[0]) - len(objects)
+        return objects
@@ -0,0 +1,238 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, LatencyTracker
+from providers import Completion, Provider, ProviderRateLimited, ProviderUnavailable, create_provider
+from rate_limit import LLM_DEFAULT_COMPLETION_TOKENS, RateLimitExceeded, TokenBucketLimiter, estimate_tokens
+from scheduler import INTERACTIVE, FairScheduler, current_context
+
+# LLM configuration
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60))
+# Hedging: interactive calls still running at this latency percentile get a
+# second request, and the first answer wins. The budget caps hedges at this
+# share of hedge-eligible calls.
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", 0.95))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", 0.05))
+
+# Failures that say the upstream is unhealthy, as opposed to a bad request or our own quota
+UPSTREAM_FAILURES = (asyncio.TimeoutError, ProviderUnavailable)
+
+
+class LLMUnavailableError(Exception):
+    # The upstream is failing, slow or cut off by the breaker; callers fall back on it
+    pass
+
+
+class LLMTimeoutError(LLMUnavailableError):
+    pass
+
+
+class LLMRateLimitError(Exception):
+    pass
+
+
+class LLMClient:
+    """Async chat client in front of whichever provider is configured.
+
+    A fair scheduler caps the number of in-flight upstream calls so a burst
+    of requests queues inside the worker instead of opening unbounded
+    sockets, and decides whose call goes next. A circuit breaker fails calls
+    fast while the upstream is erroring or slow.
+    """
+
+    def __init__(
+        self,
+        provider: Optional[Provider] = None,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        rate_limiter: Optional[TokenBucketLimiter] = None,
+    ):
+        self.provider = provider or create_provider(timeout=timeout)
+        self.model = self.provider.model
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.scheduler = FairScheduler(max_concurrency)
+        self.breaker = CircuitBreaker()
+        self.latencies = LatencyTracker()
+        self.hedge_eligible = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    async def _admit(self, estimated: int):
+        # Called holding a slot, so provider quota goes out in the scheduler's fair order
+        if self.rate_limiter is not None:
+            try:
+                await self.rate_limiter.acquire(estimated)
+            except RateLimitExceeded as e:
+                raise LLMRateLimitError(str(e))
+
+    async def _settle(self, estimated: int, actual: Optional[int]):
+        if self.rate_limiter is not None:
+            await self.rate_limiter.settle(estimated, actual)
+
+    def _allow(self):
+        try:
+            self.breaker.allow()
+        except CircuitOpenError as e:
+            raise LLMUnavailableError(str(e))
+
+    @staticmethod
+    def _unavailable(error: Exception, timeout: float) -> LLMUnavailableError:
+        # Every upstream failure, not only an open breaker, lets callers fall back
+        if isinstance(error, asyncio.TimeoutError):
+            return LLMTimeoutError(f"LLM call timed out after {timeout}s")
+        return LLMUnavailableError(str(error))
+
+    def _hedge_delay(self) -> Optional[float]:
+        if not LLM_HEDGE_ENABLED or current_context().lane != INTERACTIVE:
+            return None
+        self.hedge_eligible += 1
+        if self.hedges >= LLM_HEDGE_BUDGET * self.hedge_eligible:
+            return None
+        return self.latencies.quantile(LLM_HEDGE_PERCENTILE)
+
+    async def _hedge_admitted(self, estimated: int) -> bool:
+        # A hedge is extra spend: only send it if quota is there right now
+        if self.rate_limiter is None:
+            return True
+        try:
+            await self.rate_limiter.acquire(estimated, max_wait=0)
+        except RateLimitExceeded:
+            return False
+        return True
+
+    async def _complete(self, request, estimated: int) -> Completion:
+        delay = self._hedge_delay()
+        primary = asyncio.ensure_future(request())
+        tasks = {primary}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and await self._hedge_admitted(estimated):
+                    self.hedges += 1
+                    tasks.add(asyncio.ensure_future(request()))
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    if not tasks:
+                        return task.result()
+        finally:
+            # Whichever request lost is abandoned
+            for task in tasks:
+                task.cancel()
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        completion_tokens: Optional[int] = None,
+    ) -> str:
+        timeout = timeout or self.timeout
+        estimated = estimate_tokens(messages) + (completion_tokens or LLM_DEFAULT_COMPLETION_TOKENS)
+        self._allow()
+        async with self.scheduler.slot(estimated):
+            await self._admit(estimated)
+            started = time.monotonic()
+            try:
+                completion = await asyncio.wait_for(
+                    self._complete(lambda: self.provider.complete(messages, temperature), estimated),
+                    timeout=timeout,
+                )
+            except UPSTREAM_FAILURES as e:
+                self.breaker.record(False, time.monotonic() - started)
+                raise self._unavailable(e, timeout)
+            except ProviderRateLimited as e:
+                raise LLMRateLimitError(str(e))
+            latency = time.monotonic() - started
+            self.breaker.record(True, latency)
+            self.latencies.record(latency)
+        await self._settle(estimated, completion.total_tokens)
+        return completion.text
+
+    async def chat_stream(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.7,
+        timeout: Optional[float] = None,
+        completion_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        # The timeout covers time to first byte; the provider's read
+        # timeout then bounds each gap between chunks
+        timeout = timeout or self.timeout
+        estimated = estimate_tokens(messages) + (completion_tokens or LLM_DEFAULT_COMPLETION_TOKENS)
+        streamed = 0
+        self._allow()
+        async with self.scheduler.slot(estimated):
+            await self._admit(estimated)
+            started = time.monotonic()
+            chunks = self.provider.stream(messages, temperature)
+            try:
+                try:
+                    first = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+                except StopAsyncIteration:
+                    first = ""
+                except UPSTREAM_FAILURES as e:
+                    self.breaker.record(False, time.monotonic() - started)
+                    raise self._unavailable(e, timeout)
+                except ProviderRateLimited as e:
+                    raise LLMRateLimitError(str(e))
+                # Time to first byte is what the breaker judges streams by
+                self.breaker.record(True, time.monotonic() - started)
+                if first:
+                    streamed += len(first)
+                    yield first
+                    async for chunk in chunks:
+                        streamed += len(chunk)
+                        yield chunk
+            finally:
+                # Release the connection if the consumer stops early
+                await chunks.aclose()
+                # Streams report no usage; count what came back at ~4 characters a token
+                await self._settle(estimated, estimate_tokens(messages) + streamed // 4)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider.name,
+            "model": self.model,
+            "scheduler": self.scheduler.stats(),
+            "breaker": self.breaker.stats(),
+            "hedging": {
+                "enabled": LLM_HEDGE_ENABLED,
+                "delay_seconds": self.latencies.quantile(LLM_HEDGE_PERCENTILE),
+                "eligible": self.hedge_eligible,
+                "hedges": self.hedges,
+                "wins": self.hedge_wins,
+            },
+        }
+
+    async def aclose(self):
+        await self.provider.aclose()
+
+
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client(rate_limiter: Optional[TokenBucketLimiter] = None) -> LLMClient:
+    # Created lazily so the scheduler binds to the running event loop;
+    # the rate limiter is only taken from the first call
+    global _client
+    if _client is None:
+        _client = LLMClient(rate_limiter=rate_limiter)
+    return _client
+
+
+async def close_llm_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -1,15 +1,34 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any
-import openai
-import ast
-import redis
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, conint
+from typing import List, Dict, Any, Optional
+import asyncio
+import hashlib
+import json
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
+from redis_pool import create_redis
+from llm import get_llm_client, close_llm_client, LLMTimeoutError, LLMRateLimitError, LLMUnavailableError
+from rate_limit import TokenBucketLimiter
+from scheduler import call_context, current_context, shared_call, RequestDropped, BACKGROUND, INTERACTIVE, LLM_QUEUE_DEADLINE_SECONDS
+from singleflight import SingleFlight
+from cache import QuestionCache
+from question_bank import QuestionBank
+from generation import generate_questions_with_llm, stream_questions_with_llm, generate_question_batch_with_llm, pack_specs
+from json_stream import extract_json
+import demand
+from sandbox import SandboxPool, prepare_submission, LADDER_INPUT_KINDS
+from eval_cache import EvaluationCache, submission_digest
+from jobs import JobQueue, DONE, FAILED
+import complexity
+from topics import canonical_topic, canonical_difficulty
+from semantic_cache import SemanticTopicCache, SEMANTIC_CACHE_ENABLED
+
 app = FastAPI(title="JnanaSetu AI Service")
 
 # CORS middleware
@@ -21,135 +40,826 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Redis connection
-redis_client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379"))
+# Async Redis client over one bounded connection pool, shared by every endpoint
+redis_client = create_redis()
+
+# In-process LRU in front of Redis for generated questions
+question_cache = QuestionCache(redis_client)
+
+# Nearest cached topic for near-duplicate free-text topics
+semantic_topics = SemanticTopicCache(redis_client)
+
+# Provider RPM/TPM quota shared with every other worker through Redis
+llm_limiter = TokenBucketLimiter(redis_client)
+
+# Persistent, deduplicated store of generated questions
+question_bank = QuestionBank()
+
+# Coalesces concurrent question generations for the same cache key
+question_flight = SingleFlight(redis_client)
+
+# Pre-started worker processes that run submitted code
+sandbox_pool = SandboxPool()
+
+# Test-case outcomes and feedback keyed by normalised submission and test cases
+eval_cache = EvaluationCache(redis_client)
 
-# OpenAI configuration
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Code-review feedback produced off the request path
+feedback_jobs = JobQueue(redis_client, "jobs:feedback", lambda payload: _run_feedback_job(payload))
+FEEDBACK_CONSUMERS = int(os.getenv("FEEDBACK_CONSUMERS", 4))
+FEEDBACK_EVENTS_POLL_SECONDS = float(os.getenv("FEEDBACK_EVENTS_POLL_SECONDS", 0.5))
+FEEDBACK_EVENTS_TIMEOUT_SECONDS = float(os.getenv("FEEDBACK_EVENTS_TIMEOUT_SECONDS", 300))
+REFERENCE_NOISE_FLOOR_MS = float(os.getenv("REFERENCE_NOISE_FLOOR_MS", 5))
+# Most questions one request (or one batch spec) may ask for
+MAX_QUESTIONS_PER_REQUEST = int(os.getenv("MAX_QUESTIONS_PER_REQUEST", 20))
+
+@app.on_event("startup")
+async def startup():
+    get_llm_client(rate_limiter=llm_limiter)
+    await question_cache.start()
+    await question_bank.start()
+    await sandbox_pool.start()
+    await feedback_jobs.start(FEEDBACK_CONSUMERS)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await question_cache.stop()
+    await question_bank.stop()
+    await feedback_jobs.stop()
+    await sandbox_pool.stop()
+    await close_llm_client()
+    await redis_client.aclose()
 
 class QuestionRequest(BaseModel):
     topic: str
     difficulty: str
-    num_questions: int = 5
+    num_questions: int = Field(5, ge=1, le=MAX_QUESTIONS_PER_REQUEST)
+
+class BatchQuestionRequest(BaseModel):
+    specs: List[QuestionRequest]
 
 class CodeEvaluationRequest(BaseModel):
     code: str
     test_cases: List[Dict[str, Any]]
+    # Return test results immediately and produce feedback in a background job
+    async_feedback: bool = True
+    # Adds per-line execution counts to each test case's metrics
+    profile_lines: bool = False
+    # Known-good solution; test cases much slower than it are flagged
+    reference_code: Optional[str] = None
+    slow_factor: float = 3.0
+
+class ComplexityRequest(BaseModel):
+    code: str
+    function_name: str
+    # One of LADDER_INPUT_KINDS, or the name of a function in the code that maps n to the call's args
+    input_kind: str = "list"
+    input_generator: Optional[str] = None
+    # log2(n) is part of the fit, so sizes start at 2
+    sizes: Optional[List[conint(ge=2)]] = Field(None, max_items=complexity.COMPLEXITY_MAX_SIZES)
+    repeats: int = Field(complexity.COMPLEXITY_REPEATS, ge=1, le=complexity.COMPLEXITY_MAX_REPEATS)
+
+class GeminiProxyRequest(BaseModel):
+    # Same shape the frontend used to send to Gemini; the key now stays server-side
+    prompt: str
+    generationConfig: Dict[str, Any] = {}
+    safetySettings: List[Dict[str, Any]] = []
+    stream: bool = False
 
 class QuestionResponse(BaseModel):
     questions: List[Dict[str, Any]]
 
+class BatchQuestionResult(BaseModel):
+    topic: str
+    difficulty: str
+    questions: List[Dict[str, Any]]
+
+class BatchQuestionResponse(BaseModel):
+    results: List[BatchQuestionResult]
+
 class CodeEvaluationResponse(BaseModel):
     results: List[Dict[str, Any]]
-    feedback: str
+    feedback: Optional[str] = None
+    feedback_job_id: Optional[str] = None
 
-@app.post("/generate-questions", response_model=QuestionResponse)
-async def generate_questions(request: QuestionRequest):
+class GeminiProxyResponse(BaseModel):
+    content: str
+    # The JSON value in content, repaired if need be, or None
+    parsed: Optional[Any] = None
+    cached: bool = False
+
+class ComplexityResponse(BaseModel):
+    complexity: str
+    r_squared: float
+    nrmse: float
+    exponent: float
+    fits: Dict[str, Optional[Dict[str, float]]]
+    timings: List[List[float]]
+    stopped_early: bool
+
+def _canonical_request(request: QuestionRequest) -> QuestionRequest:
+    # Equivalent spellings of a topic or difficulty share one cache entry, bank pool and demand count
     try:
-        # Check cache first
-        cache_key = f"questions:{request.topic}:{request.difficulty}:{request.num_questions}"
-        cached_questions = redis_client.get(cache_key)
-        
-        if cached_questions:
-            return QuestionResponse(questions=eval(cached_questions))
-
-        # Generate questions using GPT-4
-        prompt = f"""
-        Generate {request.num_questions} multiple choice questions about {request.topic}.
-        Difficulty level: {request.difficulty}
-        Each question should have:
-        1. A clear question stem
-        2. 4 options (A, B, C, D)
-        3. The correct answer
-        4. A brief explanation
-        Format as a JSON array of objects with keys: question, options, answer, explanation
-        """
-
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert educational content creator."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7
+        return QuestionRequest(
+            topic=canonical_topic(request.topic),
+            difficulty=canonical_difficulty(request.difficulty),
+            num_questions=request.num_questions,
         )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+def _with_size(request: QuestionRequest, num_questions: int) -> QuestionRequest:
+    return QuestionRequest(topic=request.topic, difficulty=request.difficulty, num_questions=num_questions)
 
-        questions = eval(response.choices[0].message.content)
-        
-        # Cache the results
-        redis_client.setex(cache_key, 3600, str(questions))  # Cache for 1 hour
+def _question_cache_key(request: QuestionRequest) -> str:
+    # No size in the key: a cached set of M questions serves any request for N <= M
+    return f"questions:{request.topic}:{request.difficulty}"
 
-        return QuestionResponse(questions=questions)
+def _enough(questions: Optional[List[Dict[str, Any]]], num_questions: int) -> Optional[List[Dict[str, Any]]]:
+    if questions and len(questions) >= num_questions:
+        return questions[:num_questions]
+    return None
+
+def _llm_call(http_request: Request, endpoint: str):
+    # Tags upstream calls made for this request so the scheduler can share capacity fairly
+    return call_context(
+        tenant=http_request.headers.get("x-tenant-id") or (http_request.client.host if http_request.client else "anonymous"),
+        endpoint=endpoint,
+        lane=INTERACTIVE,
+        deadline=time.monotonic() + LLM_QUEUE_DEADLINE_SECONDS,
+        is_disconnected=http_request.is_disconnected,
+    )
+
+def _refresh_entry(cache_key: str, request: QuestionRequest):
+    # Regenerate at least as many questions as the entry holds so refreshes never shrink it.
+    # Nobody is waiting on a refresh, so it queues behind interactive calls.
+    async def refresh(entry):
+        with call_context(lane=BACKGROUND, deadline=None, is_disconnected=None):
+            return await _refresh_questions(
+                cache_key,
+                _with_size(request, max(request.num_questions, len(entry.value or []))),
+                entry.created_at,
+            )
+    return refresh
+
+async def _record_demand(request: QuestionRequest):
+    # Feeds the pre-generation worker's topic priorities. Run as a background
+    # task, after the response, so cache hits never wait on the Redis round trip.
+    try:
+        await demand.record(redis_client, request.topic, request.difficulty)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(f"Failed to record demand: {e}")
 
-@app.post("/evaluate-code", response_model=CodeEvaluationResponse)
-async def evaluate_code(request: CodeEvaluationRequest):
+async def _sample_bank(request: QuestionRequest):
+    # Serve from the question bank unless it is too thin for this topic
+    try:
+        banked = await question_bank.sample(request.topic, request.difficulty, request.num_questions)
+        if len(banked) >= request.num_questions:
+            return banked
+    except Exception as e:
+        print(f"Question bank unavailable: {e}")
+    return None
+
+async def _store_generated_questions(request: QuestionRequest, questions: List[Dict[str, Any]]):
+    try:
+        await question_bank.add(request.topic, request.difficulty, questions)
+    except Exception as e:
+        print(f"Failed to store questions in bank: {e}")
+
+async def _cache_questions(items: Dict[str, List[Dict[str, Any]]], delta: float) -> List[str]:
+    # The key has no size in it, so an empty or smaller set must never replace
+    # the entry that bigger requests are served from. Returns the keys written.
+    items = {key: questions for key, questions in items.items() if questions}
+    if not items:
+        return []
+    entries = await question_cache.get_entries(list(items))
+    items = {
+        key: questions
+        for (key, questions), entry in zip(items.items(), entries)
+        if entry is None or len(entry.value or []) <= len(questions)
+    }
+    if items:
+        await question_cache.set_many(items, delta=delta)
+    return list(items)
+
+async def _generate_and_cache_questions(cache_key: str, request: QuestionRequest):
+    started = time.monotonic()
+    questions = await _sample_bank(request)
+
+    if questions is None:
+        questions = await generate_questions_with_llm(request.topic, request.difficulty, request.num_questions)
+        await _store_generated_questions(request, questions)
+
+    # Cache the results; generation time scales early refresh
+    if await _cache_questions({cache_key: questions}, delta=time.monotonic() - started):
+        await _remember_topics([request])
+    return questions
+
+async def _remember_topics(requests: List[QuestionRequest]):
+    try:
+        for request in requests:
+            await semantic_topics.add(request.topic, request.difficulty)
+    except Exception as e:
+        print(f"Failed to index cached topics: {e}")
+
+async def _neighbour_questions(request: QuestionRequest) -> Optional[List[Dict[str, Any]]]:
+    # A close enough cached topic ("hooks in react" for "react hooks") answers an exact miss
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    try:
+        topic = await semantic_topics.nearest(request.topic, request.difficulty)
+    except Exception as e:
+        print(f"Semantic topic lookup failed: {e}")
+        return None
+    if topic is None:
+        return None
+    neighbour = QuestionRequest(topic=topic, difficulty=request.difficulty, num_questions=request.num_questions)
+    cache_key = _question_cache_key(neighbour)
+    return _enough(
+        await question_cache.get_or_refresh(cache_key, _refresh_entry(cache_key, neighbour)),
+        request.num_questions,
+    )
+
+async def _fallback_questions(cache_key: str, request: QuestionRequest) -> Optional[List[Dict[str, Any]]]:
+    # With the upstream down, a short set beats an error: whatever the cache
+    # entry holds, else whatever the bank has for this topic
+    entry = await question_cache.get_entry(cache_key)
+    if entry is not None and entry.value:
+        return entry.value[:request.num_questions]
     try:
-        # Parse and validate the code
+        banked = await question_bank.sample(request.topic, request.difficulty, request.num_questions)
+    except Exception as e:
+        print(f"Question bank unavailable: {e}")
+        return None
+    return banked or None
+
+def _cached_after(cache_key: str, created_at: float, num_questions: int):
+    # Lets single-flight followers pick up a big enough value written after created_at
+    async def fetch():
+        entry = await question_cache.get_entry(cache_key)
+        if entry is not None and entry.created_at > created_at:
+            return _enough(entry.value, num_questions)
+        return None
+    return fetch
+
+async def _refresh_questions(cache_key: str, request: QuestionRequest, created_at: float = 0.0):
+    # Concurrent misses and refreshes for the same key and size share one generation
+    with shared_call():
+        questions = await question_flight.do(
+            f"{cache_key}:{request.num_questions}",
+            lambda: _generate_and_cache_questions(cache_key, request),
+            fetch_cached=_cached_after(cache_key, created_at, request.num_questions),
+        )
+    return questions[:request.num_questions]
+
+@app.post("/generate-questions", response_model=QuestionResponse)
+async def generate_questions(request: QuestionRequest, http_request: Request, background_tasks: BackgroundTasks):
+    request = _canonical_request(request)
+    background_tasks.add_task(_record_demand, request)
+    with _llm_call(http_request, "generate-questions"):
         try:
-            ast.parse(request.code)
-        except SyntaxError as e:
-            return CodeEvaluationResponse(
-                results=[],
-                feedback=f"Syntax Error: {str(e)}"
+            # Check cache first; expired entries are still served while they are refreshed
+            cache_key = _question_cache_key(request)
+            cached_questions = _enough(
+                await question_cache.get_or_refresh(cache_key, _refresh_entry(cache_key, request)),
+                request.num_questions,
             )
 
-        # Execute test cases
-        results = []
-        for test_case in request.test_cases:
+            if not cached_questions:
+                cached_questions = await _neighbour_questions(request)
+            if cached_questions:
+                return QuestionResponse(questions=cached_questions)
+
             try:
-                # Create a new namespace for execution
-                namespace = {}
-                exec(request.code, namespace)
-                
-                # Call the function with test case input
-                result = namespace[test_case["function_name"]](*test_case["input"])
-                
-                # Compare with expected output
-                is_correct = result == test_case["expected_output"]
-                
-                results.append({
-                    "test_case": test_case["name"],
-                    "passed": is_correct,
-                    "actual_output": result,
-                    "expected_output": test_case["expected_output"]
-                })
-            except Exception as e:
-                results.append({
-                    "test_case": test_case["name"],
-                    "passed": False,
-                    "error": str(e)
-                })
-
-        # Generate feedback using GPT-4
-        feedback_prompt = f"""
-        Code:
-        {request.code}
-        
-        Test Results:
-        {results}
-        
-        Provide constructive feedback on the code quality, style, and potential improvements.
-        """
-
-        feedback_response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert code reviewer."},
-                {"role": "user", "content": feedback_prompt}
-            ],
-            temperature=0.7
-        )
+                questions = await _refresh_questions(cache_key, request)
+            except LLMUnavailableError:
+                questions = await _fallback_questions(cache_key, request)
+                if not questions:
+                    raise
+
+            return QuestionResponse(questions=questions)
+        except LLMTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except LLMUnavailableError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except LLMRateLimitError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except RequestDropped as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+async def _generate_batch(requests: Dict[str, QuestionRequest]) -> Dict[str, List[Dict[str, Any]]]:
+    # Misses from the bank first, then as few packed LLM calls as the token budget allows
+    started = time.monotonic()
+    keys = list(requests)
+    banked = await asyncio.gather(*[_sample_bank(requests[key]) for key in keys])
+    generated = {key: questions for key, questions in zip(keys, banked) if questions is not None}
+
+    missing = [key for key in keys if key not in generated]
+    specs = [(requests[key].topic, requests[key].difficulty, requests[key].num_questions) for key in missing]
+    batches = pack_specs(specs)
+    answers = await asyncio.gather(
+        *[generate_question_batch_with_llm([specs[i] for i in batch]) for batch in batches]
+    )
+    fresh = {}
+    for batch, questions_per_spec in zip(batches, answers):
+        for i, questions in zip(batch, questions_per_spec):
+            if questions is not None:
+                fresh[missing[i]] = questions
+    await asyncio.gather(*[_store_generated_questions(requests[key], questions) for key, questions in fresh.items()])
+    generated.update(fresh)
+
+    written = await _cache_questions(generated, delta=time.monotonic() - started)
+    await _remember_topics([requests[key] for key in written])
+
+    # Anything the batched answers dropped is generated on its own
+    leftovers = [key for key in keys if key not in generated]
+    for key, questions in zip(leftovers, await asyncio.gather(
+        *[_refresh_questions(key, requests[key]) for key in leftovers]
+    )):
+        generated[key] = questions
+    return generated
 
-        feedback = feedback_response.choices[0].message.content
+@app.post("/generate-questions/batch", response_model=BatchQuestionResponse)
+async def generate_questions_batch(request: BatchQuestionRequest, http_request: Request, background_tasks: BackgroundTasks):
+    specs = [_canonical_request(spec) for spec in request.specs]
+    for spec in specs:
+        background_tasks.add_task(_record_demand, spec)
+    with _llm_call(http_request, "generate-questions-batch"):
+        try:
+            # Specs for the same topic and difficulty share one cache key, sized for the largest
+            requests: Dict[str, QuestionRequest] = {}
+            for spec in specs:
+                key = _question_cache_key(spec)
+                if key not in requests or spec.num_questions > requests[key].num_questions:
+                    requests[key] = spec
+            keys = list(requests)
+            cached = await question_cache.get_many_or_refresh(
+                keys,
+                lambda key, entry: _refresh_entry(key, requests[key])(entry),
+            )
+            questions = {}
+            for key, value in zip(keys, cached):
+                if _enough(value, requests[key].num_questions):
+                    questions[key] = value
+            misses = {key: requests[key] for key in keys if key not in questions}
+            neighbours = await asyncio.gather(*[_neighbour_questions(spec) for spec in misses.values()])
+            for key, value in zip(list(misses), neighbours):
+                if value is not None:
+                    questions[key] = value
+                    del misses[key]
+            if misses:
+                try:
+                    questions.update(await _generate_batch(misses))
+                except LLMUnavailableError:
+                    fallbacks = await asyncio.gather(*[_fallback_questions(key, spec) for key, spec in misses.items()])
+                    if not all(fallbacks):
+                        raise
+                    questions.update(zip(misses, fallbacks))
+
+            return BatchQuestionResponse(results=[
+                BatchQuestionResult(
+                    topic=original.topic,
+                    difficulty=original.difficulty,
+                    questions=questions[_question_cache_key(spec)][:spec.num_questions],
+                )
+                for original, spec in zip(request.specs, specs)
+            ])
+        except LLMTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except LLMUnavailableError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except LLMRateLimitError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except RequestDropped as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+async def _stream_questions(cache_key: str, request: QuestionRequest):
+    cached_questions = _enough(
+        await question_cache.get_or_refresh(cache_key, _refresh_entry(cache_key, request)),
+        request.num_questions,
+    )
+    if not cached_questions:
+        cached_questions = await _neighbour_questions(request)
+    if cached_questions:
+        for question in cached_questions:
+            yield question
+        return
 
-        return CodeEvaluationResponse(
-            results=results,
-            feedback=feedback
+    started = time.monotonic()
+    banked = await _sample_bank(request)
+    if banked is not None:
+        if await _cache_questions({cache_key: banked}, delta=time.monotonic() - started):
+            await _remember_topics([request])
+        for question in banked:
+            yield question
+        return
+
+    async def generate():
+        questions = []
+        async for question in stream_questions_with_llm(request.topic, request.difficulty, request.num_questions):
+            questions.append(question)
+            yield question
+        # Only keep complete sets so the cache never serves a short answer
+        await _store_generated_questions(request, questions)
+        if len(questions) >= request.num_questions:
+            if await _cache_questions({cache_key: questions}, delta=time.monotonic() - started):
+                await _remember_topics([request])
+
+    # Concurrent misses for the same key and size follow one upstream stream
+    with shared_call():
+        questions = question_flight.stream(
+            f"{cache_key}:{request.num_questions}",
+            generate,
+            fetch_cached=_cached_after(cache_key, 0.0, request.num_questions),
         )
+    count = 0
+    try:
+        async for question in questions:
+            count += 1
+            yield question
+    except LLMUnavailableError:
+        fallback = None if count else await _fallback_questions(cache_key, request)
+        if not fallback:
+            raise
+        for question in fallback:
+            yield question
+
+def _stream_frame(event: str, data: Any, sse: bool) -> str:
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if event == "question":
+        return json.dumps(data) + "\n"
+    return json.dumps({event: data}) + "\n"
+
+@app.post("/generate-questions/stream")
+async def generate_questions_stream(request: QuestionRequest, http_request: Request, background_tasks: BackgroundTasks):
+    # NDJSON by default, Server-Sent Events when the client asks for them
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    request = _canonical_request(request)
+    cache_key = _question_cache_key(request)
+    background_tasks.add_task(_record_demand, request)
+
+    async def body():
+        count = 0
+        with _llm_call(http_request, "generate-questions-stream"):
+            try:
+                async for question in _stream_questions(cache_key, request):
+                    count += 1
+                    yield _stream_frame("question", question, sse)
+                yield _stream_frame("done", count, sse)
+            except Exception as e:
+                yield _stream_frame("error", str(e), sse)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _generate_feedback(code: str, results: str) -> str:
+    # Generate feedback using GPT-4
+    feedback_prompt = f"""
+    Code:
+    {code}
+
+    Test Results:
+    {results}
+
+    Provide constructive feedback on the code quality, style, and potential improvements.
+    """
+
+    return await get_llm_client().chat(
+        messages=[
+            {"role": "system", "content": "You are an expert code reviewer."},
+            {"role": "user", "content": feedback_prompt}
+        ],
+        temperature=0.7
+    )
+
+async def _run_feedback_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Someone is polling for this, but there is no connection to watch
+    with call_context(tenant=payload.get("tenant", "anonymous"), endpoint="evaluate-code-feedback"):
+        feedback = await _generate_feedback(payload["code"], payload["results"])
+    await eval_cache.set_feedback(payload["digest"], payload["test_cases"], feedback)
+    return {"feedback": feedback}
+
+async def _run_test_case(submission: Dict[str, Any], test_case: Dict[str, Any], profile_lines: bool = False):
+    # Returns the result entry and whether it is deterministic enough to cache
+    try:
+        outcome = await sandbox_pool.run({
+            **submission,
+            "function_name": test_case["function_name"],
+            "args": test_case["input"],
+            "profile_lines": profile_lines,
+        })
+        if "error" in outcome:
+            return {
+                "test_case": test_case["name"],
+                "passed": False,
+                "error": outcome["error"],
+                "metrics": outcome.get("metrics", {})
+            }, not outcome.get("retryable")
+        result = outcome["result"]
+
+        # Compare with expected output
+        is_correct = result == test_case["expected_output"]
+
+        return {
+            "test_case": test_case["name"],
+            "passed": is_correct,
+            "actual_output": result,
+            "expected_output": test_case["expected_output"],
+            "metrics": outcome["metrics"]
+        }, True
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        return {
+            "test_case": test_case.get("name"),
+            "passed": False,
+            "error": str(e)
+        }, False
+
+async def _evaluate_test_cases(submission: Dict[str, Any], digest: str, test_cases: List[Dict[str, Any]], profile_lines: bool):
+    # Unchanged code against unchanged test cases is answered from cache
+    cached_results = await eval_cache.get_cases(digest, test_cases)
+
+    # Execute the remaining test cases in parallel across the sandbox pool; gather keeps their order
+    pending = [i for i, cached in enumerate(cached_results) if cached is None]
+    evaluated = await asyncio.gather(
+        *[_run_test_case(submission, test_cases[i], profile_lines) for i in pending]
+    )
+
+    results = list(cached_results)
+    to_cache = []
+    for i, (result, cacheable) in zip(pending, evaluated):
+        results[i] = result
+        if cacheable:
+            to_cache.append((test_cases[i], result))
+    if to_cache:
+        await eval_cache.set_cases(digest, to_cache)
+    return results
+
+def _compare_to_reference(result: Dict[str, Any], reference: Dict[str, Any], slow_factor: float):
+    metrics = result.get("metrics") or {}
+    reference_metrics = reference.get("metrics") or {}
+    if "cpu_ms" not in metrics or "cpu_ms" not in reference_metrics:
+        return
+    # Tiny timings are mostly noise, so don't divide by less than the floor
+    ratio = metrics["cpu_ms"] / max(reference_metrics["cpu_ms"], REFERENCE_NOISE_FLOOR_MS)
+    result["reference_metrics"] = reference_metrics
+    result["time_ratio"] = round(ratio, 2)
+    result["slow"] = ratio > slow_factor and metrics["cpu_ms"] > REFERENCE_NOISE_FLOOR_MS
+
+@app.post("/evaluate-code", response_model=CodeEvaluationResponse)
+async def evaluate_code(request: CodeEvaluationRequest, http_request: Request):
+    with _llm_call(http_request, "evaluate-code"):
+        try:
+            # Parse, validate and compile the code once for every test case
+            try:
+                submission = prepare_submission(request.code)
+            except SyntaxError as e:
+                return CodeEvaluationResponse(
+                    results=[],
+                    feedback=f"Syntax Error: {str(e)}"
+                )
+
+            digest = submission_digest(request.code, profile_lines=request.profile_lines)
+            results = await _evaluate_test_cases(submission, digest, request.test_cases, request.profile_lines)
+
+            if request.reference_code:
+                try:
+                    reference = prepare_submission(request.reference_code)
+                except SyntaxError as e:
+                    raise HTTPException(status_code=400, detail=f"Reference solution has a syntax error: {e}")
+                reference_digest = submission_digest(request.reference_code, profile_lines=request.profile_lines)
+                reference_results = await _evaluate_test_cases(reference, reference_digest, request.test_cases, request.profile_lines)
+                for result, reference_result in zip(results, reference_results):
+                    _compare_to_reference(result, reference_result, request.slow_factor)
+
+            feedback = await eval_cache.get_feedback(digest, request.test_cases)
+            if feedback is None and request.async_feedback:
+                # Pass/fail goes back now; the review is fetched later by job id
+                job_id = await feedback_jobs.submit(
+                    {
+                        "code": request.code,
+                        "results": str(results),
+                        "digest": digest,
+                        "test_cases": request.test_cases,
+                        "tenant": current_context().tenant,
+                    },
+                    dedupe_key=EvaluationCache.feedback_key(digest, request.test_cases),
+                )
+                return CodeEvaluationResponse(results=results, feedback_job_id=job_id)
+            if feedback is None:
+                try:
+                    feedback = await _generate_feedback(request.code, str(results))
+                    await eval_cache.set_feedback(digest, request.test_cases, feedback)
+                except LLMUnavailableError:
+                    # Test results don't need the model; send them without feedback
+                    pass
+
+            return CodeEvaluationResponse(
+                results=results,
+                feedback=feedback
+            )
+        except HTTPException:
+            raise
+        except LLMTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except LLMRateLimitError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except RequestDropped as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/estimate-complexity", response_model=ComplexityResponse)
+async def estimate_complexity(request: ComplexityRequest):
+    # Timing ladder in the sandbox, curve fit here; no LLM involved
+    if request.input_generator is None and request.input_kind not in LADDER_INPUT_KINDS:
+        raise HTTPException(status_code=400, detail=f"input_kind must be one of {', '.join(LADDER_INPUT_KINDS)}")
+    try:
+        submission = prepare_submission(request.code)
+    except SyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"Syntax Error: {e}")
+
+    sizes = sorted(set(request.sizes)) if request.sizes else complexity.size_ladder()
+    # The ladder stops after the first call past its budget, so allow for that
+    # call being up to 8x one within it (n³ on doubled input)
+    budget = complexity.COMPLEXITY_BUDGET_SECONDS
+    timeout = budget + 8 * complexity.COMPLEXITY_MAX_CALL_SECONDS + 5
+    outcome = await sandbox_pool.run(
+        {
+            **submission,
+            "function_name": request.function_name,
+            "sizes": sizes,
+            "input_kind": request.input_kind,
+            "input_generator": request.input_generator,
+            "repeats": request.repeats,
+            "max_call_seconds": complexity.COMPLEXITY_MAX_CALL_SECONDS,
+            "budget_seconds": budget,
+            "cpu_seconds": int(timeout) + 1,
+        },
+        timeout=timeout,
+    )
+    if "error" in outcome:
+        raise HTTPException(status_code=422, detail=outcome["error"])
+
+    ladder = outcome["result"]
+    try:
+        estimate = complexity.fit_complexity(ladder["timings"])
+    except complexity.ComplexityFitError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return ComplexityResponse(**estimate, timings=ladder["timings"], stopped_early=ladder["stopped_early"])
+
+@app.get("/feedback-jobs/{job_id}")
+async def get_feedback_job(job_id: str):
+    state = await feedback_jobs.get(job_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired feedback job")
+    state.pop("dedupe_key", None)
+    return {"job_id": job_id, **state}
+
+@app.get("/feedback-jobs/{job_id}/events")
+async def feedback_job_events(job_id: str, http_request: Request):
+    # Server-Sent Events: one event per status change, closing once the job finishes
+    async def events():
+        last_status = None
+        deadline = time.monotonic() + FEEDBACK_EVENTS_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if await http_request.is_disconnected():
+                return
+            state = await feedback_jobs.get(job_id)
+            if state is None:
+                yield _stream_frame("error", "Unknown or expired feedback job", sse=True)
+                return
+            state.pop("dedupe_key", None)
+            if state["status"] != last_status:
+                last_status = state["status"]
+                yield _stream_frame(last_status, {"job_id": job_id, **state}, sse=True)
+            if last_status in (DONE, FAILED):
+                return
+            await asyncio.sleep(FEEDBACK_EVENTS_POLL_SECONDS)
+        yield _stream_frame("error", "Timed out waiting for feedback", sse=True)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _proxy_cache_key(request: GeminiProxyRequest) -> str:
+    # Same prompt and sampling settings, same answer
+    payload = json.dumps([request.prompt, request.generationConfig], sort_keys=True)
+    return f"proxy:gemini:{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+def _proxy_call(request: GeminiProxyRequest) -> Dict[str, Any]:
+    # The configured provider answers; topP, topK and safety settings are Gemini-only and dropped
+    return {
+        "messages": [{"role": "user", "content": request.prompt}],
+        "temperature": request.generationConfig.get("temperature", 0.7),
+        "completion_tokens": request.generationConfig.get("maxOutputTokens"),
+    }
+
+async def _proxy_generate(cache_key: str, request: GeminiProxyRequest) -> str:
+    started = time.monotonic()
+    content = await get_llm_client().chat(**_proxy_call(request))
+    if content:
+        await question_cache.set(cache_key, content, delta=time.monotonic() - started)
+    return content
+
+def _proxy_refresh(cache_key: str, request: GeminiProxyRequest):
+    async def refresh(entry):
+        with call_context(lane=BACKGROUND, deadline=None, is_disconnected=None):
+            return await question_flight.do(cache_key, lambda: _proxy_generate(cache_key, request))
+    return refresh
+
+async def _stream_proxy(cache_key: str, request: GeminiProxyRequest):
+    cached = await question_cache.get_or_refresh(cache_key, _proxy_refresh(cache_key, request))
+    if cached is not None:
+        yield _stream_frame("chunk", cached, sse=True)
+        yield _stream_frame("done", {"cached": True}, sse=True)
+        return
+
+    async def generate():
+        started = time.monotonic()
+        parts = []
+        async for chunk in get_llm_client().chat_stream(**_proxy_call(request)):
+            parts.append(chunk)
+            yield chunk
+        content = "".join(parts)
+        if content:
+            await question_cache.set(cache_key, content, delta=time.monotonic() - started)
+
+    async def cached_content():
+        content = await question_cache.get(cache_key)
+        return [content] if content is not None else None
+
+    # Concurrent misses follow one upstream stream, as the non-streaming path shares one call
+    with shared_call():
+        chunks = question_flight.stream(cache_key, generate, fetch_cached=cached_content)
+    async for chunk in chunks:
+        yield _stream_frame("chunk", chunk, sse=True)
+    yield _stream_frame("done", {"cached": False}, sse=True)
+
+@app.post("/api/gemini-proxy", response_model=GeminiProxyResponse)
+async def gemini_proxy(request: GeminiProxyRequest, http_request: Request):
+    # Replaces browser-direct Gemini calls: identical prompts (the frontend
+    # question set, a repeated assessment) share one cached answer, and
+    # concurrent misses share one upstream call
+    cache_key = _proxy_cache_key(request)
+    if request.stream:
+        async def body():
+            with _llm_call(http_request, "gemini-proxy"):
+                try:
+                    async for frame in _stream_proxy(cache_key, request):
+                        yield frame
+                except Exception as e:
+                    yield _stream_frame("error", str(e), sse=True)
+
+        return StreamingResponse(
+            body(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    with _llm_call(http_request, "gemini-proxy"):
+        try:
+            cached = await question_cache.get_or_refresh(cache_key, _proxy_refresh(cache_key, request))
+            if cached is not None:
+                return GeminiProxyResponse(content=cached, parsed=extract_json(cached), cached=True)
+            with shared_call():
+                content = await question_flight.do(
+                    cache_key,
+                    lambda: _proxy_generate(cache_key, request),
+                    fetch_cached=lambda: question_cache.get(cache_key),
+                )
+            return GeminiProxyResponse(content=content, parsed=extract_json(content))
+        except LLMTimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
+        except LLMUnavailableError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except LLMRateLimitError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except RequestDropped as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {**question_cache.stats(), "semantic": semantic_topics.stats()}
+
+@app.get("/llm/stats")
+async def llm_stats():
+    return {**llm_limiter.stats(), **get_llm_client().stats()}
+
+@app.get("/sandbox/stats")
+async def sandbox_stats():
+    return sandbox_pool.stats()
 
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import JSON, Column, Index, LargeBinary
+from sqlmodel import SQLModel, Field
+
+class BankQuestion(SQLModel, table=True):
+    __tablename__ = "question_bank"
+    __table_args__ = (
+        # Sampling walks the least-served questions for one topic/difficulty
+        Index("ix_question_bank_topic_difficulty_served", "topic", "difficulty", "times_served"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    topic: str
+    difficulty: str
+    content_hash: str = Field(index=True, unique=True)
+    payload: Dict[str, Any] = Field(sa_column=Column(JSON, nullable=False))
+    # MinHash signature (uint32 array) for near-duplicate detection
+    minhash: Optional[bytes] = Field(default=None, sa_column=Column(LargeBinary, nullable=True))
+    times_served: int = Field(default=0)
+    last_served_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
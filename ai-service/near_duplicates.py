@@ -0,0 +1,143 @@
+import os
+import re
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Near-duplicate detection configuration
+DEDUPE_NUM_PERM = int(os.getenv("DEDUPE_NUM_PERM", 64))
+# 16 bands of 4 rows: pairs above ~0.5 Jaccard usually share a bucket
+DEDUPE_BANDS = int(os.getenv("DEDUPE_BANDS", 16))
+# Estimated Jaccard similarity at which a candidate counts as a duplicate
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", 0.7))
+DEDUPE_SHINGLE_SIZE = int(os.getenv("DEDUPE_SHINGLE_SIZE", 5))
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def question_text(question: Dict[str, Any]) -> str:
+    # Stem plus the option set in a fixed order, so shuffled options still match
+    options = question.get("options") or []
+    if isinstance(options, dict):
+        options = list(options.values())
+    parts = [str(question.get("question", ""))] + sorted(str(option) for option in options)
+    text = " ".join(parts).casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def shingles(text: str, size: int = DEDUPE_SHINGLE_SIZE) -> np.ndarray:
+    if len(text) <= size:
+        grams = {text}
+    else:
+        grams = {text[i:i + size] for i in range(len(text) - size + 1)}
+    return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    """MinHash signatures from ``num_perm`` universal hash functions.
+
+    Seeded, so every process derives identical signatures and stored ones
+    stay comparable.
+    """
+
+    def __init__(self, num_perm: int = DEDUPE_NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self._a = rng.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        if len(hashes) == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        # uint64 products wrap around; that still mixes well and keeps this vectorised
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def question_signature(self, question: Dict[str, Any]) -> np.ndarray:
+        return self.signature(shingles(question_text(question)))
+
+
+class NearDuplicateIndex:
+    """LSH over MinHash signatures of banked questions.
+
+    Each signature is split into ``bands``; questions sharing any band land
+    in the same bucket and become candidates. Candidates are confirmed by
+    the fraction of equal signature slots, which estimates their Jaccard
+    similarity. Lookups touch a handful of buckets, so they stay fast no
+    matter how many questions are indexed.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = DEDUPE_NUM_PERM,
+        bands: int = DEDUPE_BANDS,
+        threshold: float = DEDUPE_THRESHOLD,
+        hasher: Optional[MinHasher] = None,
+        capacity: int = 1024,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.hasher = hasher or MinHasher(num_perm)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures = np.zeros((max(1, capacity), num_perm), dtype=np.uint32)
+        self._keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key: str):
+        return key in self._positions
+
+    def _bands(self, signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def add(self, key: str, signature: np.ndarray):
+        if key in self._positions:
+            return
+        position = len(self._keys)
+        if position == len(self._signatures):
+            self._signatures = np.vstack([self._signatures, np.zeros_like(self._signatures)])
+        self._signatures[position] = signature
+        self._keys.append(key)
+        self._positions[key] = position
+        for band, bucket in self._bands(signature):
+            self._buckets[band].setdefault(bucket, []).append(position)
+
+    def query(self, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        # Best match at or above the threshold, if any
+        candidates = set()
+        for band, bucket in self._bands(signature):
+            candidates.update(self._buckets[band].get(bucket, ()))
+        if not candidates:
+            return None
+        positions = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarity = (self._signatures[positions] == signature).mean(axis=1)
+        best = int(np.argmax(similarity))
+        if similarity[best] < self.threshold:
+            return None
+        return self._keys[positions[best]], float(similarity[best])
+
+    def filter(self, questions: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any], np.ndarray]]:
+        """Drop near-duplicates of indexed questions and of each other.
+
+        Takes ``(key, question)`` pairs and returns the survivors with their
+        signatures. The index itself is left alone; ``add`` the survivors once
+        they are stored.
+        """
+        batch = NearDuplicateIndex(self.num_perm, self.bands, self.threshold, self.hasher, capacity=len(questions))
+        unique = []
+        for key, question in questions:
+            signature = self.hasher.question_signature(question)
+            if key in self or key in batch or self.query(signature) is not None or batch.query(signature) is not None:
+                continue
+            batch.add(key, signature)
+            unique.append((key, question, signature))
+        return unique
@@ -0,0 +1,91 @@
+"""Keeps question-bank pools warm ahead of demand.
+
+Run next to the API: python pregen_worker.py
+"""
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import demand
+from generation import generate_questions_with_llm
+from llm import close_llm_client, get_llm_client
+from question_bank import QuestionBank
+from rate_limit import TokenBucketLimiter
+from redis_pool import create_redis
+from scheduler import BACKGROUND, call_context
+
+PREGEN_INTERVAL_SECONDS = float(os.getenv("PREGEN_INTERVAL_SECONDS", 30))
+PREGEN_TOP_TOPICS = int(os.getenv("PREGEN_TOP_TOPICS", 20))
+# Unexhausted questions to keep banked per (topic, difficulty)
+PREGEN_POOL_TARGET = int(os.getenv("PREGEN_POOL_TARGET", 50))
+# Questions served at least this many times no longer count towards the pool
+PREGEN_MAX_SERVES = int(os.getenv("PREGEN_MAX_SERVES", 20))
+PREGEN_BATCH_SIZE = int(os.getenv("PREGEN_BATCH_SIZE", 10))
+PREGEN_RPM = float(os.getenv("PREGEN_RPM", 20))
+PREGEN_MAX_CALLS_PER_CYCLE = int(os.getenv("PREGEN_MAX_CALLS_PER_CYCLE", 20))
+
+
+class RateLimiter:
+    """Spaces calls evenly so the worker never exceeds ``per_minute``."""
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute
+        self._next = 0.0
+
+    async def wait(self):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        delay = self._next - now
+        self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def refill_once(redis_client, bank: QuestionBank, limiter: RateLimiter) -> int:
+    calls = 0
+    # Most requested topics first, so the budget goes where users are
+    for topic, difficulty, score in await demand.top(redis_client, PREGEN_TOP_TOPICS):
+        available = await bank.count(topic, difficulty, max_served=PREGEN_MAX_SERVES)
+        deficit = PREGEN_POOL_TARGET - available
+        while deficit > 0 and calls < PREGEN_MAX_CALLS_PER_CYCLE:
+            await limiter.wait()
+            batch_size = min(deficit, PREGEN_BATCH_SIZE)
+            try:
+                questions = await generate_questions_with_llm(topic, difficulty, batch_size)
+            except Exception as e:
+                print(f"Pre-generation failed for {topic}/{difficulty}: {e}")
+                break
+            calls += 1
+            added = await bank.add(topic, difficulty, questions)
+            print(f"Pre-generated {added} questions for {topic}/{difficulty} (demand {score:.1f})")
+            # Duplicates add nothing; still make progress so we don't loop forever
+            deficit -= max(added, 1)
+        if calls >= PREGEN_MAX_CALLS_PER_CYCLE:
+            break
+    return calls
+
+
+async def run():
+    redis_client = create_redis()
+    # Draws on the same provider quota as the API workers, leaving them its reserve
+    get_llm_client(rate_limiter=TokenBucketLimiter(redis_client))
+    bank = QuestionBank()
+    limiter = RateLimiter(PREGEN_RPM)
+    try:
+        with call_context(lane=BACKGROUND, endpoint="pregen"):
+            while True:
+                try:
+                    await refill_once(redis_client, bank, limiter)
+                except Exception as e:
+                    print(f"Pre-generation cycle failed: {e}")
+                await asyncio.sleep(PREGEN_INTERVAL_SECONDS)
+    finally:
+        await close_llm_client()
+        await redis_client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,269 @@
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+
+import httpx
+
+# Provider selection: openai (or anything speaking its API), gemini, or stub
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", 64))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+
+DEFAULT_MODELS = {
+    "openai": "gpt-4",
+    "gemini": "gemini-1.5-flash",
+    "stub": "stub",
+}
+
+
+class ProviderError(Exception):
+    pass
+
+
+class ProviderRateLimited(ProviderError):
+    pass
+
+
+class ProviderUnavailable(ProviderError):
+    # Connection failures, timeouts and 5xx: the upstream, not the request, is at fault
+    pass
+
+
+class Completion(NamedTuple):
+    text: str
+    total_tokens: Optional[int] = None
+
+
+class Provider:
+    """One upstream chat model. Subclasses map their errors onto ProviderError."""
+
+    name = "base"
+
+    def __init__(self, model: Optional[str] = None):
+        self.model = model or DEFAULT_MODELS.get(self.name, self.name)
+
+    async def complete(self, messages: List[Dict[str, str]], temperature: float) -> Completion:
+        raise NotImplementedError
+
+    def stream(self, messages: List[Dict[str, str]], temperature: float) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+def _pooled_http(timeout: float, max_connections: int) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+        timeout=timeout,
+    )
+
+
+class OpenAIProvider(Provider):
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        base_url: Optional[str] = LLM_BASE_URL,
+        timeout: float = 60,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+    ):
+        import openai
+
+        super().__init__(model)
+        self._openai = openai
+        self._http = _pooled_http(timeout, max_connections)
+        self._client = openai.AsyncOpenAI(
+            # The SDK insists on a key even for local OpenAI-compatible servers
+            api_key=api_key or os.getenv("OPENAI_API_KEY") or ("unused" if base_url else None),
+            base_url=base_url,
+            http_client=self._http,
+            max_retries=LLM_MAX_RETRIES,
+        )
+
+    def _translate(self, error: Exception) -> Exception:
+        if isinstance(error, self._openai.RateLimitError):
+            return ProviderRateLimited(str(error))
+        if isinstance(error, (self._openai.APIConnectionError, self._openai.InternalServerError)):
+            return ProviderUnavailable(str(error))
+        if isinstance(error, self._openai.APIError):
+            return ProviderError(str(error))
+        return error
+
+    async def complete(self, messages: List[Dict[str, str]], temperature: float) -> Completion:
+        try:
+            response = await self._client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+            )
+        except self._openai.APIError as e:
+            raise self._translate(e)
+        usage = getattr(response, "usage", None)
+        return Completion(response.choices[0].message.content, usage.total_tokens if usage is not None else None)
+
+    async def stream(self, messages: List[Dict[str, str]], temperature: float) -> AsyncIterator[str]:
+        try:
+            stream = await self._client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=temperature,
+                stream=True,
+            )
+        except self._openai.APIError as e:
+            raise self._translate(e)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except self._openai.APIError as e:
+            raise self._translate(e)
+        finally:
+            # Release the connection if the consumer stops early
+            await stream.close()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+class GeminiProvider(Provider):
+    """Gemini over its REST API, so no extra SDK is needed."""
+
+    name = "gemini"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        base_url: str = GEMINI_BASE_URL,
+        timeout: float = 60,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+    ):
+        super().__init__(model)
+        self.api_key = api_key or os.getenv("GEMINI_API_KEY")
+        self.base_url = base_url.rstrip("/")
+        self._http = _pooled_http(timeout, max_connections)
+        if self.api_key:
+            self._http.headers["x-goog-api-key"] = self.api_key
+
+    def _body(self, messages: List[Dict[str, str]], temperature: float) -> Dict:
+        system = [{"text": m["content"]} for m in messages if m.get("role") == "system"]
+        contents = [
+            {"role": "model" if m.get("role") == "assistant" else "user", "parts": [{"text": m.get("content") or ""}]}
+            for m in messages
+            if m.get("role") != "system"
+        ]
+        body = {"contents": contents, "generationConfig": {"temperature": temperature}}
+        if system:
+            body["systemInstruction"] = {"parts": system}
+        return body
+
+    def _url(self, action: str) -> str:
+        return f"{self.base_url}/v1beta/models/{self.model}:{action}"
+
+    @staticmethod
+    def _check(response: httpx.Response, detail: str):
+        if response.status_code == 429:
+            raise ProviderRateLimited(detail)
+        if response.status_code >= 500:
+            raise ProviderUnavailable(detail)
+        if response.status_code >= 400:
+            raise ProviderError(detail)
+
+    @staticmethod
+    def _text(data: Dict) -> str:
+        candidates = data.get("candidates") or [{}]
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(part.get("text", "") for part in parts)
+
+    async def complete(self, messages: List[Dict[str, str]], temperature: float) -> Completion:
+        try:
+            response = await self._http.post(
+                self._url("generateContent"),
+                json=self._body(messages, temperature),
+            )
+        except httpx.TransportError as e:
+            raise ProviderUnavailable(str(e))
+        self._check(response, response.text)
+        data = response.json()
+        return Completion(self._text(data), (data.get("usageMetadata") or {}).get("totalTokenCount"))
+
+    async def stream(self, messages: List[Dict[str, str]], temperature: float) -> AsyncIterator[str]:
+        try:
+            async with self._http.stream(
+                "POST",
+                self._url("streamGenerateContent"),
+                params={"alt": "sse"},
+                json=self._body(messages, temperature),
+            ) as response:
+                if response.status_code >= 400:
+                    self._check(response, (await response.aread()).decode("utf-8", "replace"))
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        text = self._text(json.loads(line[5:]))
+                        if text:
+                            yield text
+        except httpx.TransportError as e:
+            raise ProviderUnavailable(str(e))
+
+    async def aclose(self):
+        await self._http.aclose()
+
+
+class StubProvider(Provider):
+    """The stub model in-process: no network, no server."""
+
+    name = "stub"
+
+    def __init__(self, model: Optional[str] = None, timeout: float = 60, stub=None):
+        from stub_llm import StubModel
+
+        super().__init__(model)
+        self.stub = stub or StubModel()
+
+    async def _behave(self):
+        from stub_llm import ERROR, HANG, RATE_LIMITED
+
+        outcome = self.stub.outcome()
+        await asyncio.sleep(self.stub.latency())
+        if outcome == ERROR:
+            raise ProviderUnavailable("Stub upstream error")
+        if outcome == RATE_LIMITED:
+            raise ProviderRateLimited("Stub rate limit")
+        if outcome == HANG:
+            await asyncio.sleep(3600)
+
+    async def complete(self, messages: List[Dict[str, str]], temperature: float) -> Completion:
+        await self._behave()
+        text = self.stub.reply(messages)
+        prompt = sum(len(message.get("content") or "") for message in messages)
+        return Completion(text, (prompt + len(text)) // 4)
+
+    async def stream(self, messages: List[Dict[str, str]], temperature: float) -> AsyncIterator[str]:
+        await self._behave()
+        async for chunk in self.stub.stream(self.stub.reply(messages)):
+            yield chunk
+
+
+PROVIDERS = {
+    "openai": OpenAIProvider,
+    "gemini": GeminiProvider,
+    "stub": StubProvider,
+}
+
+
+def create_provider(name: str = LLM_PROVIDER, model: Optional[str] = LLM_MODEL, **kwargs) -> Provider:
+    try:
+        provider = PROVIDERS[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown LLM provider {name!r}; expected one of {', '.join(PROVIDERS)}")
+    return provider(model=model, **kwargs)
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select
+
+from database import engine
+from models import BankQuestion
+from near_duplicates import NearDuplicateIndex
+
+# Rows indexed per lock hold while warming, so adds never wait behind the whole bank
+DEDUPE_WARM_BATCH = int(os.getenv("DEDUPE_WARM_BATCH", 5000))
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+def content_hash(question: Dict[str, Any]) -> str:
+    # Same stem and option set (in any order) means the same question
+    options = question.get("options") or []
+    if isinstance(options, dict):
+        options = list(options.values())
+    parts = [_normalize(question.get("question", ""))] + sorted(_normalize(option) for option in options)
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class QuestionBank:
+    """Postgres-backed store of every generated question.
+
+    Methods are synchronous SQLModel calls run on a worker thread so they
+    don't block the event loop. Paraphrased near-duplicates of banked
+    questions are rejected on the way in; ``start`` loads the index for
+    that in the background.
+    """
+
+    def __init__(self, bind=engine, dedupe: Optional[NearDuplicateIndex] = None):
+        self._engine = bind
+        self._dedupe = dedupe if dedupe is not None else NearDuplicateIndex()
+        self._dedupe_lock = threading.Lock()
+        self._indexed_id = 0
+        self._warming = False
+        self._warm_task: Optional[asyncio.Task] = None
+        self.rejected = 0
+
+    def _sync_dedupe(self, session: Session, limit: Optional[int] = None) -> int:
+        # Index rows added since the last sync, by this worker or any other.
+        # Payloads are only read for rows banked without a stored signature.
+        statement = (
+            select(BankQuestion.id, BankQuestion.content_hash, BankQuestion.minhash)
+            .where(BankQuestion.id > self._indexed_id)
+            .order_by(BankQuestion.id)
+        )
+        if limit is not None:
+            statement = statement.limit(limit)
+        rows = session.exec(statement).all()
+        hasher = self._dedupe.hasher
+        unsigned = [row_id for row_id, _, minhash in rows if not minhash or len(minhash) != hasher.num_perm * 4]
+        payloads = dict(session.exec(
+            select(BankQuestion.id, BankQuestion.payload).where(BankQuestion.id.in_(unsigned))
+        ).all()) if unsigned else {}
+        for row_id, digest, minhash in rows:
+            if row_id in payloads:
+                signature = hasher.question_signature(payloads[row_id])
+            else:
+                signature = np.frombuffer(minhash, dtype=np.uint32)
+            self._dedupe.add(digest, signature)
+            self._indexed_id = row_id
+        return len(rows)
+
+    def _warm_batch(self) -> bool:
+        # True once the index has caught up with the bank
+        with self._dedupe_lock, Session(self._engine) as session:
+            return self._sync_dedupe(session, limit=DEDUPE_WARM_BATCH) < DEDUPE_WARM_BATCH
+
+    async def warm(self):
+        # Load the index in batches off the request path. Until it has caught
+        # up, adds check against what is indexed so far instead of waiting.
+        self._warming = True
+        try:
+            while not await asyncio.to_thread(self._warm_batch):
+                pass
+        finally:
+            self._warming = False
+
+    async def _warm_in_background(self):
+        try:
+            await self.warm()
+        except Exception as e:
+            print(f"Failed to warm question bank dedupe index: {e}")
+
+    async def start(self):
+        if self._warm_task is None:
+            self._warm_task = asyncio.ensure_future(self._warm_in_background())
+
+    async def stop(self):
+        if self._warm_task is not None:
+            self._warm_task.cancel()
+            await asyncio.gather(self._warm_task, return_exceptions=True)
+            self._warm_task = None
+
+    def _insert_new(self, rows: List[Dict[str, Any]]):
+        # Another worker may have banked the same question since our sync.
+        # Both dialects spell ON CONFLICT DO NOTHING; SQLite is for tests.
+        dialect = sqlite if self._engine.dialect.name == "sqlite" else postgresql
+        return (
+            dialect.insert(BankQuestion.__table__)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["content_hash"])
+        )
+
+    def _add(self, topic: str, difficulty: str, questions: List[Dict[str, Any]]) -> int:
+        with self._dedupe_lock, Session(self._engine) as session:
+            if not self._warming:
+                self._sync_dedupe(session)
+            unique = self._dedupe.filter([(content_hash(question), question) for question in questions])
+            self.rejected += len(questions) - len(unique)
+            if not unique:
+                return 0
+            result = session.execute(self._insert_new([
+                {
+                    "topic": topic,
+                    "difficulty": difficulty,
+                    "content_hash": digest,
+                    "payload": question,
+                    "minhash": signature.tobytes(),
+                    "times_served": 0,
+                    "created_at": datetime.utcnow(),
+                }
+                for digest, question, signature in unique
+            ]))
+            session.commit()
+            # The new rows reach the index through the next sync
+            return result.rowcount
+
+    def _sample(self, topic: str, difficulty: str, n: int) -> List[Dict[str, Any]]:
+        # Least-served first, random within a tier, so cohorts rotate through the bank
+        statement = (
+            select(BankQuestion)
+            .where(BankQuestion.topic == topic, BankQuestion.difficulty == difficulty)
+            .order_by(BankQuestion.times_served, func.random())
+            .limit(n)
+        )
+        with Session(self._engine) as session:
+            rows = session.exec(statement).all()
+            if len(rows) < n:
+                # Too thin to serve; don't count these as served
+                return [row.payload for row in rows]
+            session.execute(
+                update(BankQuestion)
+                .where(BankQuestion.id.in_([row.id for row in rows]))
+                .values(times_served=BankQuestion.times_served + 1, last_served_at=datetime.utcnow())
+            )
+            session.commit()
+            return [row.payload for row in rows]
+
+    def _count(self, topic: str, difficulty: str, max_served: Optional[int] = None) -> int:
+        statement = (
+            select(func.count())
+            .select_from(BankQuestion)
+            .where(BankQuestion.topic == topic, BankQuestion.difficulty == difficulty)
+        )
+        if max_served is not None:
+            statement = statement.where(BankQuestion.times_served < max_served)
+        with Session(self._engine) as session:
+            return session.exec(statement).one()
+
+    async def add(self, topic: str, difficulty: str, questions: List[Dict[str, Any]]) -> int:
+        return await asyncio.to_thread(self._add, topic, difficulty, questions)
+
+    async def sample(self, topic: str, difficulty: str, n: int) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._sample, topic, difficulty, n)
+
+    async def count(self, topic: str, difficulty: str, max_served: Optional[int] = None) -> int:
+        return await asyncio.to_thread(self._count, topic, difficulty, max_served)
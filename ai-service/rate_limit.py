@@ -0,0 +1,176 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+from scheduler import BACKGROUND, current_context
+
+# Provider quota configuration; 0 disables that limit
+LLM_RPM = int(os.getenv("LLM_RPM", 500))
+LLM_TPM = int(os.getenv("LLM_TPM", 30000))
+# Longest a call may queue for quota before it is refused
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", 30))
+# Share of each bucket background calls leave for interactive ones
+LLM_BACKGROUND_RESERVE = float(os.getenv("LLM_BACKGROUND_RESERVE", 0.25))
+# Completion budget assumed when the caller gives none
+LLM_DEFAULT_COMPLETION_TOKENS = int(os.getenv("LLM_DEFAULT_COMPLETION_TOKENS", 500))
+
+# Refills both buckets from the Redis clock, then takes one request and
+# ARGV[3] tokens if both have enough left over above the ARGV[4] share held
+# in reserve. Returns 0 when admitted, otherwise the milliseconds until they
+# would be, leaving the buckets untouched.
+ACQUIRE_SCRIPT = """
+local t = redis.call("TIME")
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local rpm, tpm, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local reserve = tonumber(ARGV[4])
+
+local function level(key, capacity)
+    local state = redis.call("HMGET", key, "level", "ts")
+    local current = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    return math.min(capacity, current + (now - ts) * capacity / 60000)
+end
+
+-- {key, capacity, amount}; a limit set to 0 has no bucket at all.
+-- A call larger than the whole bucket would never fit; let it drain a full one
+local buckets = {}
+if rpm > 0 then
+    table.insert(buckets, {KEYS[1], rpm, 1})
+end
+if tpm > 0 then
+    table.insert(buckets, {KEYS[2], tpm, math.min(cost, tpm)})
+end
+
+local wait = 0
+for _, bucket in ipairs(buckets) do
+    local capacity, amount = bucket[2], bucket[3]
+    bucket[4] = level(bucket[1], capacity)
+    local need = math.min(capacity, amount + reserve * capacity)
+    if bucket[4] < need then
+        wait = math.max(wait, (need - bucket[4]) * 60000 / capacity)
+    end
+end
+if wait > 0 then
+    return math.ceil(wait)
+end
+
+for _, bucket in ipairs(buckets) do
+    redis.call("HSET", bucket[1], "level", tostring(bucket[4] - bucket[3]), "ts", now)
+    redis.call("PEXPIRE", bucket[1], 120000)
+end
+return 0
+"""
+
+# Gives back over-estimated tokens (or charges under-estimated ones)
+SETTLE_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    redis.call("HINCRBYFLOAT", KEYS[1], "level", ARGV[1])
+end
+return 0
+"""
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    # ~4 characters per token for English, plus per-message framing
+    return sum(len(message.get("content") or "") // 4 + 4 for message in messages) + 2
+
+
+class TokenBucketLimiter:
+    """Keeps LLM calls from every worker inside the provider's RPM and TPM.
+
+    Two token buckets live in Redis and are updated atomically by a script,
+    so all API and pre-generation workers draw on one quota. Callers that
+    don't fit wait their turn in-process, up to ``max_wait``.
+
+    Each process schedules its own lanes, so a pre-generation worker's
+    background calls never queue behind the API's interactive ones. Instead
+    they stop drawing while either bucket is below ``background_reserve``,
+    keeping that share for interactive calls.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        name: str = "llm",
+        rpm: int = LLM_RPM,
+        tpm: int = LLM_TPM,
+        max_wait: float = LLM_RATE_LIMIT_MAX_WAIT,
+        background_reserve: float = LLM_BACKGROUND_RESERVE,
+    ):
+        self._redis = redis_client
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_wait = max_wait
+        self.background_reserve = background_reserve
+        self._keys = [f"ratelimit:{name}:requests", f"ratelimit:{name}:tokens"]
+        self._acquire = redis_client.register_script(ACQUIRE_SCRIPT)
+        self._settle = redis_client.register_script(SETTLE_SCRIPT)
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.queued = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0
+
+    async def acquire(self, tokens: int, max_wait: Optional[float] = None):
+        if not self.enabled:
+            return
+        started = time.monotonic()
+        deadline = started + (self.max_wait if max_wait is None else max_wait)
+        reserve = self.background_reserve if current_context().lane == BACKGROUND else 0
+        queued = False
+        try:
+            while True:
+                wait_ms = await self._acquire(keys=self._keys, args=[self.rpm, self.tpm, tokens, reserve])
+                if not wait_ms:
+                    break
+                if not queued:
+                    queued = True
+                    self.queued += 1
+                    self.waiting += 1
+                if time.monotonic() + wait_ms / 1000 > deadline:
+                    self.rejected += 1
+                    raise RateLimitExceeded(
+                        f"LLM quota exhausted; next slot in {wait_ms / 1000:.1f}s"
+                    )
+                # Jitter so queued callers across workers don't retry in lockstep
+                await asyncio.sleep(wait_ms / 1000 * random.uniform(1.0, 1.2))
+        finally:
+            if queued:
+                self.waiting -= 1
+        waited = time.monotonic() - started
+        self.admitted += 1
+        self.wait_seconds_total += waited
+        self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    async def settle(self, estimated: int, actual: Optional[int]):
+        if self.tpm <= 0 or actual is None or actual == estimated:
+            return
+        try:
+            await self._settle(keys=self._keys[1:], args=[estimated - actual])
+        except Exception as e:
+            print(f"Failed to settle LLM token usage: {e}")
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "background_reserve": self.background_reserve,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+            "wait_seconds_max": round(self.wait_seconds_max, 3),
+            "wait_seconds_avg": round(self.wait_seconds_total / self.admitted, 3) if self.admitted else 0.0,
+        }
@@ -0,0 +1,64 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+# Redis connection configuration
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 64))
+# How long a caller waits for a free pooled connection before failing
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 2))
+# Must exceed the longest blocking read (see JOB_BLOCK_MS)
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 10))
+# Idle connections are PINGed before reuse after this many seconds
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+REDIS_MGET_CHUNK = int(os.getenv("REDIS_MGET_CHUNK", 500))
+
+
+def create_redis(url: str = REDIS_URL, max_connections: int = REDIS_MAX_CONNECTIONS) -> aioredis.Redis:
+    """Async client over one bounded pool, shared by everything in the process.
+
+    The blocking pool makes callers queue for a connection when it is
+    exhausted instead of opening sockets without limit.
+    """
+    pool = aioredis.BlockingConnectionPool.from_url(
+        url,
+        max_connections=max_connections,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        retry_on_timeout=True,
+    )
+    # from_pool hands ownership over, so aclose() also disconnects the pool
+    return aioredis.Redis.from_pool(pool)
+
+
+@asynccontextmanager
+async def pipeline(redis_client, transaction: bool = False):
+    # Queue commands inside the block; they go out in one round trip on exit
+    pipe = redis_client.pipeline(transaction=transaction)
+    yield pipe
+    await pipe.execute()
+
+
+async def mget(redis_client, keys: List[str], chunk: int = REDIS_MGET_CHUNK) -> List[Optional[bytes]]:
+    # Huge MGETs block Redis for everyone; split them but keep one round trip
+    if len(keys) <= chunk:
+        return await redis_client.mget(keys) if keys else []
+    pipe = redis_client.pipeline(transaction=False)
+    for start in range(0, len(keys), chunk):
+        pipe.mget(keys[start:start + chunk])
+    values: List[Optional[bytes]] = []
+    for part in await pipe.execute():
+        values.extend(part)
+    return values
+
+
+async def setex_many(redis_client, items: Dict[str, bytes], ttl: int):
+    async with pipeline(redis_client) as pipe:
+        for key, value in items.items():
+            pipe.setex(key, ttl, value)
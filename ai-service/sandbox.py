@@ -0,0 +1,394 @@
+import asyncio
+import gc
+import io
+import json
+import marshal
+import multiprocessing
+import os
+import random
+import resource
+import signal
+import string
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+
+# Sandbox configuration
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", os.cpu_count() or 2))
+SANDBOX_TIMEOUT_SECONDS = float(os.getenv("SANDBOX_TIMEOUT_SECONDS", 5))
+SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", 5))
+SANDBOX_MEMORY_BYTES = int(os.getenv("SANDBOX_MEMORY_BYTES", 256 * 1024 * 1024))
+SANDBOX_OUTPUT_BYTES = int(os.getenv("SANDBOX_OUTPUT_BYTES", 64 * 1024))
+SANDBOX_MAX_JOBS_PER_WORKER = int(os.getenv("SANDBOX_MAX_JOBS_PER_WORKER", 100))
+SANDBOX_START_METHOD = os.getenv("SANDBOX_START_METHOD", "forkserver")
+# Bump whenever execution semantics change; cached evaluation results are keyed on it
+SANDBOX_RUNNER_VERSION = 7
+# Unmarshalled submission code objects each worker keeps around
+SANDBOX_MODULE_CACHE = int(os.getenv("SANDBOX_MODULE_CACHE", 8))
+# Hottest lines reported by the optional line profile
+SANDBOX_HOT_LINES = int(os.getenv("SANDBOX_HOT_LINES", 5))
+
+SUBMISSION_FILENAME = "<submission>"
+
+# All a submission gets of the server's environment; API keys and database
+# URLs must not be readable by the code being evaluated
+SANDBOX_ENV_ALLOWLIST = ("PATH", "LANG", "LC_ALL", "LC_CTYPE", "TZ")
+
+# Built-in inputs for timing ladders; each takes the size n and returns the call's args
+LADDER_INPUT_KINDS = ("int", "list", "sorted_list", "string")
+
+
+class OutputLimitExceeded(Exception):
+    pass
+
+
+class _BoundedWriter(io.StringIO):
+    def __init__(self, limit: int):
+        super().__init__()
+        self.limit = limit
+
+    def write(self, s):
+        if self.tell() + len(s) > self.limit:
+            raise OutputLimitExceeded(f"Output limit of {self.limit} bytes exceeded")
+        return super().write(s)
+
+
+def _apply_limits(memory_bytes: int):
+    if memory_bytes > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+    # No core dumps from killed submissions
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def _limit_cpu(cpu_seconds: int):
+    # RLIMIT_CPU counts the whole process lifetime, so extend it from current usage.
+    # Only the soft limit moves: a lowered hard limit could never be raised again
+    # for the next job once this worker had used more CPU.
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    used = int(usage.ru_utime + usage.ru_stime) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = used + cpu_seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def prepare_submission(code: str) -> Dict[str, Any]:
+    # Compile once in the parent; raises SyntaxError for invalid code.
+    # Workers keep the unmarshalled code under this id for the rest of the
+    # evaluation's test cases.
+    code_object = compile(code, SUBMISSION_FILENAME, "exec")
+    return {
+        "submission_id": uuid.uuid4().hex,
+        "bytecode": marshal.dumps(code_object),
+    }
+
+
+_code_objects: "OrderedDict[str, Any]" = OrderedDict()
+
+
+def _load_code(job: Dict[str, Any]):
+    # Test cases for the same submission reuse its unmarshalled code
+    submission_id = job.get("submission_id")
+    if submission_id is not None and submission_id in _code_objects:
+        _code_objects.move_to_end(submission_id)
+        return _code_objects[submission_id]
+
+    if "bytecode" in job:
+        code = marshal.loads(job["bytecode"])
+    else:
+        code = compile(job["code"], SUBMISSION_FILENAME, "exec")
+    if submission_id is not None:
+        _code_objects[submission_id] = code
+        while len(_code_objects) > SANDBOX_MODULE_CACHE:
+            _code_objects.popitem(last=False)
+    return code
+
+
+def _load_module(job: Dict[str, Any]) -> Dict[str, Any]:
+    # A fresh namespace per job: module globals must not carry over between
+    # test cases, or a result would depend on which worker ran what before it
+    namespace: Dict[str, Any] = {"__name__": "__submission__"}
+    exec(_load_code(job), namespace)
+    return namespace
+
+
+def _line_tracer(counts: Counter):
+    # Only count lines of the submission itself, not the stdlib it calls
+    def trace(frame, event, arg):
+        if frame.f_code.co_filename != SUBMISSION_FILENAME:
+            return None
+        if event == "line":
+            counts[frame.f_lineno] += 1
+        return trace
+    return trace
+
+
+def _call_profiled(function, args, metrics: Dict[str, Any], line_counts: Optional[Counter]):
+    # Timings include tracemalloc (and, if enabled, tracing) overhead,
+    # so compare them only with runs measured the same way
+    tracemalloc.start()
+    if line_counts is not None:
+        sys.settrace(_line_tracer(line_counts))
+    wall_started, cpu_started = time.perf_counter(), time.process_time()
+    try:
+        return function(*args)
+    finally:
+        metrics["wall_ms"] = (time.perf_counter() - wall_started) * 1000
+        metrics["cpu_ms"] = (time.process_time() - cpu_started) * 1000
+        sys.settrace(None)
+        metrics["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if line_counts is not None:
+            metrics["lines_executed"] = sum(line_counts.values())
+            metrics["hot_lines"] = line_counts.most_common(SANDBOX_HOT_LINES)
+
+
+def _ladder_input(kind: str, n: int) -> List[Any]:
+    # Seeded by size so every run of a ladder times the same data
+    rng = random.Random(n)
+    if kind == "int":
+        return [n]
+    if kind == "list":
+        return [[rng.randrange(10 * n + 1) for _ in range(n)]]
+    if kind == "sorted_list":
+        return [list(range(n))]
+    if kind == "string":
+        return ["".join(rng.choice(string.ascii_lowercase) for _ in range(n))]
+    raise ValueError(f"Unknown input kind: {kind}")
+
+
+def _time_ladder(function, job: Dict[str, Any], namespace: Dict[str, Any]) -> Dict[str, Any]:
+    # Best of ``repeats`` per size, with the collector off like timeit. The
+    # ladder ends as soon as one call or the whole ladder runs over budget,
+    # even mid-size, or once a size runs out of memory or output.
+    generator = namespace[job["input_generator"]] if job.get("input_generator") else None
+    repeats = max(1, job.get("repeats", 3))
+    max_call_seconds = job.get("max_call_seconds", 1.0)
+    deadline = time.perf_counter() + job.get("budget_seconds", SANDBOX_TIMEOUT_SECONDS)
+    timings = []
+    for n in job["sizes"]:
+        best = None
+        over_budget = False
+        try:
+            for _ in range(repeats):
+                # Fresh input per call so in-place mutation doesn't skew later repeats
+                args = list(generator(n)) if generator is not None else _ladder_input(job.get("input_kind", "list"), n)
+                gc.collect()
+                gc.disable()
+                started = time.perf_counter()
+                try:
+                    function(*args)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    gc.enable()
+                best = elapsed if best is None else min(best, elapsed)
+                over_budget = elapsed > max_call_seconds or time.perf_counter() > deadline
+                if over_budget:
+                    break
+        except (MemoryError, OutputLimitExceeded):
+            # This size doesn't fit in the limits; the smaller ones still make an estimate
+            break
+        timings.append([n, best])
+        if over_budget:
+            break
+    return {"timings": timings, "stopped_early": len(timings) < len(job["sizes"])}
+
+
+def _execute(job: Dict[str, Any], output_bytes: int) -> Dict[str, Any]:
+    stdout = _BoundedWriter(output_bytes)
+    metrics: Dict[str, Any] = {}
+    line_counts = Counter() if job.get("profile_lines") else None
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    sys.stdout = sys.stderr = stdout
+    try:
+        _limit_cpu(job.get("cpu_seconds", SANDBOX_CPU_SECONDS))
+        namespace = _load_module(job)
+        function = namespace[job["function_name"]]
+        if "sizes" in job:
+            result = _time_ladder(function, job, namespace)
+        else:
+            result = _call_profiled(function, job.get("args", []), metrics, line_counts)
+    except MemoryError:
+        return {"error": "Memory limit exceeded", "stdout": stdout.getvalue(), "metrics": metrics}
+    except BaseException as e:
+        return {"error": f"{type(e).__name__}: {e}"[:output_bytes], "stdout": stdout.getvalue(), "metrics": metrics}
+    finally:
+        sys.stdout, sys.stderr = real_stdout, real_stderr
+
+    # Only plain JSON leaves the worker; anything else goes back as its repr
+    try:
+        payload = json.dumps(result)
+    except Exception:
+        try:
+            result = repr(result)
+        except Exception as e:
+            return {"error": f"Result could not be serialised: {type(e).__name__}", "stdout": stdout.getvalue(), "metrics": metrics}
+        payload = json.dumps(result)
+    if len(payload) > output_bytes:
+        return {"error": f"Output limit of {output_bytes} bytes exceeded", "stdout": stdout.getvalue(), "metrics": metrics}
+    return {"result": result, "stdout": stdout.getvalue(), "metrics": metrics}
+
+
+def _scrub_environment():
+    kept = {key: os.environ[key] for key in SANDBOX_ENV_ALLOWLIST if key in os.environ}
+    os.environ.clear()
+    os.environ.update(kept)
+
+
+def _worker_main(conn, memory_bytes: int, output_bytes: int):
+    # Submissions must not see SIGINT meant for the server, nor its secrets
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _scrub_environment()
+    _apply_limits(memory_bytes)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if job is None:
+            return
+        conn.send_bytes(json.dumps(_execute(job, output_bytes)).encode("utf-8"))
+
+
+class SandboxWorker:
+    def __init__(self, context, memory_bytes: int, output_bytes: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_bytes, output_bytes),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        # Result and stdout are each capped at output_bytes characters; allow
+        # for JSON escaping of non-ASCII text plus metrics and error text
+        self.max_reply_bytes = 16 * output_bytes + 64 * 1024
+
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def call(self, job: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        # Blocking; runs on a thread so the event loop stays free
+        self.jobs += 1
+        try:
+            self.conn.send(job)
+            if not self.conn.poll(timeout):
+                self.kill()
+                return {"error": f"Time limit of {timeout}s exceeded", "timed_out": True, "retryable": True}
+            payload = self.conn.recv_bytes(self.max_reply_bytes)
+        except EOFError:
+            self.process.join(timeout=1)
+            # Depends on load and timing, so don't treat it as the submission's answer
+            return {"error": self._death_reason(), "retryable": True}
+        except OSError:
+            if self.process.is_alive():
+                # Oversized reply; nothing after it on the pipe can be trusted
+                self.kill()
+                return {"error": "Sandbox reply exceeded the size limit"}
+            self.process.join(timeout=1)
+            return {"error": self._death_reason(), "retryable": True}
+        # The submission runs in the worker and can write to this pipe itself,
+        # so its replies are parsed as data and never unpickled
+        try:
+            reply = json.loads(payload)
+        except ValueError:
+            reply = None
+        if not isinstance(reply, dict):
+            self.kill()
+            return {"error": "Sandbox worker sent a malformed reply"}
+        return reply
+
+    def _death_reason(self) -> str:
+        exitcode = self.process.exitcode
+        if exitcode in (-signal.SIGXCPU, -signal.SIGKILL):
+            return "CPU time limit exceeded"
+        return f"Sandbox worker exited unexpectedly (exit code {exitcode})"
+
+
+class SandboxPool:
+    """Pool of pre-started processes that run untrusted submissions.
+
+    Each job gets a wall-clock timeout enforced here and CPU, memory and
+    output limits enforced inside the worker. Workers that time out, crash
+    or reach ``max_jobs_per_worker`` are replaced with fresh processes.
+    This isolates resource use; it is not a security boundary on its own.
+    """
+
+    def __init__(
+        self,
+        size: int = SANDBOX_WORKERS,
+        timeout: float = SANDBOX_TIMEOUT_SECONDS,
+        cpu_seconds: int = SANDBOX_CPU_SECONDS,
+        memory_bytes: int = SANDBOX_MEMORY_BYTES,
+        output_bytes: int = SANDBOX_OUTPUT_BYTES,
+        max_jobs_per_worker: int = SANDBOX_MAX_JOBS_PER_WORKER,
+        start_method: str = SANDBOX_START_METHOD,
+    ):
+        self.size = size
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.output_bytes = output_bytes
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._context = multiprocessing.get_context(start_method)
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers = set()
+        self.recycled = 0
+
+    def _spawn(self) -> SandboxWorker:
+        worker = SandboxWorker(self._context, self.memory_bytes, self.output_bytes)
+        self._workers.add(worker)
+        return worker
+
+    def _retire(self, worker: SandboxWorker):
+        self._workers.discard(worker)
+        worker.kill()
+        self.recycled += 1
+
+    async def start(self):
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        workers = await asyncio.gather(*[asyncio.to_thread(self._spawn) for _ in range(self.size)])
+        for worker in workers:
+            self._idle.put_nowait(worker)
+
+    async def stop(self):
+        for worker in list(self._workers):
+            self._retire(worker)
+        self._idle = None
+
+    async def run(self, job: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        if self._idle is None:
+            await self.start()
+        job = dict(job)
+        job.setdefault("cpu_seconds", self.cpu_seconds)
+        worker = await self._idle.get()
+        call = asyncio.ensure_future(asyncio.to_thread(worker.call, job, timeout or self.timeout))
+        try:
+            return await asyncio.shield(call)
+        finally:
+            # A cancelled caller leaves the job running; kill it rather than reuse the worker
+            if not call.done() or not worker.alive() or worker.jobs >= self.max_jobs_per_worker:
+                self._retire(worker)
+                worker = await asyncio.to_thread(self._spawn) if self._idle is not None else None
+            if worker is not None and self._idle is not None:
+                self._idle.put_nowait(worker)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": len(self._workers),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            "recycled": self.recycled,
+        }
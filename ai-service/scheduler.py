@@ -0,0 +1,195 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+# Relative shares of upstream capacity, e.g. {"acme": 3}; unlisted names weigh 1
+LLM_TENANT_WEIGHTS = json.loads(os.getenv("LLM_TENANT_WEIGHTS", "{}"))
+LLM_ENDPOINT_WEIGHTS = json.loads(os.getenv("LLM_ENDPOINT_WEIGHTS", "{}"))
+# Longest an interactive call may queue for a slot before it is dropped
+LLM_QUEUE_DEADLINE_SECONDS = float(os.getenv("LLM_QUEUE_DEADLINE_SECONDS", 30))
+# How often queued callers check whether their client is still connected
+LLM_DISCONNECT_POLL_SECONDS = float(os.getenv("LLM_DISCONNECT_POLL_SECONDS", 1))
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+# Highest priority first
+LANES = (INTERACTIVE, BACKGROUND)
+
+
+class CallContext(NamedTuple):
+    tenant: str = "anonymous"
+    endpoint: str = "default"
+    lane: str = INTERACTIVE
+    # time.monotonic() after which a queued call is no longer worth making
+    deadline: Optional[float] = None
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
+
+
+_context: ContextVar[CallContext] = ContextVar("llm_call_context", default=CallContext())
+
+
+def current_context() -> CallContext:
+    return _context.get()
+
+
+@contextmanager
+def call_context(**fields):
+    # Fields not given are inherited from the enclosing context
+    token = _context.set(_context.get()._replace(**fields))
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def shared_call():
+    # For work other callers also wait on: one of them leaving must not drop it
+    return call_context(is_disconnected=None)
+
+
+class RequestDropped(Exception):
+    pass
+
+
+class _Waiter:
+    __slots__ = ("lane", "start", "future", "deadline", "is_disconnected")
+
+    def __init__(self, lane: str, start: float, future: asyncio.Future, context: CallContext):
+        self.lane = lane
+        self.start = start
+        self.future = future
+        self.deadline = context.deadline
+        self.is_disconnected = context.is_disconnected
+
+
+class FairScheduler:
+    """Hands out upstream call slots in weighted fair order.
+
+    Interactive calls always go before background ones. Within a lane each
+    (tenant, endpoint) flow is served in proportion to its weight: a call is
+    tagged with a virtual finish time of ``max(lane clock, flow's last
+    finish) + cost / weight`` and the smallest tag goes next, so one heavy
+    flow can't starve the rest. Queued calls are dropped once their
+    deadline passes or their client has gone.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        tenant_weights: Optional[Dict[str, float]] = None,
+        endpoint_weights: Optional[Dict[str, float]] = None,
+        poll_interval: float = LLM_DISCONNECT_POLL_SECONDS,
+    ):
+        self.capacity = capacity
+        self.tenant_weights = LLM_TENANT_WEIGHTS if tenant_weights is None else tenant_weights
+        self.endpoint_weights = LLM_ENDPOINT_WEIGHTS if endpoint_weights is None else endpoint_weights
+        self.poll_interval = poll_interval
+        self._active = 0
+        self._seq = itertools.count()
+        self._queues: Dict[str, List[Tuple[float, int, _Waiter]]] = {lane: [] for lane in LANES}
+        self._clock = {lane: 0.0 for lane in LANES}
+        self._finish: Dict[Tuple[str, str, str], float] = {}
+        self.admitted = {lane: 0 for lane in LANES}
+        self.queued = {lane: 0 for lane in LANES}
+        self.dropped = {"deadline": 0, "disconnected": 0}
+
+    def weight(self, tenant: str, endpoint: str) -> float:
+        return max(float(self.tenant_weights.get(tenant, 1)) * float(self.endpoint_weights.get(endpoint, 1)), 1e-6)
+
+    async def acquire(self, cost: float = 1.0):
+        context = _context.get()
+        lane = context.lane if context.lane in self._queues else INTERACTIVE
+        flow = (lane, context.tenant, context.endpoint)
+        start = max(self._clock[lane], self._finish.get(flow, 0.0))
+        finish = start + max(cost, 1) / self.weight(context.tenant, context.endpoint)
+        self._finish[flow] = finish
+        if len(self._finish) > 4096:
+            # Flows the clock has passed would start from the clock anyway
+            self._finish = {f: t for f, t in self._finish.items() if t > self._clock[f[0]]}
+
+        waiter = _Waiter(lane, start, asyncio.get_running_loop().create_future(), context)
+        heapq.heappush(self._queues[lane], (finish, next(self._seq), waiter))
+        self._dispatch()
+        try:
+            if not waiter.future.done():
+                self.queued[lane] += 1
+                await self._wait(waiter)
+            waiter.future.result()
+        except BaseException:
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                # Granted just as we gave up; pass the slot on
+                self.release()
+            else:
+                waiter.future.cancel()
+            raise
+        self.admitted[lane] += 1
+
+    async def _wait(self, waiter: _Waiter):
+        while not waiter.future.done():
+            timeout = self.poll_interval if waiter.is_disconnected is not None else None
+            if waiter.deadline is not None:
+                remaining = waiter.deadline - time.monotonic()
+                timeout = remaining if timeout is None else min(timeout, remaining)
+            if timeout is None or timeout > 0:
+                await asyncio.wait({waiter.future}, timeout=timeout)
+                if waiter.future.done():
+                    return
+            if waiter.deadline is not None and time.monotonic() >= waiter.deadline:
+                self.dropped["deadline"] += 1
+                raise RequestDropped("Timed out waiting for an LLM slot")
+            if waiter.is_disconnected is not None and await waiter.is_disconnected():
+                self.dropped["disconnected"] += 1
+                raise RequestDropped("Client disconnected while waiting for an LLM slot")
+
+    def _next(self) -> Optional[_Waiter]:
+        for lane in LANES:
+            if self._queues[lane]:
+                return heapq.heappop(self._queues[lane])[2]
+        return None
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while self._active < self.capacity:
+            waiter = self._next()
+            if waiter is None:
+                return
+            if waiter.future.done():
+                continue
+            if waiter.deadline is not None and now >= waiter.deadline:
+                self.dropped["deadline"] += 1
+                waiter.future.set_exception(RequestDropped("Timed out waiting for an LLM slot"))
+                continue
+            self._clock[waiter.lane] = max(self._clock[waiter.lane], waiter.start)
+            self._active += 1
+            waiter.future.set_result(None)
+
+    def release(self):
+        self._active -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1.0):
+        await self.acquire(cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "active": self._active,
+            "queue_depth": {
+                lane: sum(1 for _, _, waiter in queue if not waiter.future.done())
+                for lane, queue in self._queues.items()
+            },
+            "admitted": dict(self.admitted),
+            "queued": dict(self.queued),
+            "dropped": dict(self.dropped),
+        }
@@ -0,0 +1,162 @@
+import json
+import os
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Semantic topic matching configuration
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+# Cosine similarity above which a cached topic answers for a new one
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.85))
+SEMANTIC_DIM = int(os.getenv("SEMANTIC_DIM", 1024))
+SEMANTIC_SYNC_SECONDS = float(os.getenv("SEMANTIC_SYNC_SECONDS", 5))
+SEMANTIC_TOPICS_KEY = "questions:topics"
+
+# Words that don't change what a topic is about
+STOPWORDS = frozenset(
+    "a an and as at by for from how in into of on or the to using with without vs".split()
+)
+
+
+def _stem(word: str) -> str:
+    # Just enough to match "decorators" with "decorator"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+class HashingVectorizer:
+    """Bag of words plus character trigrams, hashed into a fixed-size vector.
+
+    Needs no model or vocabulary, so every worker embeds the same topic to
+    the same vector offline. crc32 rather than hash() because the latter is
+    salted per process.
+    """
+
+    def __init__(self, dim: int = SEMANTIC_DIM, ngram: int = 3):
+        self.dim = dim
+        self.ngram = ngram
+
+    def words(self, text: str) -> List[str]:
+        words = re.findall(r"[\w+#]+", text.casefold())
+        return [_stem(word) for word in words if word not in STOPWORDS] or words
+
+    def features(self, text: str) -> List[str]:
+        words = self.words(text)
+        features = [f"w:{word}" for word in words]
+        for word in words:
+            padded = f"<{word}>"
+            features.extend(f"c:{padded[i:i + self.ngram]}" for i in range(max(1, len(padded) - self.ngram + 1)))
+        return features
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self.features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            # Signed hashing keeps collisions from only ever adding up
+            vector[h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+
+class TopicIndex:
+    """Unit vectors of known topics, one growable matrix per difficulty."""
+
+    def __init__(self, vectorizer: Optional[HashingVectorizer] = None):
+        self.vectorizer = vectorizer or HashingVectorizer()
+        self._topics: Dict[str, List[str]] = {}
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._known = set()
+
+    def add(self, topic: str, difficulty: str) -> bool:
+        if (topic, difficulty) in self._known:
+            return False
+        self._known.add((topic, difficulty))
+        topics = self._topics.setdefault(difficulty, [])
+        vectors = self._vectors.get(difficulty)
+        if vectors is None:
+            vectors = np.zeros((16, self.vectorizer.dim), dtype=np.float32)
+        elif len(topics) == len(vectors):
+            # Double the capacity so adds stay amortised O(1)
+            vectors = np.vstack([vectors, np.zeros_like(vectors)])
+        vectors[len(topics)] = self.vectorizer.transform(topic)
+        self._vectors[difficulty] = vectors
+        topics.append(topic)
+        return True
+
+    def nearest(self, topic: str, difficulty: str) -> Optional[Tuple[str, float]]:
+        topics = self._topics.get(difficulty)
+        if not topics:
+            return None
+        scores = self._vectors[difficulty][:len(topics)] @ self.vectorizer.transform(topic)
+        best = int(np.argmax(scores))
+        return topics[best], float(scores[best])
+
+    def __len__(self):
+        return len(self._known)
+
+
+class SemanticTopicCache:
+    """Finds an already-cached topic close enough to answer for a new one.
+
+    Topics with cached questions are appended to a Redis list (deduplicated
+    by a set), and each worker replays the list into its local index.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        index: Optional[TopicIndex] = None,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        sync_interval: float = SEMANTIC_SYNC_SECONDS,
+        key: str = SEMANTIC_TOPICS_KEY,
+    ):
+        self._redis = redis_client
+        self.index = index or TopicIndex()
+        self.threshold = threshold
+        self.sync_interval = sync_interval
+        self.key = key
+        self._synced = 0
+        self._last_sync = 0.0
+        self.matches = 0
+        self.misses = 0
+
+    async def add(self, topic: str, difficulty: str):
+        member = json.dumps([topic, difficulty])
+        if self.index.add(topic, difficulty) and await self._redis.sadd(f"{self.key}:seen", member):
+            await self._redis.rpush(self.key, member)
+
+    async def sync(self):
+        # Only the entries appended since the last sync; overlapping syncs re-add harmlessly
+        start = self._synced
+        self._last_sync = time.monotonic()
+        members = await self._redis.lrange(self.key, start, -1)
+        for member in members:
+            self.index.add(*json.loads(member))
+        self._synced = max(self._synced, start + len(members))
+
+    async def nearest(self, topic: str, difficulty: str) -> Optional[str]:
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"Semantic topic sync failed: {e}")
+        match = self.index.nearest(topic, difficulty)
+        if match is None or match[0] == topic or match[1] < self.threshold or not self._same_words(topic, match[0]):
+            self.misses += 1
+            return None
+        self.matches += 1
+        return match[0]
+
+    def _same_words(self, topic: str, other: str) -> bool:
+        # Similar isn't enough: "binary search tree" scores 0.86 against
+        # "binary search" but is a different topic. Only reordering, plurals
+        # and stopwords may differ, so neither side can add a word.
+        words = self.index.vectorizer.words
+        return set(words(topic)) == set(words(other))
+
+    def stats(self) -> Dict[str, int]:
+        return {"topics": len(self.index), "matches": self.matches, "misses": self.misses}
@@ -0,0 +1,196 @@
+import asyncio
+import os
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+# Single-flight configuration
+SINGLEFLIGHT_LOCK_TTL_MS = int(os.getenv("SINGLEFLIGHT_LOCK_TTL_MS", 90000))
+SINGLEFLIGHT_POLL_SECONDS = float(os.getenv("SINGLEFLIGHT_POLL_SECONDS", 0.1))
+SINGLEFLIGHT_WAIT_SECONDS = float(os.getenv("SINGLEFLIGHT_WAIT_SECONDS", 90))
+
+# Only delete the lock if we still own it
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class _Broadcast:
+    """Items of one stream, replayed to every follower and then followed live."""
+
+    def __init__(self):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Event()
+
+    def push(self, item: Any):
+        self.items.append(item)
+        self._wake()
+
+    def close(self, error: Optional[BaseException] = None):
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self) -> AsyncIterator[Any]:
+        i = 0
+        while True:
+            # Taken before checking, so a push in between still wakes us
+            changed = self._changed
+            if i < len(self.items):
+                i += 1
+                yield self.items[i - 1]
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await changed.wait()
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution.
+
+    Within a worker, callers for a key share one task. Across workers, a
+    Redis lock elects a single leader while the others poll the cache for
+    the leader's result. ``stream`` does the same for calls that yield
+    their result piece by piece.
+    """
+
+    def __init__(
+        self,
+        redis_client=None,
+        lock_ttl_ms: int = SINGLEFLIGHT_LOCK_TTL_MS,
+        poll_interval: float = SINGLEFLIGHT_POLL_SECONDS,
+        wait_timeout: float = SINGLEFLIGHT_WAIT_SECONDS,
+    ):
+        self._redis = redis_client
+        self._release = redis_client.register_script(RELEASE_LOCK_SCRIPT) if redis_client else None
+        self.lock_ttl_ms = lock_ttl_ms
+        self.poll_interval = poll_interval
+        self.wait_timeout = wait_timeout
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _Broadcast] = {}
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        fetch_cached: Optional[Callable[[], Awaitable[Any]]] = None,
+    ) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            # Run as its own task so a disconnecting leader doesn't cancel the waiters
+            task = asyncio.ensure_future(self._run(key, fn, fetch_cached))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def stream(
+        self,
+        key: str,
+        fn: Callable[[], AsyncIterator[Any]],
+        fetch_cached: Optional[Callable[[], Awaitable[Optional[Iterable[Any]]]]] = None,
+    ) -> AsyncIterator[Any]:
+        """Items of one shared run of ``fn`` for this key.
+
+        Callers that join late get what has been produced so far, then the
+        rest as it arrives. A worker that loses the Redis election replays
+        the leader's cached result in one go. Starts right away (not on
+        first iteration), so it runs in the caller's context.
+        """
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._streams[key] = broadcast
+            task = asyncio.ensure_future(self._pump(broadcast, self._stream_source(key, fn, fetch_cached)))
+            task.add_done_callback(lambda _: self._streams.pop(key, None))
+        return broadcast.follow()
+
+    def inflight(self) -> int:
+        return len(self._inflight) + len(self._streams)
+
+    @staticmethod
+    async def _pump(broadcast: _Broadcast, source: AsyncIterator[Any]):
+        # Its own task, so a leader that disconnects doesn't stop the stream for the rest
+        try:
+            async for item in source:
+                broadcast.push(item)
+        except BaseException as e:
+            broadcast.close(e)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        else:
+            broadcast.close()
+
+    async def _stream_source(self, key, fn, fetch_cached):
+        if self._redis is None:
+            async for item in fn():
+                yield item
+            return
+
+        loop = asyncio.get_running_loop()
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        deadline = loop.time() + self.wait_timeout
+        while True:
+            if await self._redis.set(lock_key, token, nx=True, px=self.lock_ttl_ms):
+                try:
+                    # Another worker may have filled the cache before we got the lock
+                    cached = await fetch_cached() if fetch_cached is not None else None
+                    if cached is None:
+                        async for item in fn():
+                            yield item
+                    else:
+                        for item in cached:
+                            yield item
+                    return
+                finally:
+                    await self._release(keys=[lock_key], args=[token])
+
+            await asyncio.sleep(self.poll_interval)
+            cached = await fetch_cached() if fetch_cached is not None else None
+            if cached is not None:
+                for item in cached:
+                    yield item
+                return
+            if loop.time() >= deadline:
+                async for item in fn():
+                    yield item
+                return
+
+    async def _run(self, key, fn, fetch_cached):
+        if self._redis is None:
+            return await fn()
+
+        loop = asyncio.get_running_loop()
+        lock_key = f"lock:{key}"
+        token = uuid.uuid4().hex
+        deadline = loop.time() + self.wait_timeout
+        while True:
+            if await self._redis.set(lock_key, token, nx=True, px=self.lock_ttl_ms):
+                try:
+                    # Another worker may have filled the cache before we got the lock
+                    if fetch_cached is not None:
+                        cached = await fetch_cached()
+                        if cached is not None:
+                            return cached
+                    return await fn()
+                finally:
+                    await self._release(keys=[lock_key], args=[token])
+
+            await asyncio.sleep(self.poll_interval)
+            if fetch_cached is not None:
+                cached = await fetch_cached()
+                if cached is not None:
+                    return cached
+            if loop.time() >= deadline:
+                # Leader is stuck or gone; stop waiting and do the work ourselves
+                return await fn()
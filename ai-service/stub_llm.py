@@ -0,0 +1,280 @@
+"""Deterministic stand-in for the upstream model, for offline benchmarking.
+
+Run a stub server: python stub_llm.py
+then point the service at it with LLM_PROVIDER=openai and
+LLM_BASE_URL=http://localhost:8090/v1 (or LLM_PROVIDER=gemini and
+GEMINI_BASE_URL=http://localhost:8090). LLM_PROVIDER=stub runs the same
+model in-process with no server at all.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+# Latency of a whole call (time to first byte for streams)
+STUB_LATENCY_DISTRIBUTION = os.getenv("STUB_LATENCY_DISTRIBUTION", "lognormal")
+STUB_LATENCY_MEDIAN_SECONDS = float(os.getenv("STUB_LATENCY_MEDIAN_SECONDS", 0.8))
+# Spread of the lognormal distribution; 0.5 puts p99 at about 3x the median
+STUB_LATENCY_SIGMA = float(os.getenv("STUB_LATENCY_SIGMA", 0.5))
+# Occasional very slow calls on top of the distribution
+STUB_SLOW_RATE = float(os.getenv("STUB_SLOW_RATE", 0.0))
+STUB_SLOW_SECONDS = float(os.getenv("STUB_SLOW_SECONDS", 20))
+# Share of calls that fail with a 500, a 429, or never answer
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", 0.0))
+STUB_RATE_LIMIT_RATE = float(os.getenv("STUB_RATE_LIMIT_RATE", 0.0))
+STUB_HANG_RATE = float(os.getenv("STUB_HANG_RATE", 0.0))
+# Pace of streamed output; 0 streams everything at once
+STUB_TOKENS_PER_SECOND = float(os.getenv("STUB_TOKENS_PER_SECOND", 80))
+STUB_SEED = int(os.getenv("STUB_SEED", 0))
+STUB_PORT = int(os.getenv("STUB_PORT", 8090))
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "exponential", "lognormal")
+
+OK = "ok"
+ERROR = "error"
+RATE_LIMITED = "rate_limited"
+HANG = "hang"
+
+_WORDS = (
+    "scope closure cache index queue stream buffer thread lock schema query "
+    "module package class method interface pointer array hash tree graph node "
+    "route request response token session cookie header layout render state "
+    "event handler promise callback iterator generator decorator context "
+    "transaction migration replica shard partition latency throughput"
+).split()
+
+_SINGLE = re.compile(r"Generate (\d+) multiple choice questions about (.+?)\.\s*\n\s*Difficulty level: ([^\n]+)")
+_BATCH = re.compile(r"\[(\d+)\] (\d+) questions about (.+?), difficulty level: ([^\n]+)")
+_ASSESSMENT_QUESTIONS = re.compile(r"Generate exactly (\d+) assessment questions")
+
+
+class StubModel:
+    """Samples latency and failures, and writes replies that depend only on the prompt.
+
+    Replies follow whatever format the prompt asks for (question arrays,
+    batched question objects, frontend assessments) so the service can run
+    end to end against it.
+    """
+
+    def __init__(
+        self,
+        distribution: str = STUB_LATENCY_DISTRIBUTION,
+        median: float = STUB_LATENCY_MEDIAN_SECONDS,
+        sigma: float = STUB_LATENCY_SIGMA,
+        slow_rate: float = STUB_SLOW_RATE,
+        slow_seconds: float = STUB_SLOW_SECONDS,
+        error_rate: float = STUB_ERROR_RATE,
+        rate_limit_rate: float = STUB_RATE_LIMIT_RATE,
+        hang_rate: float = STUB_HANG_RATE,
+        tokens_per_second: float = STUB_TOKENS_PER_SECOND,
+        seed: int = STUB_SEED,
+    ):
+        if distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}; expected one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.distribution = distribution
+        self.median = median
+        self.sigma = sigma
+        self.slow_rate = slow_rate
+        self.slow_seconds = slow_seconds
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.hang_rate = hang_rate
+        self.tokens_per_second = tokens_per_second
+        self._random = random.Random(seed)
+
+    def latency(self) -> float:
+        if self._random.random() < self.slow_rate:
+            return self.slow_seconds
+        if self.distribution == "fixed":
+            return self.median
+        if self.distribution == "uniform":
+            return self._random.uniform(0, 2 * self.median)
+        if self.distribution == "exponential":
+            return self._random.expovariate(math.log(2) / self.median) if self.median > 0 else 0.0
+        return self._random.lognormvariate(math.log(self.median), self.sigma) if self.median > 0 else 0.0
+
+    def outcome(self) -> str:
+        roll = self._random.random()
+        for outcome, rate in ((ERROR, self.error_rate), (RATE_LIMITED, self.rate_limit_rate), (HANG, self.hang_rate)):
+            if roll < rate:
+                return outcome
+            roll -= rate
+        return OK
+
+    def reply(self, messages: List[Dict[str, str]]) -> str:
+        prompt = "\n".join(message.get("content") or "" for message in messages)
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        batch = _BATCH.findall(prompt)
+        if batch:
+            return json.dumps({
+                index: _questions(rng, int(count), topic, difficulty.strip())
+                for index, count, topic, difficulty in batch
+            })
+        single = _SINGLE.search(prompt)
+        if single:
+            count, topic, difficulty = single.groups()
+            return json.dumps(_questions(rng, int(count), topic, difficulty.strip()))
+        frontend = _ASSESSMENT_QUESTIONS.search(prompt)
+        if frontend:
+            return json.dumps(_frontend_questions(rng, int(frontend.group(1))))
+        if '"areas_to_improve"' in prompt:
+            return json.dumps(_assessment(rng))
+        return " ".join(["Stub review:"] + [rng.choice(_WORDS) for _ in range(60)]) + "."
+
+    async def stream(self, text: str) -> AsyncIterator[str]:
+        # ~4 characters a token, a few tokens a chunk
+        step = 16
+        for i in range(0, len(text), step):
+            if self.tokens_per_second > 0:
+                await asyncio.sleep(step / 4 / self.tokens_per_second)
+            yield text[i:i + step]
+
+
+def _phrase(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def _questions(rng: random.Random, count: int, topic: str, difficulty: str) -> List[Dict[str, str]]:
+    questions = []
+    for _ in range(count):
+        options = [_phrase(rng, 3) for _ in range(4)]
+        answer = rng.randrange(4)
+        questions.append({
+            "question": f"In {topic} ({difficulty}), what happens to the {_phrase(rng, 3)} when the {_phrase(rng, 3)} changes?",
+            "options": options,
+            "answer": "ABCD"[answer],
+            "explanation": f"The {options[answer]} is affected because {_phrase(rng, 6)}.",
+        })
+    return questions
+
+
+def _frontend_questions(rng: random.Random, count: int) -> List[Dict[str, object]]:
+    return [
+        {
+            "question": f"Which approach handles the {_phrase(rng, 3)} in a web page?",
+            "options": [_phrase(rng, 3) for _ in range(4)],
+            "correctAnswer": rng.randrange(4),
+        }
+        for _ in range(count)
+    ]
+
+
+def _assessment(rng: random.Random) -> Dict[str, object]:
+    return {
+        "assessment": f"Solid grasp of {_phrase(rng, 2)}.",
+        "recommendations": f"Practise {_phrase(rng, 3)} and {_phrase(rng, 3)}.",
+        "score": rng.randrange(40, 100),
+        "strengths": [_phrase(rng, 2) for _ in range(2)],
+        "areas_to_improve": [_phrase(rng, 2) for _ in range(2)],
+    }
+
+
+def create_app(model: Optional[StubModel] = None):
+    """OpenAI- and Gemini-compatible HTTP front for a StubModel."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+
+    model = model or StubModel()
+    app = FastAPI(title="Stub LLM")
+
+    async def _behave():
+        # Returns an error response, or None once the sampled latency has passed
+        outcome = model.outcome()
+        await asyncio.sleep(model.latency())
+        if outcome == ERROR:
+            return JSONResponse({"error": {"message": "Stub upstream error", "code": 500}}, status_code=500)
+        if outcome == RATE_LIMITED:
+            return JSONResponse({"error": {"message": "Stub rate limit", "code": 429}}, status_code=429)
+        if outcome == HANG:
+            await asyncio.sleep(3600)
+        return None
+
+    def _usage(messages, text):
+        prompt_tokens = sum(len(message.get("content") or "") for message in messages) // 4
+        return prompt_tokens, len(text) // 4
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        failure = await _behave()
+        if failure is not None:
+            return failure
+        text = model.reply(messages)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        if not body.get("stream"):
+            prompt_tokens, completion_tokens = _usage(messages, text)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }
+
+        async def events():
+            async for chunk in model.stream(text):
+                data = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model", "stub"),
+                    "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(data)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1beta/models/{model_action}")
+    async def gemini(model_action: str, request: Request):
+        body = await request.json()
+        messages = [
+            {"content": part.get("text", "")}
+            for content in [body.get("systemInstruction") or {}] + (body.get("contents") or [])
+            for part in content.get("parts") or []
+        ]
+        failure = await _behave()
+        if failure is not None:
+            return failure
+        text = model.reply(messages)
+        prompt_tokens, completion_tokens = _usage(messages, text)
+
+        def candidate(chunk):
+            return {"candidates": [{"content": {"role": "model", "parts": [{"text": chunk}]}}]}
+
+        if not model_action.endswith(":streamGenerateContent"):
+            return {
+                **candidate(text),
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": completion_tokens,
+                    "totalTokenCount": prompt_tokens + completion_tokens,
+                },
+            }
+
+        async def events():
+            async for chunk in model.stream(text):
+                yield f"data: {json.dumps(candidate(chunk))}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(create_app(), host="0.0.0.0", port=STUB_PORT)
@@ -0,0 +1,154 @@
+import asyncio
+
+from cache import CacheEntry, LRUCache, QuestionCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_expires_entries():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["expirations"] == 1
+
+
+def test_lru_never_outlives_its_own_ttl():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=5, clock=clock)
+    cache.set("a", 1, ttl=3600)
+    clock.now = 6
+    assert cache.get("a") is None
+
+
+def test_question_cache_serves_from_memory_after_first_read(redis_client):
+    writer = QuestionCache(redis_client)
+    reader = QuestionCache(redis_client)
+
+    async def run():
+        await writer.set("questions:js", [{"question": "q"}])
+        first = await reader.get("questions:js")
+        redis_client.data.clear()
+        second = await reader.get("questions:js")
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == [{"question": "q"}]
+    assert reader.stats()["local"]["hits"] == 1
+    assert reader.stats()["redis"]["hits"] == 1
+
+
+def test_invalidation_from_other_workers_drops_local_copy(redis_client):
+    worker_a = QuestionCache(redis_client)
+    worker_b = QuestionCache(redis_client)
+
+    asyncio.run(worker_b.set("k", ["old"]))
+    channel, message = redis_client.published[-1]
+
+    # Own broadcasts are ignored
+    worker_b._on_invalidate({"data": message.encode()})
+    assert worker_b.local.get("k").value == ["old"]
+
+    asyncio.run(worker_a.set("k", ["new"]))
+    _, message = redis_client.published[-1]
+    worker_b._on_invalidate({"data": message.encode()})
+    assert worker_b.local.get("k") is None
+    assert asyncio.run(worker_b.get("k")) == ["new"]
+
+
+def test_xfetch_refreshes_early_only_near_expiry():
+    entry = CacheEntry(value=1, created_at=0.0, ttl=100.0, delta=2.0)
+    assert not entry.should_refresh(now=10.0, rand=lambda: 0.5)
+    # -log(1 - 0.99) * 2s ~= 9.2s of head start before expiry
+    assert entry.should_refresh(now=95.0, rand=lambda: 0.99)
+    assert not entry.should_refresh(now=95.0, rand=lambda: 0.1)
+    assert entry.should_refresh(now=100.0, rand=lambda: 0.0)
+
+
+def test_legacy_values_are_served_as_stale():
+    entry = CacheEntry.from_dict([{"question": "q"}], default_ttl=3600)
+    assert entry.value == [{"question": "q"}]
+    assert entry.is_stale()
+
+
+def test_stale_entries_are_served_and_refreshed_once(redis_client):
+    cache = QuestionCache(redis_client)
+    refreshed = []
+
+    async def refresh(entry):
+        refreshed.append(entry.value)
+        await asyncio.sleep(0)
+        await cache.set("k", ["new"])
+
+    async def run():
+        await cache.set("k", ["old"], ttl=1)
+        entry = await cache.get_entry("k")
+        entry.created_at -= 10
+        values = [await cache.get_or_refresh("k", refresh) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        return values, await cache.get("k")
+
+    values, latest = asyncio.run(run())
+    assert values == [["old"]] * 3
+    assert refreshed == [["old"]]
+    assert latest == ["new"]
+    assert cache.stats()["stale_hits"] == 3
+
+
+def test_get_entries_reads_misses_with_one_mget(redis_client):
+    writer = QuestionCache(redis_client)
+    reader = QuestionCache(redis_client)
+
+    async def run():
+        await writer.set_many({"a": [1], "b": [2]})
+        await reader.get("a")
+        return await reader.get_entries(["a", "b", "c"])
+
+    a, b, c = asyncio.run(run())
+    assert (a.value, b.value, c) == ([1], [2], None)
+    # "a" is already local; "b" and "c" share one MGET
+    assert redis_client.calls["mget"] == 1
+    assert reader.stats()["local"]["hits"] == 1
+    assert [message.split(":", 1)[1] for _, message in redis_client.published] == ["a", "b"]
+
+
+def test_get_many_or_refresh_refreshes_only_stale_keys(redis_client):
+    cache = QuestionCache(redis_client)
+    refreshed = []
+
+    async def refresh(key, entry):
+        refreshed.append(key)
+
+    async def run():
+        await cache.set_many({"fresh": ["f"], "old": ["o"]})
+        (await cache.get_entry("old")).created_at -= cache.ttl + 1
+        values = await cache.get_many_or_refresh(["fresh", "old", "missing"], refresh)
+        await asyncio.sleep(0.01)
+        return values
+
+    assert asyncio.run(run()) == [["f"], ["o"], None]
+    assert refreshed == ["old"]
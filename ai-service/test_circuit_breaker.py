@@ -0,0 +1,99 @@
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, LatencyTracker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _breaker(clock, **overrides):
+    settings = dict(window=60, min_calls=4, error_rate=0.5, slow_call_seconds=10, slow_call_rate=0.5, open_seconds=30)
+    settings.update(overrides)
+    return CircuitBreaker(clock=clock, **settings)
+
+
+def test_trips_on_error_rate():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for ok in (True, False, True, False):
+        breaker.allow()
+        breaker.record(ok, 1.0)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_trips_on_slow_calls():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for latency in (1.0, 12.0, 15.0, 2.0):
+        breaker.record(True, latency)
+    assert breaker.state == OPEN
+
+
+def test_needs_min_calls_before_tripping():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record(False, 1.0)
+    assert breaker.state == CLOSED
+
+
+def test_old_failures_leave_the_window():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(3):
+        breaker.record(False, 1.0)
+    clock.now += 61
+    breaker.record(False, 1.0)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["calls"] == 1
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record(False, 1.0)
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+
+    breaker.allow()
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record(False, 1.0)
+    assert breaker.state == OPEN
+
+    clock.now += 30
+    breaker.allow()
+    breaker.record(True, 1.0)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["trips"] == 2
+
+
+def test_abandoned_probe_is_replaced():
+    clock = FakeClock()
+    breaker = _breaker(clock)
+    for _ in range(4):
+        breaker.record(False, 1.0)
+    clock.now += 30
+    breaker.allow()
+    clock.now += 30
+    breaker.allow()
+
+
+def test_latency_quantile_needs_samples():
+    tracker = LatencyTracker(size=100, min_samples=10)
+    for i in range(9):
+        tracker.record(i)
+    assert tracker.quantile(0.95) is None
+    for i in range(9, 100):
+        tracker.record(i)
+    assert tracker.quantile(0.95) == 95
@@ -0,0 +1,44 @@
+import pytest
+
+import codec
+
+QUESTIONS = [
+    {
+        "question": "What does `let` do in JavaScript?",
+        "options": ["A. Declares a block-scoped variable", "B. Imports a module", "C. Defines a class", "D. Nothing"],
+        "answer": "A",
+        "explanation": "let declares a block-scoped binding — unlike var.",
+    }
+]
+
+
+def test_round_trip():
+    assert codec.loads(codec.dumps(QUESTIONS)) == QUESTIONS
+
+
+def test_json_round_trip_with_header():
+    encoded = codec.dumps(QUESTIONS, fmt=codec.FORMAT_JSON, compression=codec.COMPRESSION_NONE)
+    assert encoded[:3] == bytes((codec.CODEC_VERSION, codec.FORMAT_JSON, codec.COMPRESSION_NONE))
+    assert codec.loads(encoded) == QUESTIONS
+
+
+def test_compresses_only_above_threshold():
+    small = codec.dumps(QUESTIONS, fmt=codec.FORMAT_JSON, compression=codec.COMPRESSION_ZLIB, threshold=10**6)
+    assert small[2] == codec.COMPRESSION_NONE
+
+    large_value = QUESTIONS * 50
+    large = codec.dumps(large_value, fmt=codec.FORMAT_JSON, compression=codec.COMPRESSION_ZLIB, threshold=0)
+    assert large[2] == codec.COMPRESSION_ZLIB
+    assert len(large) < len(str(large_value))
+    assert codec.loads(large) == large_value
+
+
+def test_reads_legacy_repr_entries_without_eval():
+    assert codec.loads(str(QUESTIONS).encode("utf-8")) == QUESTIONS
+    with pytest.raises(codec.CodecError):
+        codec.loads(b"__import__('os').system('true')")
+
+
+def test_rejects_unknown_format():
+    with pytest.raises(codec.CodecError):
+        codec.loads(bytes((codec.CODEC_VERSION, 99, codec.COMPRESSION_NONE)) + b"{}")
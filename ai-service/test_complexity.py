@@ -0,0 +1,84 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from complexity import TooFewPointsError, fit_complexity, size_ladder
+
+SIZES = size_ladder(64, 8192)
+
+
+def timings(growth, noise=0.0, seed=0):
+    rng = np.random.default_rng(seed)
+    n = np.array(SIZES, dtype=float)
+    t = 1e-4 + 1e-7 * growth(n)
+    t = t * (1 + noise * rng.standard_normal(len(n)))
+    return [[float(size), float(seconds)] for size, seconds in zip(n, t)]
+
+
+@pytest.mark.parametrize("expected, growth", [
+    ("O(log n)", lambda n: 1000 * np.log2(n)),
+    ("O(n)", lambda n: n),
+    ("O(n log n)", lambda n: n * np.log2(n)),
+    ("O(n²)", lambda n: n ** 2),
+    ("O(n³)", lambda n: n ** 3 / 1000),
+])
+def test_identifies_growth_class(expected, growth):
+    estimate = fit_complexity(timings(growth, noise=0.01))
+    assert estimate["complexity"] == expected
+    assert estimate["r_squared"] > 0.95
+
+
+def test_flat_noisy_timings_are_constant():
+    estimate = fit_complexity(timings(lambda n: n * 0, noise=0.05))
+    assert estimate["complexity"] == "O(1)"
+    assert abs(estimate["exponent"]) < 0.2
+
+
+def test_exponent_tracks_polynomial_degree():
+    assert fit_complexity(timings(lambda n: n ** 2 * 10))["exponent"] == pytest.approx(2, abs=0.2)
+
+
+def test_needs_enough_points():
+    with pytest.raises(TooFewPointsError):
+        fit_complexity([[10, 0.1], [20, 0.2]])
+
+
+def test_size_ladder_doubles():
+    assert size_ladder(64, 1000) == [64, 128, 256, 512]
+
+
+def _sandbox_estimates(code, runs):
+    import asyncio
+
+    from sandbox import SandboxPool, prepare_submission
+
+    pool = SandboxPool(size=1)
+
+    async def run():
+        try:
+            estimates = []
+            for _ in range(runs):
+                outcome = await pool.run({
+                    **prepare_submission(code),
+                    "function_name": "f",
+                    "sizes": size_ladder(),
+                    "input_kind": "list",
+                    "max_call_seconds": 0.5,
+                    "budget_seconds": 10,
+                    "cpu_seconds": 60,
+                }, timeout=60)
+                estimates.append(fit_complexity(outcome["result"]["timings"])["complexity"])
+            return estimates
+        finally:
+            await pool.stop()
+
+    return asyncio.run(run())
+
+
+def test_real_sandbox_timings_grade_consistently():
+    # Cache effects make per-element cost creep up at the largest sizes;
+    # that must not tip a plain loop into O(n log n) on some runs
+    loop = "def f(xs):\n    s = 0\n    for x in xs:\n        s += x\n    return s\n"
+    nested = "def f(xs):\n    c = 0\n    for a in xs:\n        for b in xs:\n            c += 1\n    return c\n"
+    assert _sandbox_estimates(loop, 3) == ["O(n)"] * 3
+    assert _sandbox_estimates(nested, 1) == ["O(n²)"]
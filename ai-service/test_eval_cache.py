@@ -0,0 +1,38 @@
+import asyncio
+
+from eval_cache import EvaluationCache, submission_digest
+
+CODE = "def add(a, b):\n    return a + b\n"
+
+
+def test_digest_ignores_comments_and_formatting():
+    reformatted = "# adds numbers\ndef add(a,b):  # inline\n\n    return a+b\n"
+    assert submission_digest(CODE) == submission_digest(reformatted)
+    assert submission_digest(CODE) != submission_digest(CODE.replace("+", "-"))
+
+
+def test_case_keys_ignore_dict_ordering():
+    digest = submission_digest(CODE)
+    first = {"name": "t1", "function_name": "add", "input": [1, 2], "expected_output": 3}
+    second = {"expected_output": 3, "input": [1, 2], "function_name": "add", "name": "t1"}
+    assert EvaluationCache.case_key(digest, first) == EvaluationCache.case_key(digest, second)
+
+
+def test_round_trips_case_results_and_feedback(redis_client):
+    cache = EvaluationCache(redis_client)
+    digest = submission_digest(CODE)
+    cases = [
+        {"name": "t1", "function_name": "add", "input": [1, 2], "expected_output": 3},
+        {"name": "t2", "function_name": "add", "input": [2, 2], "expected_output": 4},
+    ]
+    result = {"test_case": "t1", "passed": True, "actual_output": 3, "expected_output": 3}
+
+    async def run():
+        await cache.set_cases(digest, [(cases[0], result), (cases[1], {"actual_output": {1, 2}})])
+        await cache.set_feedback(digest, cases, "Looks good")
+        return await cache.get_cases(digest, cases), await cache.get_feedback(digest, cases)
+
+    cached, feedback = asyncio.run(run())
+    # Unserialisable outputs are skipped rather than failing the request
+    assert cached == [result, None]
+    assert feedback == "Looks good"
@@ -0,0 +1,84 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("openai")
+
+import generation
+from generation import pack_specs, parse_question_batch, validate_question
+
+
+def test_packs_specs_first_fit_decreasing():
+    specs = [("js", "easy", 5), ("py", "hard", 10), ("go", "easy", 5), ("sql", "medium", 3)]
+    batches = pack_specs(specs, max_tokens=15, tokens_per_question=1)
+    assert batches == [[0, 1], [2, 3]]
+
+
+def test_oversized_spec_gets_its_own_call():
+    specs = [("js", "easy", 50), ("py", "easy", 2)]
+    assert pack_specs(specs, max_tokens=10, tokens_per_question=1) == [[0], [1]]
+
+
+QUESTION = {"question": "What is a closure?", "options": ["A", "B", "C", "D"], "answer": "A", "explanation": "Scope."}
+
+
+class FakeLLM:
+    def __init__(self, replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    async def chat(self, messages, temperature=0.7, completion_tokens=None):
+        self.calls.append(messages)
+        return self.replies.pop(0)
+
+
+def _question(stem, **fields):
+    return json.dumps({**QUESTION, "question": stem, **fields})
+
+
+def test_validate_question():
+    assert validate_question({**QUESTION, "extra": 1}) == QUESTION
+    assert validate_question({**QUESTION, "options": {"A": "x", "B": "y"}})["options"] == {"A": "x", "B": "y"}
+    assert validate_question({k: v for k, v in QUESTION.items() if k != "explanation"})["explanation"] == ""
+    assert validate_question({**QUESTION, "question": " "}) is None
+    assert validate_question({**QUESTION, "options": ["only one"]}) is None
+    assert validate_question({**QUESTION, "answer": None}) is None
+    assert validate_question(["not", "a", "question"]) is None
+
+
+def test_salvages_valid_questions_and_asks_only_for_the_rest(monkeypatch):
+    reply = "```json\n[" + _question("one") + ", {'question': 'two', 'options': [],}, " + _question("three") + ", {\"question\": \"fo"
+    fake = FakeLLM([reply, "[" + _question("four") + "]"])
+    monkeypatch.setattr(generation, "get_llm_client", lambda: fake)
+    questions = asyncio.run(generation.generate_questions_with_llm("js", "easy", 3))
+    assert [q["question"] for q in questions] == ["one", "three", "four"]
+    assert "Generate 1 multiple choice questions" in fake.calls[1][1]["content"]
+
+
+def test_questions_wrapped_in_an_object_are_salvaged(monkeypatch):
+    reply = '{"topic": "js", "questions": [' + _question("one") + ', {"question": ""}, ' + _question("two") + "]}"
+    fake = FakeLLM([reply])
+    monkeypatch.setattr(generation, "get_llm_client", lambda: fake)
+    questions = asyncio.run(generation.generate_questions_with_llm("js", "easy", 2))
+    assert [q["question"] for q in questions] == ["one", "two"]
+    assert len(fake.calls) == 1
+
+
+def test_reply_without_any_valid_question_fails(monkeypatch):
+    monkeypatch.setattr(generation, "get_llm_client", lambda: FakeLLM(["I can't help with that."]))
+    with pytest.raises(ValueError):
+        asyncio.run(generation.generate_questions_with_llm("js", "easy", 2))
+
+
+def test_batch_salvages_entries_from_a_truncated_reply(monkeypatch):
+    reply = '{"0": [' + _question("a") + "," + _question("b") + '], "1": [' + _question("c") + ', {"question'
+    monkeypatch.setattr(generation, "get_llm_client", lambda: FakeLLM([reply]))
+    results = asyncio.run(generation.generate_question_batch_with_llm([("js", "easy", 2), ("py", "easy", 2)]))
+    assert [q["question"] for q in results[0]] == ["a", "b"]
+    assert results[1] is None
+
+
+def test_batch_parses_repairable_reply():
+    reply = "{'0': [" + _question("a") + ",], '1': [" + _question("b") + ", {\"question\": 1}]}"
+    assert {k: [q["question"] for q in v] for k, v in parse_question_batch(reply).items()} == {"0": ["a"], "1": ["b"]}
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+import codec
+from jobs import DONE, FAILED, PENDING, RUNNING, JobQueue
+
+
+async def _process_all(queue, redis_client):
+    for message_id, fields in redis_client.stream:
+        await queue._process(message_id, fields)
+
+
+def test_submit_deduplicates_identical_work(redis_client):
+    async def handler(payload):
+        return {}
+
+    queue = JobQueue(redis_client, "jobs:test", handler)
+
+    async def run():
+        first = await queue.submit({"n": 1}, dedupe_key="same")
+        second = await queue.submit({"n": 1}, dedupe_key="same")
+        other = await queue.submit({"n": 2}, dedupe_key="other")
+        return first, second, other, await queue.get(first)
+
+    first, second, other, state = asyncio.run(run())
+    assert first == second != other
+    assert len(redis_client.stream) == 2
+    assert state == {"status": PENDING, "dedupe_key": "same"}
+
+
+def test_successful_job_is_done_and_releases_its_dedupe_key(redis_client):
+    seen = []
+
+    async def handler(payload):
+        seen.append(payload)
+        return {"feedback": "looks good"}
+
+    queue = JobQueue(redis_client, "jobs:test", handler)
+
+    async def run():
+        job_id = await queue.submit({"code": "x = 1"}, dedupe_key="k")
+        await _process_all(queue, redis_client)
+        # Once finished, the same work can be queued again
+        again = await queue.submit({"code": "x = 1"}, dedupe_key="k")
+        return job_id, again, await queue.get(job_id)
+
+    job_id, again, state = asyncio.run(run())
+    assert seen == [{"code": "x = 1"}]
+    assert state == {"status": DONE, "feedback": "looks good"}
+    assert again != job_id
+    assert redis_client.acked == ["1-0"]
+
+
+def test_failing_job_is_failed_acked_and_releases_its_dedupe_key(redis_client):
+    async def handler(payload):
+        raise RuntimeError("model down")
+
+    queue = JobQueue(redis_client, "jobs:test", handler)
+
+    async def run():
+        job_id = await queue.submit({}, dedupe_key="k")
+        await _process_all(queue, redis_client)
+        return job_id, await queue.get(job_id)
+
+    job_id, state = asyncio.run(run())
+    assert state == {"status": FAILED, "error": "model down"}
+    assert queue._dedupe_key("k") not in redis_client.data
+    assert redis_client.acked == ["1-0"]
+
+
+def test_running_state_keeps_the_dedupe_key_until_the_end(redis_client):
+    states = []
+
+    async def handler(payload):
+        states.append(await queue.get(payload["job"]))
+        return {}
+
+    queue = JobQueue(redis_client, "jobs:test", handler)
+
+    async def run():
+        job_id = await queue.submit({}, dedupe_key="k")
+        # The handler looks itself up through its payload
+        redis_client.stream[0][1]["payload"] = codec.dumps({"job": job_id})
+        await _process_all(queue, redis_client)
+
+    asyncio.run(run())
+    assert states == [{"status": RUNNING, "dedupe_key": "k"}]
+
+
+def test_malformed_message_is_still_acked(redis_client):
+    async def handler(payload):
+        return {}
+
+    queue = JobQueue(redis_client, "jobs:test", handler)
+    with pytest.raises(KeyError):
+        asyncio.run(queue._process("9-0", {"payload": b""}))
+    # An empty claim (message trimmed from the stream) is acked too
+    asyncio.run(queue._process("10-0", None))
+    assert redis_client.acked == ["9-0", "10-0"]
@@ -0,0 +1,69 @@
+from json_stream import JSONObjectStream, extract_json, repair_json
+
+TEXT = """Here are your questions:
+```json
+[
+  {"question": "What is {x}?", "options": ["A. \\"1\\"", "B. 2"], "answer": "A", "explanation": "See } here"},
+  {"question": "Nested?", "options": {"A": "yes", "B": "no"}, "answer": "A", "explanation": "ok"}
+]
+```"""
+
+
+def test_emits_objects_across_arbitrary_chunk_boundaries():
+    for size in (1, 3, 7, len(TEXT)):
+        stream = JSONObjectStream()
+        objects = []
+        for i in range(0, len(TEXT), size):
+            objects.extend(stream.feed(TEXT[i:i + size]))
+        assert [obj["question"] for obj in objects] == ["What is {x}?", "Nested?"]
+        assert objects[0]["options"][0] == 'A. "1"'
+        assert objects[1]["options"] == {"A": "yes", "B": "no"}
+
+
+def test_emits_first_object_before_array_closes():
+    stream = JSONObjectStream()
+    assert stream.feed('[{"question": "one"}, {"question": "tw') == [{"question": "one"}]
+    assert stream.feed('o"}]') == [{"question": "two"}]
+
+
+def test_skips_objects_that_are_not_valid_json():
+    stream = JSONObjectStream()
+    assert stream.feed('[{"question": oops}, {"question": "ok"}]') == [{"question": "ok"}]
+
+
+def test_repairs_trailing_commas_single_quotes_and_python_literals():
+    assert repair_json("{'a': 'it\\'s \"x\"', 'b': [1, 2,], 'c': True,}") == '{"a": "it\'s \\"x\\"", "b": [1, 2], "c": true}'
+    # Double-quoted strings are left alone
+    assert repair_json('{"a": "None, ]"}') == '{"a": "None, ]"}'
+
+
+def test_stream_repairs_objects_and_tracks_single_quoted_strings():
+    stream = JSONObjectStream()
+    assert stream.feed("[{'question': 'a } b', 'options': ['x', 'y',],},") == [
+        {"question": "a } b", "options": ["x", "y"]}
+    ]
+
+
+def test_validator_rejects_objects():
+    stream = JSONObjectStream(validate=lambda obj: obj if "question" in obj else None)
+    assert stream.feed('{"question": "one"} {"other": 1}') == [{"question": "one"}]
+    assert stream.rejected == 1
+
+
+def test_rejected_wrapper_yields_the_objects_of_its_one_list():
+    stream = JSONObjectStream(validate=lambda obj: obj if "question" in obj else None)
+    assert stream.feed('{"questions": [{"question": "one"}, {"other": 1}, {"question": "two"}]}') == [
+        {"question": "one"}, {"question": "two"},
+    ]
+    assert stream.rejected == 1
+    # Two candidate lists: no telling which holds the answer
+    assert stream.feed('{"a": [{"question": "x"}], "b": [{"question": "y"}]}') == []
+    assert stream.rejected == 2
+
+
+def test_extract_json_from_fenced_or_chatty_replies():
+    assert extract_json('Sure!\n```json\n{"score": 80,}\n```\nGood luck') == {"score": 80}
+    assert extract_json('Here you go: [1, 2, 3] hope it helps') == [1, 2, 3]
+    # A fence the model never closed
+    assert extract_json("```json\n[{'a': 1}]") == [{"a": 1}]
+    assert extract_json("no json here") is None
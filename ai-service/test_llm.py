@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+import llm
+from llm import LLMClient, LLMUnavailableError
+from providers import Completion, Provider
+from scheduler import BACKGROUND, call_context
+
+
+class FakeProvider(Provider):
+    name = "fake"
+
+    def __init__(self, delays):
+        super().__init__()
+        self.delays = list(delays)
+        self.calls = 0
+
+    async def complete(self, messages, temperature):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        answer = f"answer {self.calls}"
+        await asyncio.sleep(delay)
+        return Completion(answer)
+
+
+def _client(delays):
+    completions = FakeProvider(delays)
+    client = LLMClient(provider=completions)
+    # Enough fast calls that a few slow ones don't move the p95
+    for _ in range(100):
+        client.latencies.record(0.01)
+    return client, completions
+
+
+def _chat(client):
+    return client.chat([{"role": "user", "content": "hi"}])
+
+
+def test_slow_interactive_call_is_hedged(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_HEDGE_BUDGET", 1.0)
+    client, completions = _client([1.0, 0.0])
+    assert asyncio.run(_chat(client)) == "answer 2"
+    assert completions.calls == 2
+    assert client.stats()["hedging"]["wins"] == 1
+
+
+def test_hedges_stay_within_budget(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_HEDGE_BUDGET", 0.5)
+    client, completions = _client([0.05])
+
+    async def run():
+        for _ in range(4):
+            await _chat(client)
+
+    asyncio.run(run())
+    assert client.hedges == 2
+    assert completions.calls == 6
+
+
+def test_background_calls_are_not_hedged(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_HEDGE_BUDGET", 1.0)
+    client, completions = _client([0.05])
+
+    async def run():
+        with call_context(lane=BACKGROUND):
+            return await _chat(client)
+
+    assert asyncio.run(run()) == "answer 1"
+    assert completions.calls == 1
+
+
+def test_open_breaker_fails_fast():
+    client, completions = _client([0.0])
+    for _ in range(client.breaker.min_calls):
+        client.breaker.record(False, 1.0)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(_chat(client))
+    assert completions.calls == 0
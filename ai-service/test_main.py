@@ -0,0 +1,509 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlmodel")
+httpx = pytest.importorskip("httpx")
+
+import llm
+import main
+from cache import QuestionCache
+from eval_cache import EvaluationCache
+from jobs import DONE, RUNNING, JobQueue
+from llm import LLMClient
+from providers import StubProvider
+from singleflight import SingleFlight
+from stub_llm import StubModel
+
+BANKED = [
+    {"question": f"Banked {i}?", "options": ["a", "b", "c", "d"], "answer": "A", "explanation": "."}
+    for i in range(2)
+]
+
+
+class FakeBank:
+    def __init__(self, questions=()):
+        self.questions = list(questions)
+
+    async def sample(self, topic, difficulty, n):
+        return self.questions[:n]
+
+    async def add(self, topic, difficulty, questions):
+        return 0
+
+
+class FakeSandbox:
+    # ``outcome`` is a fixed sandbox reply, or a function of the job
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.jobs = []
+
+    async def run(self, job, timeout=None):
+        self.jobs.append(job)
+        return self.outcome(job) if callable(self.outcome) else self.outcome
+
+
+class CountingStub(StubProvider):
+    def __init__(self, **behaviour):
+        super().__init__(stub=StubModel(**{"distribution": "fixed", "median": 0.05, "tokens_per_second": 0, **behaviour}))
+        self.calls = 0
+
+    async def complete(self, messages, temperature):
+        self.calls += 1
+        return await super().complete(messages, temperature)
+
+    async def stream(self, messages, temperature):
+        self.calls += 1
+        async for chunk in super().stream(messages, temperature):
+            yield chunk
+
+
+async def _nothing(*args):
+    pass
+
+
+@pytest.fixture
+def service(redis_client, monkeypatch):
+    # main with Redis, the bank and the upstream model replaced; startup never runs
+    monkeypatch.setattr(main, "question_cache", QuestionCache(redis_client))
+    monkeypatch.setattr(main, "question_flight", SingleFlight(None))
+    monkeypatch.setattr(main, "question_bank", FakeBank())
+    monkeypatch.setattr(main, "SEMANTIC_CACHE_ENABLED", False)
+    monkeypatch.setattr(main, "_record_demand", _nothing)
+    monkeypatch.setattr(main, "_remember_topics", _nothing)
+
+    def use_stub(**behaviour):
+        provider = CountingStub(**behaviour)
+        monkeypatch.setattr(llm, "_client", LLMClient(provider=provider))
+        return provider
+
+    return use_stub
+
+
+def call(requests):
+    # Runs ``requests(client)`` against the app on a fresh event loop
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await requests(client)
+
+    return asyncio.run(run())
+
+
+def test_upstream_errors_fall_back_to_the_bank(service, monkeypatch):
+    provider = service(error_rate=1.0)
+    monkeypatch.setattr(main, "question_bank", FakeBank(BANKED))
+    response = call(lambda client: client.post(
+        "/generate-questions", json={"topic": "python", "difficulty": "beginner", "num_questions": 5},
+    ))
+    # The very first failure falls back, long before the breaker would trip
+    assert response.status_code == 200
+    assert response.json()["questions"] == BANKED
+    assert provider.calls == 1
+
+
+def test_upstream_errors_without_a_fallback_are_503(service):
+    service(error_rate=1.0)
+    response = call(lambda client: client.post(
+        "/generate-questions", json={"topic": "python", "difficulty": "beginner", "num_questions": 5},
+    ))
+    assert response.status_code == 503
+
+
+def test_question_counts_outside_the_limits_are_rejected(service):
+    provider = service()
+
+    async def requests(client):
+        return [
+            await client.post("/generate-questions", json={"topic": "js", "difficulty": "intermediate", "num_questions": 0}),
+            await client.post("/generate-questions", json={"topic": "js", "difficulty": "intermediate", "num_questions": 1000}),
+            await client.post("/generate-questions/stream", json={"topic": "js", "difficulty": "intermediate", "num_questions": 0}),
+            await client.post("/generate-questions/batch", json={"specs": [{"topic": "js", "difficulty": "intermediate", "num_questions": 0}]}),
+        ]
+
+    assert [response.status_code for response in call(requests)] == [422] * 4
+    assert provider.calls == 0
+
+
+def test_smaller_or_empty_sets_never_replace_the_cached_one(service):
+    key = "questions:javascript:intermediate"
+    ten = [{"question": f"Q{i}?"} for i in range(10)]
+
+    async def run():
+        await main.question_cache.set(key, ten)
+        written = [
+            await main._cache_questions({key: ten[:5]}, delta=0),
+            await main._cache_questions({key: []}, delta=0),
+            await main._cache_questions({key: ten[::-1]}, delta=0),
+        ]
+        return written, await main.question_cache.get(key)
+
+    written, cached = asyncio.run(run())
+    assert written == [[], [], [key]]
+    assert cached == ten[::-1]
+
+
+def test_demand_is_recorded_after_the_response(service, monkeypatch):
+    service()
+    recorded = []
+
+    async def record(request):
+        recorded.append((request.topic, request.difficulty))
+
+    monkeypatch.setattr(main, "_record_demand", record)
+    body = {"topic": "JS", "difficulty": "Intermediate", "num_questions": 2}
+
+    async def requests(client):
+        await client.post("/generate-questions", json=body)
+        await client.post("/generate-questions/stream", json=body)
+        await client.post("/generate-questions/batch", json={"specs": [body, {**body, "topic": "sql"}]})
+
+    call(requests)
+    assert recorded == [("javascript", "intermediate")] * 3 + [("sql", "intermediate")]
+
+
+def _ndjson(text):
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def test_concurrent_cold_streams_share_one_upstream_call(service):
+    provider = service()
+    body = {"topic": "javascript", "difficulty": "intermediate", "num_questions": 5}
+
+    async def requests(client):
+        return await asyncio.gather(*[client.post("/generate-questions/stream", json=body) for _ in range(8)])
+
+    streams = [_ndjson(response.text) for response in call(requests)]
+    assert provider.calls == 1
+    assert all(stream == streams[0] for stream in streams)
+    assert streams[0][-1] == {"done": 5}
+
+
+ASSESSMENT_PROMPT = "Generate exactly 3 assessment questions formatted as a JSON array"
+
+
+def _proxy(client, **body):
+    return client.post("/api/gemini-proxy", json={"prompt": ASSESSMENT_PROMPT, **body})
+
+
+def _sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_proxy_serves_identical_prompts_from_cache(service):
+    provider = service()
+    config = {"temperature": 0.5, "maxOutputTokens": 800}
+
+    async def requests(client):
+        first = await _proxy(client, generationConfig=config)
+        again = await _proxy(client, generationConfig=config)
+        other = await _proxy(client, generationConfig={**config, "temperature": 0.9})
+        return first.json(), again.json(), other.json()
+
+    first, again, other = call(requests)
+    assert not first["cached"] and again["cached"] and not other["cached"]
+    assert again["content"] == first["content"]
+    assert len(first["parsed"]) == 3 and again["parsed"] == first["parsed"]
+    assert provider.calls == 2
+
+
+def test_proxy_coalesces_concurrent_misses(service):
+    provider = service()
+
+    async def requests(client):
+        return await asyncio.gather(*[_proxy(client) for _ in range(5)])
+
+    responses = call(requests)
+    assert {response.json()["content"] for response in responses} == {responses[0].json()["content"]}
+    assert provider.calls == 1
+
+
+def test_proxy_streams_chunks_and_caches_the_result(service):
+    provider = service()
+
+    async def requests(client):
+        first = await _proxy(client, stream=True)
+        again = await _proxy(client, stream=True)
+        return first, again
+
+    first, again = call(requests)
+    assert first.headers["content-type"].startswith("text/event-stream")
+    events = _sse(first.text)
+    assert events[-1] == ("done", {"cached": False})
+    chunks = [data for event, data in events if event == "chunk"]
+    assert len(chunks) > 1
+    assert len(json.loads("".join(chunks))) == 3
+    assert _sse(again.text) == [("chunk", "".join(chunks)), ("done", {"cached": True})]
+    assert provider.calls == 1
+
+
+def test_proxy_coalesces_concurrent_streaming_misses(service):
+    provider = service()
+
+    async def requests(client):
+        return await asyncio.gather(*[_proxy(client, stream=True) for _ in range(5)])
+
+    streams = [_sse(response.text) for response in call(requests)]
+    assert provider.calls == 1
+    assert all(stream == streams[0] for stream in streams)
+    assert streams[0][-1] == ("done", {"cached": False})
+    assert len(json.loads("".join(data for event, data in streams[0] if event == "chunk"))) == 3
+
+
+@pytest.fixture
+def feedback_jobs(redis_client, monkeypatch):
+    queue = JobQueue(redis_client, "jobs:feedback", None)
+    monkeypatch.setattr(main, "feedback_jobs", queue)
+    return queue
+
+
+def test_feedback_job_poll_hides_the_dedupe_key(feedback_jobs):
+    async def requests(client):
+        job_id = await feedback_jobs.submit({"code": "x = 1"}, dedupe_key="digest")
+        return job_id, await client.get(f"/feedback-jobs/{job_id}"), await client.get("/feedback-jobs/nope")
+
+    job_id, found, missing = call(requests)
+    assert found.json() == {"job_id": job_id, "status": "pending"}
+    assert missing.status_code == 404
+
+
+def test_feedback_job_events_follow_the_job_until_it_finishes(feedback_jobs, monkeypatch):
+    monkeypatch.setattr(main, "FEEDBACK_EVENTS_POLL_SECONDS", 0.01)
+
+    async def requests(client):
+        job_id = await feedback_jobs.submit({}, dedupe_key="digest")
+        await feedback_jobs._set_state(job_id, {"status": RUNNING, "dedupe_key": "digest"})
+
+        async def finish():
+            await asyncio.sleep(0.05)
+            await feedback_jobs._set_state(job_id, {"status": DONE, "feedback": "nice"})
+
+        finishing = asyncio.ensure_future(finish())
+        response = await client.get(f"/feedback-jobs/{job_id}/events")
+        await finishing
+        return job_id, response
+
+    job_id, response = call(requests)
+    assert _sse(response.text) == [
+        ("running", {"job_id": job_id, "status": RUNNING}),
+        ("done", {"job_id": job_id, "status": DONE, "feedback": "nice"}),
+    ]
+
+
+def _estimate(**body):
+    return call(lambda client: client.post(
+        "/estimate-complexity", json={"code": "def f(xs):\n    return sorted(xs)\n", "function_name": "f", **body},
+    ))
+
+
+def test_complexity_inputs_are_validated_before_running(monkeypatch):
+    sandbox = FakeSandbox({"result": {"timings": [], "stopped_early": False}})
+    monkeypatch.setattr(main, "sandbox_pool", sandbox)
+    assert _estimate(sizes=[0, 8, 16, 32]).status_code == 422
+    assert _estimate(sizes=list(range(2, 1000))).status_code == 422
+    assert _estimate(repeats=100_000).status_code == 422
+    assert sandbox.jobs == []
+
+
+def test_timings_that_cannot_be_fitted_are_422(monkeypatch):
+    timings = [[2, 1e-3], [8, float("nan")], [16, 3e-3], [32, 5e-3]]
+    monkeypatch.setattr(main, "sandbox_pool", FakeSandbox({"result": {"timings": timings, "stopped_early": False}}))
+    response = _estimate(sizes=[2, 8, 16, 32])
+    assert response.status_code == 422
+    assert "could not be fitted" in response.json()["detail"]
+
+
+def _batch(client, *specs):
+    return client.post("/generate-questions/batch", json={"specs": [
+        {"topic": topic, "difficulty": "beginner", "num_questions": n} for topic, n in specs
+    ]})
+
+
+def test_batch_packs_misses_into_one_call_and_caches_them(service):
+    provider = service()
+
+    async def requests(client):
+        first = await _batch(client, ("python", 2), ("python", 4), ("sql", 3))
+        again = await _batch(client, ("sql", 3), ("python", 1))
+        return first.json()["results"], again.json()["results"]
+
+    first, again = call(requests)
+    # One packed call; both python specs share the larger set
+    assert provider.calls == 1
+    assert [len(result["questions"]) for result in first] == [2, 4, 3]
+    assert first[0]["questions"] == first[1]["questions"][:2]
+    assert again[0]["questions"] == first[2]["questions"]
+    assert again[1]["questions"] == first[0]["questions"][:1]
+
+
+def test_batch_generates_entries_the_batched_reply_dropped(service, monkeypatch):
+    provider = service()
+
+    async def answer_first_only(specs):
+        return [BANKED * 2] + [None] * (len(specs) - 1)
+
+    monkeypatch.setattr(main, "generate_question_batch_with_llm", answer_first_only)
+    response = call(lambda client: _batch(client, ("python", 4), ("sql", 3)))
+    python, sql = response.json()["results"]
+    assert python["questions"] == BANKED * 2
+    assert len(sql["questions"]) == 3
+    # Only the dropped spec went upstream on its own
+    assert provider.calls == 1
+
+
+def test_batch_falls_back_to_the_bank_when_upstream_fails(service, monkeypatch):
+    service(error_rate=1.0)
+    response = call(lambda client: _batch(client, ("python", 5)))
+    assert response.status_code == 503
+
+    monkeypatch.setattr(main, "question_bank", FakeBank(BANKED))
+    response = call(lambda client: _batch(client, ("python", 5), ("sql", 5)))
+    assert response.status_code == 200
+    assert [result["questions"] for result in response.json()["results"]] == [BANKED, BANKED]
+
+
+def _stream(client, accept="application/x-ndjson", **body):
+    return client.post(
+        "/generate-questions/stream",
+        json={"topic": "python", "difficulty": "beginner", "num_questions": 3, **body},
+        headers={"accept": accept},
+    )
+
+
+def test_stream_sends_sse_when_asked_and_caches_the_set(service):
+    provider = service()
+
+    async def requests(client):
+        return await _stream(client, accept="text/event-stream"), await _stream(client)
+
+    first, again = call(requests)
+    assert first.headers["content-type"].startswith("text/event-stream")
+    events = _sse(first.text)
+    assert [event for event, _ in events] == ["question"] * 3 + ["done"]
+    assert _ndjson(again.text) == [data for _, data in events[:3]] + [{"done": 3}]
+    assert provider.calls == 1
+
+
+def test_stream_falls_back_to_the_bank_or_reports_the_error(service, monkeypatch):
+    service(error_rate=1.0)
+    failed = _ndjson(call(lambda client: _stream(client)).text)
+    assert list(failed[-1]) == ["error"]
+
+    monkeypatch.setattr(main, "question_bank", FakeBank(BANKED))
+    assert _ndjson(call(lambda client: _stream(client)).text) == BANKED + [{"done": 2}]
+
+
+def _source_submission(code):
+    # Still rejects invalid code, but hands the fake sandbox the source
+    compile(code, "<submission>", "exec")
+    return {"source": code}
+
+
+@pytest.fixture
+def evaluation(service, redis_client, monkeypatch):
+    # Sandbox replies come from the test; by default the input doubled
+    service()
+    monkeypatch.setattr(main, "eval_cache", EvaluationCache(redis_client))
+    monkeypatch.setattr(main, "prepare_submission", _source_submission)
+
+    def double(job):
+        return {"result": job["args"][0] * 2, "metrics": {"cpu_ms": 1.0}}
+
+    def use_sandbox(outcome=double):
+        sandbox = FakeSandbox(outcome)
+        monkeypatch.setattr(main, "sandbox_pool", sandbox)
+        return sandbox
+
+    return use_sandbox
+
+
+CODE = "def double(x):\n    return x * 2\n"
+
+
+def _case(i, expected=None):
+    return {"name": f"t{i}", "function_name": "double", "input": [i], "expected_output": i * 2 if expected is None else expected}
+
+
+def _evaluate(client, test_cases, **body):
+    return client.post("/evaluate-code", json={"code": CODE, "test_cases": test_cases, "async_feedback": False, **body})
+
+
+def test_evaluation_reruns_only_new_test_cases(evaluation):
+    sandbox = evaluation()
+
+    async def requests(client):
+        first = await _evaluate(client, [_case(1), _case(2, expected=5)])
+        again = await _evaluate(client, [_case(0), _case(1), _case(2, expected=5)])
+        return first.json(), again.json()
+
+    first, again = call(requests)
+    assert [result["passed"] for result in first["results"]] == [True, False]
+    assert first["feedback"].startswith("Stub review")
+    assert again["results"][1:] == first["results"]
+    assert again["results"][0]["test_case"] == "t0"
+    assert [job["args"] for job in sandbox.jobs] == [[1], [2], [0]]
+
+
+def test_retryable_sandbox_errors_are_not_cached(evaluation):
+    sandbox = evaluation({"error": "Sandbox worker died", "retryable": True})
+
+    async def requests(client):
+        return [(await _evaluate(client, [_case(1)])).json() for _ in range(2)]
+
+    results = call(requests)
+    assert all(result["results"][0]["error"] == "Sandbox worker died" for result in results)
+    assert len(sandbox.jobs) == 2
+
+
+def test_test_cases_much_slower_than_the_reference_are_flagged(evaluation, monkeypatch):
+    monkeypatch.setattr(main, "REFERENCE_NOISE_FLOOR_MS", 5)
+
+    def timed(job):
+        # The submission takes 100ms on t1 and 2ms on t2; the reference 10ms and 1ms
+        slow = "reference" not in job["source"]
+        cpu_ms = {1: 100.0 if slow else 10.0, 2: 2.0 if slow else 1.0}[job["args"][0]]
+        return {"result": job["args"][0] * 2, "metrics": {"cpu_ms": cpu_ms}}
+
+    evaluation(timed)
+    reference = "# reference\ndef double(x):\n    return x + x\n"
+    response = call(lambda client: _evaluate(client, [_case(1), _case(2)], reference_code=reference, slow_factor=3))
+    first, second = response.json()["results"]
+    assert first["slow"] and first["time_ratio"] == 10.0
+    assert first["reference_metrics"] == {"cpu_ms": 10.0}
+    # Under the noise floor neither run counts as slow
+    assert not second["slow"] and second["time_ratio"] == 0.4
+
+
+def test_syntax_errors_come_back_as_feedback(evaluation):
+    sandbox = evaluation()
+    response = call(lambda client: client.post(
+        "/evaluate-code", json={"code": "def broken(:\n", "test_cases": [_case(1)]},
+    ))
+    assert response.json()["feedback"].startswith("Syntax Error")
+    assert sandbox.jobs == []
+
+
+def test_complexity_is_fitted_from_the_sandbox_timings(monkeypatch):
+    timings = [[n, 1e-6 * n * n] for n in (64, 128, 256, 512, 1024)]
+    sandbox = FakeSandbox({"result": {"timings": timings, "stopped_early": True}})
+    monkeypatch.setattr(main, "sandbox_pool", sandbox)
+    response = _estimate(sizes=[1024, 64, 128, 256, 512, 64])
+    assert response.status_code == 200
+    assert response.json()["complexity"] == "O(n²)"
+    assert response.json()["stopped_early"]
+    assert sandbox.jobs[0]["sizes"] == [64, 128, 256, 512, 1024]
+
+
+def test_complexity_reports_unknown_input_kinds_and_sandbox_errors(monkeypatch):
+    monkeypatch.setattr(main, "sandbox_pool", FakeSandbox({"error": "NameError: name 'f' is not defined"}))
+    assert _estimate(input_kind="tree").status_code == 400
+    response = _estimate()
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("NameError")
+
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from near_duplicates import MinHasher, NearDuplicateIndex, question_text
+
+QUESTION = {
+    "question": "Which hook lets a React function component hold local state between renders?",
+    "options": ["useState", "useEffect", "useMemo", "useRef"],
+    "answer": "useState",
+}
+PARAPHRASE = {
+    "question": "Which hook lets a React function component keep local state between re-renders?",
+    "options": ["useEffect", "useState", "useRef", "useMemo"],
+    "answer": "useState",
+}
+DIFFERENT = {
+    "question": "What does the SQL GROUP BY clause do?",
+    "options": ["Groups rows", "Sorts rows", "Joins tables", "Deletes rows"],
+    "answer": "Groups rows",
+}
+
+
+def test_option_order_and_punctuation_do_not_matter():
+    shuffled = dict(QUESTION, options=list(reversed(QUESTION["options"])))
+    assert question_text(QUESTION) == question_text(shuffled)
+
+
+def test_detects_paraphrases_but_not_other_questions():
+    index = NearDuplicateIndex()
+    index.add("q", index.hasher.question_signature(QUESTION))
+    match = index.query(index.hasher.question_signature(PARAPHRASE))
+    assert match is not None and match[0] == "q"
+    assert index.query(index.hasher.question_signature(DIFFERENT)) is None
+
+
+def test_filter_drops_duplicates_within_a_batch_and_against_the_index():
+    index = NearDuplicateIndex()
+    index.add("q", index.hasher.question_signature(QUESTION))
+    unique = index.filter([("p", PARAPHRASE), ("d", DIFFERENT), ("d2", dict(DIFFERENT))])
+    assert [key for key, _, _ in unique] == ["d"]
+    # filter leaves the index alone until the survivors are stored
+    assert len(index) == 1
+
+
+def test_signatures_are_stable_across_instances():
+    assert (MinHasher().question_signature(QUESTION) == MinHasher().question_signature(QUESTION)).all()
+
+
+def test_lookups_stay_fast_on_a_large_index():
+    index = NearDuplicateIndex()
+    rng = np.random.default_rng(0)
+    signatures = rng.integers(0, 2 ** 32, size=(50_000, index.hasher.num_perm), dtype=np.uint32)
+    for i, signature in enumerate(signatures):
+        index.add(str(i), signature)
+    index.add("q", index.hasher.question_signature(QUESTION))
+
+    started = time.perf_counter()
+    for _ in range(200):
+        assert index.filter([("p", PARAPHRASE)]) == []
+    per_question = (time.perf_counter() - started) / 200
+    assert per_question < 0.001
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("sqlmodel")
+pytest.importorskip("redis")
+
+import pregen_worker
+
+
+class FakeBank:
+    def __init__(self, counts):
+        self.counts = counts
+        self.added = []
+
+    async def count(self, topic, difficulty, max_served=None):
+        return self.counts.get((topic, difficulty), 0)
+
+    async def add(self, topic, difficulty, questions):
+        self.added.append((topic, difficulty, len(questions)))
+        self.counts[(topic, difficulty)] = self.counts.get((topic, difficulty), 0) + len(questions)
+        return len(questions)
+
+
+def test_refill_prioritises_demand_and_fills_deficit(monkeypatch):
+    monkeypatch.setattr(pregen_worker, "PREGEN_POOL_TARGET", 20)
+    monkeypatch.setattr(pregen_worker, "PREGEN_BATCH_SIZE", 10)
+    async def top(redis_client, limit):
+        return [("JavaScript", "intermediate", 9.0), ("Python", "beginner", 1.0)]
+
+    monkeypatch.setattr(pregen_worker.demand, "top", top)
+
+    async def generate(topic, difficulty, n):
+        return [{"question": f"{topic} {i}"} for i in range(n)]
+
+    monkeypatch.setattr(pregen_worker, "generate_questions_with_llm", generate)
+
+    bank = FakeBank({("JavaScript", "intermediate"): 5, ("Python", "beginner"): 20})
+    calls = asyncio.run(pregen_worker.refill_once(None, bank, pregen_worker.RateLimiter(6000)))
+
+    assert calls == 2
+    assert bank.added == [("JavaScript", "intermediate", 10), ("JavaScript", "intermediate", 5)]
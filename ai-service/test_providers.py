@@ -0,0 +1,136 @@
+import asyncio
+import json
+import statistics
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from circuit_breaker import OPEN
+from generation import _batch_messages, _question_messages
+from llm import LLMClient, LLMUnavailableError
+from providers import GeminiProvider, ProviderRateLimited, ProviderUnavailable, StubProvider, create_provider
+from stub_llm import StubModel
+
+
+def _instant(**overrides):
+    return StubModel(**{"distribution": "fixed", "median": 0.0, "tokens_per_second": 0, **overrides})
+
+
+def test_stub_reply_follows_the_prompt_and_is_deterministic():
+    model = _instant()
+    messages = _question_messages("python decorators", "advanced", 3)
+    questions = json.loads(model.reply(messages))
+    assert len(questions) == 3
+    assert all(set(q) == {"question", "options", "answer", "explanation"} for q in questions)
+    assert "python decorators" in questions[0]["question"]
+    assert model.reply(messages) == _instant(seed=99).reply(messages)
+
+
+def test_stub_reply_answers_batched_prompts():
+    specs = [("sql", "beginner", 2), ("go", "advanced", 4)]
+    answers = json.loads(_instant().reply(_batch_messages(specs)))
+    assert [len(answers[str(i)]) for i in range(2)] == [2, 4]
+
+
+def test_stub_latency_distributions():
+    assert _instant(median=0.3).latency() == 0.3
+    model = StubModel(distribution="lognormal", median=1.0, sigma=0.5, seed=1)
+    samples = [model.latency() for _ in range(5000)]
+    assert 0.9 < statistics.median(samples) < 1.1
+    assert max(samples) > 3.0
+    with pytest.raises(ValueError):
+        StubModel(distribution="gamma")
+
+
+def test_stub_failure_rates():
+    model = _instant(error_rate=0.2, rate_limit_rate=0.1, seed=3)
+    outcomes = [model.outcome() for _ in range(5000)]
+    assert 0.17 < outcomes.count("error") / 5000 < 0.23
+    assert 0.08 < outcomes.count("rate_limited") / 5000 < 0.12
+
+
+def test_stub_provider_maps_failures():
+    with pytest.raises(ProviderUnavailable):
+        asyncio.run(StubProvider(stub=_instant(error_rate=1.0)).complete([], 0.7))
+    with pytest.raises(ProviderRateLimited):
+        asyncio.run(StubProvider(stub=_instant(rate_limit_rate=1.0)).complete([], 0.7))
+
+
+def test_client_streams_from_stub_provider():
+    client = LLMClient(provider=StubProvider(stub=_instant()))
+    messages = _question_messages("rust", "beginner", 2)
+
+    async def run():
+        return "".join([chunk async for chunk in client.chat_stream(messages)])
+
+    assert asyncio.run(run()) == client.provider.stub.reply(messages)
+
+
+def test_failing_stub_trips_the_breaker():
+    client = LLMClient(provider=StubProvider(stub=_instant(error_rate=1.0)))
+
+    async def run():
+        # Upstream errors surface as unavailable so callers can fall back
+        for _ in range(client.breaker.min_calls):
+            with pytest.raises(LLMUnavailableError):
+                await client.chat([{"role": "user", "content": "hi"}])
+        assert client.breaker.state == OPEN
+        with pytest.raises(LLMUnavailableError):
+            await client.chat([{"role": "user", "content": "hi"}])
+
+    asyncio.run(run())
+    assert client.breaker.stats()["rejected"] == 1
+
+
+def test_gemini_request_body():
+    provider = GeminiProvider(api_key="k", model="gemini-test")
+    body = provider._body(
+        [
+            {"role": "system", "content": "be brief"},
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": "hello"},
+        ],
+        0.2,
+    )
+    assert body["systemInstruction"] == {"parts": [{"text": "be brief"}]}
+    assert [c["role"] for c in body["contents"]] == ["user", "model"]
+    assert body["generationConfig"] == {"temperature": 0.2}
+    assert provider._url("generateContent").endswith("/v1beta/models/gemini-test:generateContent")
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError):
+        create_provider("llama")
+
+
+def test_stub_server_speaks_openai_and_gemini():
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+
+    from stub_llm import create_app
+
+    client = TestClient(create_app(_instant()))
+    messages = _question_messages("css grid", "intermediate", 2)
+    response = client.post("/v1/chat/completions", json={"model": "stub", "messages": messages})
+    assert response.status_code == 200
+    assert len(json.loads(response.json()["choices"][0]["message"]["content"])) == 2
+
+    response = client.post(
+        "/v1/chat/completions", json={"model": "stub", "messages": messages, "stream": True}
+    )
+    chunks = [
+        json.loads(line[6:])["choices"][0]["delta"]["content"]
+        for line in response.text.splitlines()
+        if line.startswith("data: {")
+    ]
+    assert len(json.loads("".join(chunks))) == 2
+
+    response = client.post(
+        "/v1beta/models/stub:generateContent",
+        json={"contents": [{"role": "user", "parts": [{"text": messages[1]["content"]}]}]},
+    )
+    assert len(json.loads(response.json()["candidates"][0]["content"]["parts"][0]["text"])) == 2
+
+    failing = TestClient(create_app(_instant(error_rate=1.0)))
+    assert failing.post("/v1/chat/completions", json={"messages": messages}).status_code == 500
@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("sqlmodel")
+pytest.importorskip("psycopg2")
+
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from models import BankQuestion
+from question_bank import QuestionBank
+
+STEMS = [
+    "What does a closure capture from its enclosing scope?",
+    "When does a generator run the code after a yield?",
+    "Which decorator keeps the wrapped function's name?",
+    "How is a metaclass chosen when a class statement executes?",
+    "Why would a data descriptor override an instance attribute?",
+    "What must an event loop do before awaiting a coroutine?",
+]
+OPTIONS = [
+    ["free variables", "globals only", "a copy of locals", "nothing"],
+    ["on next()", "at definition", "at import", "on garbage collection"],
+    ["functools.wraps", "staticmethod", "property", "classmethod"],
+    ["from the bases", "from sys.modules", "randomly", "from __init__"],
+    ["it defines __set__", "it is cached", "it is frozen", "it is a slot"],
+    ["schedule it as a task", "compile it", "pickle it", "fork a process"],
+]
+
+
+def _question(i):
+    return {"question": STEMS[i], "options": OPTIONS[i], "answer": "A", "explanation": "See the docs."}
+
+
+@pytest.fixture
+def engine():
+    # One shared in-memory database; the bank calls it from worker threads
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def _served(engine):
+    with Session(engine) as session:
+        return {row.payload["question"]: row.times_served for row in session.exec(select(BankQuestion))}
+
+
+def test_sample_rotates_through_least_served_questions(engine):
+    bank = QuestionBank(bind=engine)
+
+    async def run():
+        await bank.add("python", "beginner", [_question(i) for i in range(4)])
+        await bank.add("python", "advanced", [_question(4)])
+        first = await bank.sample("python", "beginner", 2)
+        second = await bank.sample("python", "beginner", 2)
+        return first, second
+
+    first, second = asyncio.run(run())
+    # Every question is served once before any is served twice
+    assert {q["question"] for q in first}.isdisjoint(q["question"] for q in second)
+    assert sorted(_served(engine).values()) == [0, 1, 1, 1, 1]
+
+
+def test_thin_bank_is_returned_but_not_counted_as_served(engine):
+    bank = QuestionBank(bind=engine)
+
+    async def run():
+        await bank.add("python", "beginner", [_question(i) for i in range(2)])
+        return await bank.sample("python", "beginner", 5)
+
+    assert len(asyncio.run(run())) == 2
+    assert set(_served(engine).values()) == {0}
+
+
+def test_count_filters_by_times_served(engine):
+    bank = QuestionBank(bind=engine)
+
+    async def run():
+        await bank.add("python", "beginner", [_question(i) for i in range(3)])
+        await bank.sample("python", "beginner", 2)
+        return (
+            await bank.count("python", "beginner"),
+            await bank.count("python", "beginner", max_served=1),
+            await bank.count("python", "advanced"),
+        )
+
+    assert asyncio.run(run()) == (3, 1, 0)
+
+
+def test_duplicates_are_rejected_and_races_ignored(engine):
+    bank = QuestionBank(bind=engine)
+    other_worker = QuestionBank(bind=engine)
+    questions = [_question(i) for i in range(2)]
+
+    async def run():
+        inserted = await bank.add("python", "beginner", questions)
+        # Same stem and options with a reworded explanation is the same question
+        again = await bank.add("python", "beginner", [{**questions[0], "explanation": "Reworded."}])
+        # A worker that synced before these rows landed relies on ON CONFLICT
+        other_worker._sync_dedupe = lambda session: None
+        raced = await other_worker.add("python", "beginner", questions + [_question(2)])
+        return inserted, again, raced
+
+    assert asyncio.run(run()) == (2, 0, 1)
+    assert bank.rejected == 1
+    assert len(_served(engine)) == 3
+
+
+def test_warm_indexes_in_batches_and_only_reads_unsigned_payloads(engine, monkeypatch):
+    import question_bank
+
+    asyncio.run(QuestionBank(bind=engine).add("python", "beginner", [_question(i) for i in range(5)]))
+    with Session(engine) as session:
+        # Banked before signatures were stored
+        row = session.exec(select(BankQuestion).where(BankQuestion.id == 3)).one()
+        row.minhash = None
+        session.add(row)
+        session.commit()
+
+    monkeypatch.setattr(question_bank, "DEDUPE_WARM_BATCH", 2)
+    bank = QuestionBank(bind=engine)
+    hasher = bank._dedupe.hasher
+    signed = []
+    real_signature = hasher.question_signature
+    monkeypatch.setattr(hasher, "question_signature", lambda q: signed.append(q) or real_signature(q))
+
+    asyncio.run(bank.warm())
+    assert len(bank._dedupe) == 5
+    assert signed == [_question(2)]
+    assert asyncio.run(bank.add("python", "beginner", [_question(2)])) == 0
+
+
+def test_adds_during_warm_up_do_not_wait_for_the_whole_bank(engine):
+    bank = QuestionBank(bind=engine)
+    bank._warming = True
+
+    def sync(*args, **kwargs):
+        raise AssertionError("add waited for a full sync while warming")
+
+    bank._sync_dedupe = sync
+    assert asyncio.run(bank.add("python", "beginner", [_question(0)])) == 1
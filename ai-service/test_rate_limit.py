@@ -0,0 +1,174 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from rate_limit import RateLimitExceeded, TokenBucketLimiter, estimate_tokens
+from scheduler import BACKGROUND, call_context
+
+
+class FakeScript:
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+
+    async def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        return self.results.pop(0) if self.results else 0
+
+
+@pytest.fixture
+def scripts(redis_client):
+    # The limiter's scripts; acquire answers with the waits queued on it, then 0
+    scripts = SimpleNamespace(acquire=FakeScript([]), settle=FakeScript([]))
+    redis_client.scripts.update({rate_limit.ACQUIRE_SCRIPT: scripts.acquire, rate_limit.SETTLE_SCRIPT: scripts.settle})
+    return scripts
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    slept = []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", sleep)
+    return slept
+
+
+def test_admitted_immediately_when_buckets_have_room(redis_client, scripts):
+    limiter = TokenBucketLimiter(redis_client, rpm=60, tpm=1000)
+    asyncio.run(limiter.acquire(200))
+    assert scripts.acquire.calls == [
+        (["ratelimit:llm:requests", "ratelimit:llm:tokens"], [60, 1000, 200, 0])
+    ]
+    assert limiter.stats()["admitted"] == 1
+    assert limiter.stats()["queued"] == 0
+
+
+def test_waits_for_quota_and_records_queueing(redis_client, scripts, no_sleep):
+    scripts.acquire.results = [500, 250]
+    limiter = TokenBucketLimiter(redis_client, rpm=60, tpm=1000, max_wait=10)
+    asyncio.run(limiter.acquire(200))
+    assert len(scripts.acquire.calls) == 3
+    assert 0.5 <= no_sleep[0] <= 0.6
+    assert 0.25 <= no_sleep[1] <= 0.3
+    stats = limiter.stats()
+    assert stats["queued"] == 1
+    assert stats["admitted"] == 1
+    assert stats["queue_depth"] == 0
+
+
+def test_refuses_when_wait_exceeds_max_wait(redis_client, scripts, no_sleep):
+    scripts.acquire.results = [5000]
+    limiter = TokenBucketLimiter(redis_client, rpm=60, tpm=1000, max_wait=1)
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(limiter.acquire(200))
+    assert no_sleep == []
+    stats = limiter.stats()
+    assert stats["rejected"] == 1
+    assert stats["admitted"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_queue_depth_counts_callers_waiting(redis_client, scripts, monkeypatch):
+    scripts.acquire.results = [100, 100]
+    limiter = TokenBucketLimiter(redis_client, rpm=60, tpm=1000)
+    depths = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def sleep(seconds):
+            depths.append(limiter.stats()["queue_depth"])
+            if len(depths) == 2:
+                release.set()
+            await release.wait()
+
+        monkeypatch.setattr(rate_limit.asyncio, "sleep", sleep)
+        await asyncio.gather(limiter.acquire(10), limiter.acquire(10))
+
+    asyncio.run(run())
+    assert depths == [1, 2]
+    assert limiter.stats()["queue_depth"] == 0
+    assert limiter.stats()["admitted"] == 2
+
+
+def test_background_calls_leave_a_reserve(redis_client, scripts):
+    limiter = TokenBucketLimiter(redis_client, rpm=60, tpm=1000, background_reserve=0.25)
+    with call_context(lane=BACKGROUND):
+        asyncio.run(limiter.acquire(200))
+    assert scripts.acquire.calls[0][1] == [60, 1000, 200, 0.25]
+
+
+def test_reserve_is_kept_for_interactive_calls_across_processes():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    redis_client = fakeredis.FakeAsyncRedis()
+    # Say the API and a pre-generation worker: separate limiters, one quota
+    api = TokenBucketLimiter(redis_client, rpm=60, tpm=1000, background_reserve=0.25)
+    pregen = TokenBucketLimiter(redis_client, rpm=60, tpm=1000, background_reserve=0.25)
+
+    async def background(tokens):
+        with call_context(lane=BACKGROUND):
+            await pregen.acquire(tokens, max_wait=0)
+
+    async def run():
+        await background(600)
+        await api.acquire(100)
+        # 300 tokens left, but only 50 above the reserve
+        with pytest.raises(RateLimitExceeded):
+            await background(100)
+        await api.acquire(250)
+
+    asyncio.run(run())
+    assert pregen.stats()["rejected"] == 1
+    assert api.stats()["admitted"] == 2
+
+
+def test_disabled_limiter_never_touches_redis(redis_client, scripts):
+    scripts.acquire.results = [10_000]
+    limiter = TokenBucketLimiter(redis_client, rpm=0, tpm=0)
+    asyncio.run(limiter.acquire(200))
+    asyncio.run(limiter.settle(200, 50))
+    assert scripts.acquire.calls == []
+    assert scripts.settle.calls == []
+
+
+def test_each_limit_is_disabled_on_its_own():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    redis_client = fakeredis.FakeAsyncRedis()
+    tokens_only = TokenBucketLimiter(redis_client, name="tpm", rpm=0, tpm=1000)
+    requests_only = TokenBucketLimiter(redis_client, name="rpm", rpm=2, tpm=0)
+
+    async def run():
+        for _ in range(5):
+            await tokens_only.acquire(150)
+        with pytest.raises(RateLimitExceeded):
+            await tokens_only.acquire(400, max_wait=0)
+        await requests_only.acquire(100_000)
+        await requests_only.acquire(100_000)
+        with pytest.raises(RateLimitExceeded):
+            await requests_only.acquire(1, max_wait=0)
+        await requests_only.settle(500, 100)
+        return sorted(key.decode() for key in await redis_client.keys("*"))
+
+    # Only the buckets of enabled limits are ever created
+    assert asyncio.run(run()) == ["ratelimit:rpm:requests", "ratelimit:tpm:tokens"]
+    assert tokens_only.stats()["admitted"] == 5
+    assert requests_only.stats()["admitted"] == 2
+
+
+def test_settle_returns_unused_tokens(redis_client, scripts):
+    limiter = TokenBucketLimiter(redis_client, rpm=60, tpm=1000)
+    asyncio.run(limiter.settle(500, 120))
+    asyncio.run(limiter.settle(500, None))
+    assert scripts.settle.calls == [(["ratelimit:llm:tokens"], [380])]
+
+
+def test_estimate_tokens_grows_with_prompt():
+    short = estimate_tokens([{"role": "user", "content": "hi"}])
+    long = estimate_tokens([{"role": "user", "content": "x" * 400}])
+    assert long - short == 100
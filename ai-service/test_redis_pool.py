@@ -0,0 +1,26 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("redis")
+
+import redis_pool
+
+
+def test_large_mget_is_chunked_into_one_pipeline(redis_client):
+    redis_client.data.update({f"k{i}": str(i).encode() for i in range(0, 10, 2)})
+    keys = [f"k{i}" for i in range(10)]
+    values = asyncio.run(redis_pool.mget(redis_client, keys, chunk=3))
+    assert values == [str(i).encode() if i % 2 == 0 else None for i in range(10)]
+    assert redis_client.round_trips == 1
+
+
+def test_setex_many_writes_in_one_round_trip(redis_client):
+    asyncio.run(redis_pool.setex_many(redis_client, {"a": b"1", "b": b"2"}, ttl=60))
+    assert redis_client.data == {"a": b"1", "b": b"2"}
+    assert redis_client.round_trips == 1
+
+
+def test_empty_mget_skips_redis(redis_client):
+    assert asyncio.run(redis_pool.mget(redis_client, [])) == []
+    assert redis_client.round_trips == 0
@@ -0,0 +1,270 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from sandbox import SandboxPool, prepare_submission
+
+ADD = "def add(a, b):\n    return a + b\n"
+
+
+def run_jobs(pool, jobs, timeout=None):
+    async def run():
+        try:
+            return await asyncio.gather(*[pool.run(job, timeout=timeout) for job in jobs])
+        finally:
+            await pool.stop()
+
+    return asyncio.run(run())
+
+
+def test_runs_function_and_captures_stdout():
+    pool = SandboxPool(size=2)
+    code = "def greet(name):\n    print('hi', name)\n    return name.upper()\n"
+    [outcome] = run_jobs(pool, [{"code": code, "function_name": "greet", "args": ["ada"]}])
+    assert outcome["result"] == "ADA"
+    assert outcome["stdout"] == "hi ada\n"
+
+
+def test_reports_exceptions():
+    pool = SandboxPool(size=1)
+    [outcome] = run_jobs(pool, [{"code": ADD, "function_name": "add", "args": [1, "x"]}])
+    assert outcome["error"].startswith("TypeError")
+
+
+def test_infinite_loop_is_killed_and_worker_replaced():
+    pool = SandboxPool(size=1)
+    loop_code = "def spin():\n    while True:\n        pass\n"
+
+    async def run():
+        try:
+            first = await pool.run({"code": loop_code, "function_name": "spin"}, timeout=0.5)
+            second = await pool.run({"code": ADD, "function_name": "add", "args": [2, 3]})
+            return first, second, pool.stats()
+        finally:
+            await pool.stop()
+
+    first, second, stats = asyncio.run(run())
+    assert first["timed_out"]
+    assert second["result"] == 5
+    assert stats["recycled"] == 1
+
+
+def test_memory_limit():
+    pool = SandboxPool(size=1, memory_bytes=512 * 1024 * 1024)
+    code = "def hog():\n    return len(bytearray(2 * 1024 ** 3))\n"
+    [outcome] = run_jobs(pool, [{"code": code, "function_name": "hog"}])
+    assert outcome["error"] == "Memory limit exceeded"
+
+
+def test_output_limit():
+    pool = SandboxPool(size=1, output_bytes=1024)
+    code = "def chatty():\n    for _ in range(1000):\n        print('spam' * 10)\n"
+    big = "def big():\n    return 'x' * 10000\n"
+    chatty, huge = run_jobs(pool, [
+        {"code": code, "function_name": "chatty"},
+        {"code": big, "function_name": "big"},
+    ])
+    assert "Output limit" in chatty["error"]
+    assert "Output limit" in huge["error"]
+
+
+def test_workers_are_recycled_after_max_jobs():
+    pool = SandboxPool(size=1, max_jobs_per_worker=2)
+    jobs = [{"code": ADD, "function_name": "add", "args": [i, i]} for i in range(5)]
+
+    async def run():
+        try:
+            results = [await pool.run(job) for job in jobs]
+            return results, pool.stats()
+        finally:
+            await pool.stop()
+
+    results, stats = asyncio.run(run())
+    assert [r["result"] for r in results] == [0, 2, 4, 6, 8]
+    assert stats["recycled"] == 2
+
+
+def test_each_test_case_gets_fresh_module_globals():
+    code = "calls = []\ndef add(a, b):\n    calls.append(1)\n    return a + b + len(calls) - 1\n"
+    submission = prepare_submission(code)
+    pool = SandboxPool(size=1)
+
+    async def run():
+        try:
+            # One evaluation, one worker: every case must still see a fresh module
+            return [await pool.run({**submission, "function_name": "add", "args": [i, i]}) for i in range(6)]
+        finally:
+            await pool.stop()
+
+    outcomes = asyncio.run(run())
+    assert [outcome["result"] for outcome in outcomes] == [0, 2, 4, 6, 8, 10]
+
+
+def test_module_state_does_not_leak_between_evaluations():
+    code = "calls = []\ndef record(x):\n    calls.append(x)\n    return len(calls)\n"
+    pool = SandboxPool(size=1)
+
+    async def run():
+        try:
+            # Same code, three separate evaluations
+            return [
+                await pool.run({**prepare_submission(code), "function_name": "record", "args": [i]})
+                for i in range(3)
+            ]
+        finally:
+            await pool.stop()
+
+    outcomes = asyncio.run(run())
+    assert [outcome["result"] for outcome in outcomes] == [1, 1, 1]
+
+
+def test_test_cases_run_in_parallel_across_workers():
+    code = "import time\ndef slow(x):\n    time.sleep(0.5)\n    return x\n"
+    submission = prepare_submission(code)
+    pool = SandboxPool(size=4)
+
+    async def run():
+        await pool.start()
+        try:
+            started = time.monotonic()
+            outcomes = await asyncio.gather(*[
+                pool.run({**submission, "function_name": "slow", "args": [i]}) for i in range(4)
+            ])
+            return outcomes, time.monotonic() - started
+        finally:
+            await pool.stop()
+
+    outcomes, elapsed = asyncio.run(run())
+    assert [outcome["result"] for outcome in outcomes] == [0, 1, 2, 3]
+    assert elapsed < 1.5
+
+
+def test_prepare_submission_rejects_syntax_errors():
+    with pytest.raises(SyntaxError):
+        prepare_submission("def broken(:\n")
+
+
+def test_reports_time_and_memory_metrics():
+    pool = SandboxPool(size=1)
+    code = "def build(n):\n    data = [0] * n\n    return len(data)\n"
+    [outcome] = run_jobs(pool, [{"code": code, "function_name": "build", "args": [1_000_000]}])
+    metrics = outcome["metrics"]
+    assert outcome["result"] == 1_000_000
+    assert metrics["wall_ms"] >= 0
+    assert metrics["cpu_ms"] >= 0
+    assert metrics["peak_memory_bytes"] >= 8_000_000
+    assert "hot_lines" not in metrics
+
+
+def test_optional_line_profile_counts_submission_lines():
+    pool = SandboxPool(size=1)
+    code = "def total(n):\n    s = 0\n    for i in range(n):\n        s += i\n    return s\n"
+    [outcome] = run_jobs(pool, [{"code": code, "function_name": "total", "args": [100], "profile_lines": True}])
+    metrics = outcome["metrics"]
+    assert outcome["result"] == 4950
+    assert dict(metrics["hot_lines"])[4] == 100
+    assert metrics["lines_executed"] >= 200
+
+
+def test_timing_ladder_reports_best_time_per_size():
+    pool = SandboxPool(size=1)
+    code = "def total(values):\n    return sum(values)\n"
+    [outcome] = run_jobs(pool, [{"code": code, "function_name": "total", "sizes": [10, 100, 1000], "input_kind": "list"}])
+    ladder = outcome["result"]
+    assert [n for n, _ in ladder["timings"]] == [10, 100, 1000]
+    assert all(seconds >= 0 for _, seconds in ladder["timings"])
+    assert not ladder["stopped_early"]
+
+
+def test_timing_ladder_uses_submission_generator_and_stops_when_slow():
+    pool = SandboxPool(size=1)
+    code = (
+        "import time\n"
+        "def make_input(n):\n    return [n / 1000]\n"
+        "def nap(seconds):\n    time.sleep(seconds)\n"
+    )
+    [outcome] = run_jobs(pool, [{
+        "code": code, "function_name": "nap", "input_generator": "make_input",
+        "sizes": [1, 100, 1000], "repeats": 1, "max_call_seconds": 0.05,
+    }])
+    ladder = outcome["result"]
+    assert [n for n, _ in ladder["timings"]] == [1, 100]
+    assert ladder["stopped_early"]
+
+
+def test_timing_ladder_budget_is_checked_between_repeats():
+    pool = SandboxPool(size=1)
+    code = "import time\ndef nap(n):\n    time.sleep(0.01)\n"
+    started = time.monotonic()
+    [outcome] = run_jobs(pool, [{
+        "code": code, "function_name": "nap", "input_kind": "int",
+        "sizes": [1, 2], "repeats": 100_000, "budget_seconds": 0.2,
+    }])
+    ladder = outcome["result"]
+    assert time.monotonic() - started < 3
+    assert [n for n, _ in ladder["timings"]] == [1]
+    assert ladder["stopped_early"]
+
+
+def test_results_come_back_as_data_not_pickles():
+    pool = SandboxPool(size=1)
+    code = (
+        "import os\n"
+        "class Sneaky:\n    def __reduce__(self):\n        return (os.getpid, ())\n"
+        "def sneaky():\n    return Sneaky()\n"
+        "def pair():\n    return (1, 'a')\n"
+    )
+    sneaky, pair = run_jobs(pool, [
+        {"code": code, "function_name": "sneaky"},
+        {"code": code, "function_name": "pair"},
+    ])
+    assert isinstance(sneaky["result"], str) and "Sneaky" in sneaky["result"]
+    assert pair["result"] == [1, "a"]
+
+
+def test_forged_reply_on_the_pipe_is_rejected():
+    pool = SandboxPool(size=1)
+    code = (
+        "import gc\n"
+        "from multiprocessing.connection import Connection\n"
+        "def forge():\n"
+        "    for obj in gc.get_objects():\n"
+        "        if isinstance(obj, Connection):\n"
+        "            obj.send_bytes(b'not json')\n"
+        "    return 1\n"
+    )
+
+    async def run():
+        try:
+            forged = await pool.run({"code": code, "function_name": "forge"})
+            after = await pool.run({"code": ADD, "function_name": "add", "args": [2, 3]})
+            return forged, after
+        finally:
+            await pool.stop()
+
+    forged, after = asyncio.run(run())
+    assert forged["error"] == "Sandbox worker sent a malformed reply"
+    assert after["result"] == 5
+
+
+def test_timing_ladder_keeps_timings_taken_before_running_out_of_memory():
+    pool = SandboxPool(size=1, memory_bytes=256 * 1024 * 1024)
+    code = "def pairs(xs):\n    return len([a + b for a in xs for b in xs])\n"
+    [outcome] = run_jobs(pool, [{
+        "code": code, "function_name": "pairs", "sizes": [64, 128, 256, 512, 1024, 8192],
+        "input_kind": "list", "repeats": 1, "max_call_seconds": 30,
+    }], timeout=60)
+    ladder = outcome["result"]
+    assert [n for n, _ in ladder["timings"]] == [64, 128, 256, 512, 1024]
+    assert ladder["stopped_early"]
+
+
+def test_submissions_do_not_see_the_server_environment():
+    # Whatever the server had when the workers' forkserver started, HOME included
+    assert "HOME" in os.environ
+    pool = SandboxPool(size=1)
+    code = "import os\ndef env():\n    return dict(os.environ)\n"
+    [outcome] = run_jobs(pool, [{"code": code, "function_name": "env"}])
+    assert set(outcome["result"]) <= {"PATH", "LANG", "LC_ALL", "LC_CTYPE", "TZ"}
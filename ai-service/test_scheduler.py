@@ -0,0 +1,132 @@
+import asyncio
+import time
+
+import pytest
+
+from scheduler import BACKGROUND, FairScheduler, RequestDropped, call_context, current_context, shared_call
+
+
+async def _hold(scheduler, order, name, cost=1, **context):
+    with call_context(**context):
+        async with scheduler.slot(cost):
+            order.append(name)
+            await asyncio.sleep(0)
+
+
+async def _queue_behind_blocker(scheduler, calls):
+    # Fill the only slot so every call below queues, then let them run
+    await scheduler.acquire()
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+
+def test_weights_share_slots_between_tenants():
+    order = []
+
+    async def run():
+        scheduler = FairScheduler(1, tenant_weights={"heavy": 1, "light": 3}, endpoint_weights={})
+        calls = [_hold(scheduler, order, "heavy", tenant="heavy") for _ in range(8)]
+        calls += [_hold(scheduler, order, "light", tenant="light") for _ in range(8)]
+        await _queue_behind_blocker(scheduler, calls)
+
+    asyncio.run(run())
+    # Light queued last but gets three slots for each of heavy's
+    assert order[:8].count("light") == 6
+    assert order[:8].count("heavy") == 2
+
+
+def test_token_cost_counts_against_a_flow():
+    order = []
+
+    async def run():
+        scheduler = FairScheduler(1, tenant_weights={}, endpoint_weights={})
+        calls = [_hold(scheduler, order, "big", cost=1000, endpoint="evaluate-code") for _ in range(3)]
+        calls += [_hold(scheduler, order, "small", cost=100, endpoint="generate-questions") for _ in range(3)]
+        await _queue_behind_blocker(scheduler, calls)
+
+    asyncio.run(run())
+    assert order[:4] == ["small", "small", "small", "big"]
+
+
+def test_interactive_lane_goes_before_background():
+    order = []
+
+    async def run():
+        scheduler = FairScheduler(1, tenant_weights={}, endpoint_weights={})
+        calls = [_hold(scheduler, order, "background", lane=BACKGROUND) for _ in range(3)]
+        calls += [_hold(scheduler, order, "interactive") for _ in range(3)]
+        await _queue_behind_blocker(scheduler, calls)
+
+    asyncio.run(run())
+    assert order == ["interactive"] * 3 + ["background"] * 3
+
+
+def test_queued_call_dropped_past_deadline():
+    async def run():
+        scheduler = FairScheduler(1, tenant_weights={}, endpoint_weights={})
+        await scheduler.acquire()
+        with call_context(deadline=time.monotonic() + 0.05):
+            with pytest.raises(RequestDropped):
+                await scheduler.acquire()
+        scheduler.release()
+        # The dropped call left no slot behind
+        await asyncio.wait_for(scheduler.acquire(), 1)
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["dropped"]["deadline"] == 1
+    assert stats["active"] == 1
+
+
+def test_queued_call_dropped_when_client_disconnects():
+    async def run():
+        scheduler = FairScheduler(1, tenant_weights={}, endpoint_weights={}, poll_interval=0.01)
+        gone = False
+
+        async def is_disconnected():
+            return gone
+
+        await scheduler.acquire()
+        with call_context(is_disconnected=is_disconnected):
+            waiter = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0.03)
+        assert not waiter.done()
+        gone = True
+        with pytest.raises(RequestDropped):
+            await waiter
+        scheduler.release()
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["dropped"]["disconnected"] == 1
+    assert stats["active"] == 0
+    assert stats["queue_depth"]["interactive"] == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def run():
+        scheduler = FairScheduler(1, tenant_weights={}, endpoint_weights={})
+        await scheduler.acquire()
+        waiter = asyncio.ensure_future(scheduler.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        scheduler.release()
+        await asyncio.wait_for(scheduler.acquire(), 1)
+        return scheduler.stats()
+
+    assert asyncio.run(run())["active"] == 1
+
+
+def test_shared_call_keeps_tenant_but_not_disconnect_check():
+    async def is_disconnected():
+        return True
+
+    with call_context(tenant="acme", is_disconnected=is_disconnected):
+        with shared_call():
+            assert current_context().tenant == "acme"
+            assert current_context().is_disconnected is None
+        assert current_context().is_disconnected is is_disconnected
+    assert current_context().tenant == "anonymous"
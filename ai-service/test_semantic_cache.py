@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from semantic_cache import HashingVectorizer, SemanticTopicCache, TopicIndex
+
+
+def similarity(a, b):
+    vectorizer = HashingVectorizer()
+    return float(vectorizer.transform(a) @ vectorizer.transform(b))
+
+
+def test_reordered_and_plural_topics_are_close():
+    assert similarity("react hooks", "hooks in react") == pytest.approx(1.0)
+    assert similarity("python decorators", "decorator in python") > 0.85
+
+
+def test_unrelated_topics_are_far():
+    assert similarity("react hooks", "react router") < 0.85
+    assert similarity("java", "javascript") < 0.85
+    assert similarity("c++", "c#") < 0.5
+
+
+def test_index_grows_and_stays_per_difficulty():
+    index = TopicIndex()
+    for i in range(40):
+        index.add(f"topic number {i}", "beginner")
+    index.add("react hooks", "beginner")
+    topic, score = index.nearest("hooks with react", "beginner")
+    assert topic == "react hooks" and score > 0.99
+    assert index.nearest("hooks with react", "advanced") is None
+    assert not index.add("react hooks", "beginner")
+    assert len(index) == 41
+
+
+def test_workers_share_topics_through_redis(redis_client):
+    writer = SemanticTopicCache(redis_client)
+    reader = SemanticTopicCache(redis_client, sync_interval=0)
+
+    async def run():
+        await writer.add("react hooks", "beginner")
+        await writer.add("react hooks", "beginner")
+        return (
+            await reader.nearest("hooks in react", "beginner"),
+            await reader.nearest("react hooks", "beginner"),
+            await reader.nearest("sql joins", "beginner"),
+        )
+
+    assert asyncio.run(run()) == ("react hooks", None, None)
+    assert redis_client.lists["questions:topics"] == ['["react hooks", "beginner"]']
+    assert reader.stats() == {"topics": 1, "matches": 1, "misses": 2}
+
+
+def test_topics_with_an_extra_word_do_not_match(redis_client):
+    cache = SemanticTopicCache(redis_client, sync_interval=0)
+    pairs = [
+        ("binary search", "binary search tree"),
+        ("dynamic programming", "dynamic programming on trees"),
+        ("sql joins", "sql join types"),
+    ]
+
+    async def run():
+        for cached, _ in pairs:
+            await cache.add(cached, "beginner")
+        found = [await cache.nearest(requested, "beginner") for _, requested in pairs]
+        await cache.add("binary search tree", "advanced")
+        found.append(await cache.nearest("binary search", "advanced"))
+        found.append(await cache.nearest("binary search trees", "advanced"))
+        return found
+
+    assert similarity("binary search", "binary search tree") > 0.85
+    assert asyncio.run(run()) == [None, None, None, None, "binary search tree"]
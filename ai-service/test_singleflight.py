@@ -0,0 +1,180 @@
+import asyncio
+
+import pytest
+
+from singleflight import RELEASE_LOCK_SCRIPT, SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return ["q1", "q2"]
+
+    async def run():
+        flight = SingleFlight()
+        results = await asyncio.gather(*[flight.do("questions:js:easy:2", generate) for _ in range(20)])
+        return flight, results
+
+    flight, results = asyncio.run(run())
+    assert calls == 1
+    assert all(result == ["q1", "q2"] for result in results)
+    assert flight.inflight() == 0
+
+
+def test_distinct_keys_run_separately():
+    calls = []
+
+    async def generate(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            flight.do("a", lambda: generate("a")),
+            flight.do("b", lambda: generate("b")),
+        )
+
+    assert asyncio.run(run()) == ["a", "b"]
+    assert sorted(calls) == ["a", "b"]
+
+
+def test_errors_propagate_to_all_waiters():
+    async def generate():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream failed")
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            *[flight.do("k", generate) for _ in range(3)], return_exceptions=True
+        )
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelled_leader_does_not_cancel_waiters():
+    async def generate():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def run():
+        flight = SingleFlight()
+        leader = asyncio.ensure_future(flight.do("k", generate))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do("k", generate))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == "done"
+
+
+async def _collect(items):
+    return [item async for item in items]
+
+
+def test_concurrent_streams_share_one_run_and_late_callers_replay():
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield i
+
+    async def run():
+        flight = SingleFlight()
+        early = [asyncio.ensure_future(_collect(flight.stream("k", generate))) for _ in range(5)]
+        await asyncio.sleep(0.015)
+        # Joins after the first item; gets it replayed, then the rest live
+        late = await _collect(flight.stream("k", generate))
+        return [await task for task in early] + [late], flight
+
+    results, flight = asyncio.run(run())
+    assert calls == 1
+    assert results == [[0, 1, 2]] * 6
+    assert flight.inflight() == 0
+
+
+def test_stream_errors_reach_every_follower():
+    async def generate():
+        yield "first"
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream failed")
+
+    async def follow(flight):
+        seen = []
+        try:
+            async for item in flight.stream("k", generate):
+                seen.append(item)
+        except RuntimeError:
+            seen.append("error")
+        return seen
+
+    async def run():
+        flight = SingleFlight()
+        return await asyncio.gather(*[follow(flight) for _ in range(3)])
+
+    assert asyncio.run(run()) == [["first", "error"]] * 3
+
+
+def test_abandoned_stream_keeps_running_for_the_others():
+    async def generate():
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield i
+
+    async def run():
+        flight = SingleFlight()
+        leader = flight.stream("k", generate)
+        follower = asyncio.ensure_future(_collect(flight.stream("k", generate)))
+        assert await leader.__anext__() == 0
+        await leader.aclose()
+        return await follower
+
+    assert asyncio.run(run()) == [0, 1, 2]
+
+
+def _with_lock_release(redis_client):
+    async def release(keys, args):
+        if redis_client.data.get(keys[0]) == args[0]:
+            del redis_client.data[keys[0]]
+
+    redis_client.scripts[RELEASE_LOCK_SCRIPT] = release
+
+
+def test_streams_in_other_workers_replay_the_leaders_cached_result(redis_client):
+    _with_lock_release(redis_client)
+    cache = {}
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield i
+        cache["k"] = [0, 1, 2]
+
+    async def fetch_cached():
+        return cache.get("k")
+
+    async def run():
+        workers = [SingleFlight(redis_client, poll_interval=0.005) for _ in range(3)]
+        return await asyncio.gather(*[
+            _collect(worker.stream("k", generate, fetch_cached=fetch_cached)) for worker in workers
+        ])
+
+    assert asyncio.run(run()) == [[0, 1, 2]] * 3
+    assert calls == 1
+    assert redis_client.data == {}
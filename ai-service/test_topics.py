@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from topics import canonical_difficulty, canonical_topic, load_aliases
+
+
+@pytest.mark.parametrize("raw", ["JavaScript", "javascript ", "  JS", "js!", "ECMAScript"])
+def test_topic_spellings_share_one_name(raw):
+    assert canonical_topic(raw) == "javascript"
+
+
+def test_punctuation_and_whitespace_are_folded():
+    assert canonical_topic("React   Hooks?") == canonical_topic("react-hooks") == "react hooks"
+    assert canonical_topic("Node.js") == canonical_topic("nodejs") == "node js"
+
+
+def test_language_symbols_survive():
+    assert canonical_topic("C++") == canonical_topic("cpp") == "c++"
+    assert canonical_topic("C#") == "c#"
+    assert canonical_topic("C") == "c"
+
+
+def test_empty_topic_is_rejected():
+    with pytest.raises(ValueError):
+        canonical_topic(" ?! ")
+
+
+def test_alias_file_extends_defaults(tmp_path):
+    path = tmp_path / "aliases.json"
+    path.write_text(json.dumps({"RN": "React Native"}))
+    aliases = load_aliases(str(path))
+    assert canonical_topic("rn", aliases) == "react native"
+    assert canonical_topic("JS", aliases) == "javascript"
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("Easy", "beginner"),
+    ("beginner", "beginner"),
+    ("Intermediate", "intermediate"),
+    ("medium", "intermediate"),
+    ("HARD", "advanced"),
+])
+def test_difficulty_enum(raw, expected):
+    assert canonical_difficulty(raw) == expected
+
+
+def test_unknown_difficulty_is_rejected():
+    with pytest.raises(ValueError, match="expected one of"):
+        canonical_difficulty("impossible")
@@ -0,0 +1,92 @@
+import json
+import os
+import re
+import unicodedata
+from enum import Enum
+from typing import Dict, Optional
+
+# JSON object of extra {"alias": "canonical topic"} entries, merged over the defaults
+TOPIC_ALIASES_FILE = os.getenv("TOPIC_ALIASES_FILE")
+
+
+class Difficulty(str, Enum):
+    BEGINNER = "beginner"
+    INTERMEDIATE = "intermediate"
+    ADVANCED = "advanced"
+
+
+DIFFICULTY_ALIASES = {
+    "easy": Difficulty.BEGINNER,
+    "basic": Difficulty.BEGINNER,
+    "simple": Difficulty.BEGINNER,
+    "novice": Difficulty.BEGINNER,
+    "junior": Difficulty.BEGINNER,
+    "medium": Difficulty.INTERMEDIATE,
+    "moderate": Difficulty.INTERMEDIATE,
+    "normal": Difficulty.INTERMEDIATE,
+    "mid": Difficulty.INTERMEDIATE,
+    "hard": Difficulty.ADVANCED,
+    "difficult": Difficulty.ADVANCED,
+    "expert": Difficulty.ADVANCED,
+    "senior": Difficulty.ADVANCED,
+}
+
+DEFAULT_TOPIC_ALIASES = {
+    "js": "javascript",
+    "ecmascript": "javascript",
+    "ts": "typescript",
+    "py": "python",
+    "python3": "python",
+    "golang": "go",
+    "cpp": "c++",
+    "cplusplus": "c++",
+    "csharp": "c#",
+    "nodejs": "node.js",
+    "node": "node.js",
+    "reactjs": "react",
+    "react.js": "react",
+    "vuejs": "vue",
+    "vue.js": "vue",
+    "k8s": "kubernetes",
+    "ml": "machine learning",
+    "ai": "artificial intelligence",
+    "dsa": "data structures and algorithms",
+    "oop": "object oriented programming",
+    "postgres": "postgresql",
+}
+
+
+def _simplify(text: str) -> str:
+    text = unicodedata.normalize("NFKC", str(text)).casefold()
+    # Punctuation becomes a space, except + and # so C++ and C# stay apart from C
+    text = re.sub(r"[^\w\s+#]", " ", text)
+    return " ".join(text.split())
+
+
+def load_aliases(path: Optional[str] = TOPIC_ALIASES_FILE) -> Dict[str, str]:
+    aliases = dict(DEFAULT_TOPIC_ALIASES)
+    if path:
+        with open(path) as f:
+            aliases.update(json.load(f))
+    # Keys and values go through the same simplification as incoming topics
+    return {_simplify(alias): _simplify(topic) for alias, topic in aliases.items()}
+
+
+_aliases = load_aliases()
+
+
+def canonical_topic(topic: str, aliases: Optional[Dict[str, str]] = None) -> str:
+    """"JavaScript", " javascript " and "JS" all become "javascript"."""
+    simple = _simplify(topic)
+    if not simple:
+        raise ValueError("Topic must not be empty")
+    return (_aliases if aliases is None else aliases).get(simple, simple)
+
+
+def canonical_difficulty(difficulty: str) -> str:
+    simple = _simplify(difficulty)
+    try:
+        return Difficulty(DIFFICULTY_ALIASES.get(simple, simple)).value
+    except ValueError:
+        choices = ", ".join(level.value for level in Difficulty)
+        raise ValueError(f"Unknown difficulty {difficulty!r}; expected one of {choices}")
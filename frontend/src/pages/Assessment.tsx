@@ -18,31 +18,70 @@ const Assessment = () => {
   const [score, setScore] = useState(0);
   const [timeLeft, setTimeLeft] = useState(600); // 10 minutes
   const [loading, setLoading] = useState(true);
+  const [streaming, setStreaming] = useState(true);
   const navigate = useNavigate();
   const { userName } = useAuthStore();
 
   console.log("Assessment Component Render - User Name from Auth Store:", userName);
 
   useEffect(() => {
+    // Questions arrive one NDJSON line at a time, so the first can be shown
+    // while the rest are still being generated. StrictMode mounts effects
+    // twice, so each run aborts its stream on cleanup and starts afresh.
+    const controller = new AbortController();
     const fetchQuestions = async () => {
+      setQuestions([]);
+      setLoading(true);
+      setStreaming(true);
       try {
-        const response = await axios.post(
-          `${import.meta.env.VITE_AI_SERVICE_URL}/generate-questions`,
+        const response = await fetch(
+          `${import.meta.env.VITE_AI_SERVICE_URL}/generate-questions/stream`,
           {
-            topic: 'JavaScript',
-            difficulty: 'intermediate',
-            num_questions: 10
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+              topic: 'JavaScript',
+              difficulty: 'intermediate',
+              num_questions: 10
+            }),
+            signal: controller.signal
           }
         );
-        setQuestions(response.data.questions);
-        setLoading(false);
+        if (!response.ok || !response.body) {
+          throw new Error(`Failed to load questions: ${response.statusText}`);
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split('\n');
+          buffer = lines.pop() ?? '';
+          for (const line of lines) {
+            if (!line.trim()) continue;
+            const message = JSON.parse(line);
+            if (message.error) throw new Error(message.error);
+            if (message.done !== undefined) continue;
+            setQuestions((prev) => [...prev, message as Question]);
+            setLoading(false);
+          }
+        }
       } catch (error) {
+        if (controller.signal.aborted) return;
         toast.error('Failed to load questions');
-        setLoading(false);
+      } finally {
+        if (!controller.signal.aborted) {
+          setLoading(false);
+          setStreaming(false);
+        }
       }
     };
 
     fetchQuestions();
+    return () => controller.abort();
   }, []); // Fetch questions only once on component mount
 
   useEffect(() => {
@@ -167,9 +206,9 @@ const Assessment = () => {
           <button
             className="px-4 py-2 bg-indigo-600 text-white rounded-md hover:bg-indigo-700"
             onClick={handleNext}
-            disabled={!selectedAnswer}
+            disabled={!selectedAnswer || (streaming && currentQuestion === questions.length - 1)}
           >
-            {currentQuestion === questions.length - 1 ? 'Submit' : 'Next'}
+            {currentQuestion === questions.length - 1 && !streaming ? 'Submit' : 'Next'}
           </button>
         </div>
       </div>